@@ -1,30 +1,67 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 # Import database configuration settings from the environment config module
 from ..environment.config import settings
+from .pool import TimedQueuePool, TimedAsyncAdaptedQueuePool
+from . import deadlines
 
-# Construct the database URL using settings from the environment config
+# Construct the database URL using settings from the environment config, unless a full URL is given
 # SQLALCHEMY_DATABASE_URL = 'postgresql://<username>:<password>@<ip-address/host_name>/<database_name>'
-SQLALCHEMY_DATABASE_URL = f'postgresql://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}'
+SQLALCHEMY_DATABASE_URL = settings.database_url or f'postgresql://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}'
 
-# Create a SQLAlchemy engine using the constructed database URL
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Async drivers used for each database backend in async mode
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+# The same database reached through its async driver
+def async_url(url: str):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+# Same database reached through its async driver (asyncpg or aiosqlite), used when async mode is enabled
+SQLALCHEMY_ASYNC_DATABASE_URL = async_url(SQLALCHEMY_DATABASE_URL)
+
+# Pool options shared by the sync and async engines
+POOL_OPTIONS = dict(
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+)
+
+# Create a SQLAlchemy engine using the constructed database URL, with an instrumented pool
+engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=TimedQueuePool, **POOL_OPTIONS)
 
 # Create a session factory (SessionLocal) with specific settings for autocommit and autoflush
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create the async engine only in async mode so the async drivers (asyncpg, aiosqlite) are not required otherwise
+async_engine = create_async_engine(SQLALCHEMY_ASYNC_DATABASE_URL, poolclass=TimedAsyncAdaptedQueuePool, **POOL_OPTIONS) if settings.async_database else None
+
+# Async session factory; objects stay usable after commit so responses can be serialized without a reload
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Create a base class for declarative models
 Base = declarative_base()
 
-# Function to obtain a database session using a context manager (yielding the session)
-def get_db():
+# Function to obtain a database session using a context manager (yielding the session); its transactions are
+# limited to the time left until the request's deadline
+def get_db(request: Request):
     # Create a new session using the SessionLocal factory
-    db = SessionLocal()
+    db = deadlines.attach(SessionLocal(), request)
     try:
         # Yield the session to the calling code
         yield db
     finally:
         # Close the session when the context manager is exited
         db.close()
+
+# Async counterpart of get_db, yielding an AsyncSession that is closed when the request ends
+async def get_async_db(request: Request):
+    # Open a new session using the AsyncSessionLocal factory and close it on exit
+    async with AsyncSessionLocal() as db:
+        yield deadlines.attach(db, request)
@@ -0,0 +1,129 @@
+import math
+import sqlite3
+import time
+from contextvars import ContextVar
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from ..environment.config import settings
+
+# Request deadlines. Every request admitted by the LoadSheddingMiddleware gets a budget (request_deadline_seconds,
+# or its route's entry in request_deadlines) counted from its admission. The session dependencies hand the
+# deadline to their session, and each transaction the session begins is limited to the time left: Postgres gets a
+# per-transaction statement_timeout, SQLite (sync driver, local runs) interrupts the running statement. A query
+# issued after the deadline, or a statement cancelled by the timeout, answers 504 and releases the pooled
+# connection and the worker thread right away. Work outside sessions (the streamed exports read through
+# engine.connect) is not limited.
+
+# SQLite virtual machine steps between two deadline checks of a running statement
+SQLITE_PROGRESS_STEPS = 10000
+
+# Deadline budgets by route function name, from request_deadlines ("mass_create_products=120,get_orders=5"); 0
+# disables the deadline of a route
+ROUTE_DEADLINES = {
+    name.strip(): float(seconds)
+    for name, _, seconds in (entry.partition("=") for entry in settings.request_deadlines.split(",") if entry.strip())
+}
+
+# Raised (answering 504) when a request runs out of time for its database work
+class DeadlineExceeded(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Request deadline exceeded")
+
+# Deadline of one request; the expiry is set once the route (and so the budget) is known
+class Deadline:
+    def __init__(self):
+        self.admitted = time.monotonic()
+        self.expires = None
+        self.exceeded = False
+
+    # Seconds left, or None when the request has no deadline
+    def remaining(self):
+        return None if self.expires is None else self.expires - time.monotonic()
+
+    # Whether the deadline has passed
+    def expired(self):
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+# Deadline of the request being served (set by the LoadSheddingMiddleware; None outside requests). It is a mutable
+# holder, so the expiry set by a session dependency in a worker thread is seen by the whole request.
+request_deadline = ContextVar("request_deadline", default=None)
+
+# Start the deadline of the current request from its route's budget; returns it, or None when it has none
+def start(request: Request):
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    if deadline.expires is None:
+        endpoint = request.scope.get("endpoint")
+        seconds = ROUTE_DEADLINES.get(getattr(endpoint, "__name__", None), settings.request_deadline_seconds)
+        if not seconds:
+            return None
+        deadline.expires = deadline.admitted + seconds
+    return deadline
+
+# Give a session the deadline of the current request (the session dependencies call this)
+def attach(db, request: Request):
+    deadline = start(request)
+    if deadline is not None:
+        db.info["deadline"] = deadline
+    return db
+
+# Fail the request with a 504, marking its deadline as exceeded for the metrics
+def exceeded(deadline: Deadline):
+    deadline.exceeded = True
+    return DeadlineExceeded()
+
+# Limit every transaction of a session with a deadline to the time the request has left. The deadline is kept on
+# the connection for the transaction's lifetime (check_deadline, on_statement_timeout) and dropped when it ends
+# (clear_deadline). Raising here would leave the session mid-begin, so an expired deadline gets the shortest timeout
+# and the first statement fails instead.
+@event.listens_for(Session, "after_begin")
+def apply_deadline(session, transaction, connection):
+    deadline = session.info.get("deadline")
+    if deadline is None:
+        return
+    remaining = deadline.remaining()
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, math.ceil(remaining * 1000))}")
+    elif connection.dialect.driver == "pysqlite":
+        # A non-zero return of the progress handler interrupts the running statement
+        connection.connection.dbapi_connection.set_progress_handler(deadline.expired, SQLITE_PROGRESS_STEPS)
+    connection.info["deadline"] = deadline
+
+# Drop the deadline when the transaction ends, so later work on the pooled connection (another request's session,
+# a streamed export) runs unbounded by it
+@event.listens_for(Engine, "commit")
+@event.listens_for(Engine, "rollback")
+def clear_deadline(connection):
+    if connection.closed or connection.invalidated:
+        return
+    if connection.info.pop("deadline", None) is not None and connection.dialect.driver == "pysqlite":
+        connection.connection.dbapi_connection.set_progress_handler(None, 0)
+
+# Fail statements of a transaction whose deadline already passed before they reach the database (a Core-level hook:
+# an ORM do_orm_execute listener would break yield_per queries with select-in loaders)
+@event.listens_for(Engine, "before_cursor_execute")
+def check_deadline(connection, cursor, statement, parameters, context, executemany):
+    deadline = connection.info.get("deadline")
+    if deadline is not None and deadline.expired():
+        raise exceeded(deadline)
+
+# Whether a driver error is a statement cancelled by statement_timeout (Postgres) or by the progress handler (SQLite)
+def is_statement_timeout(error):
+    if isinstance(error, sqlite3.OperationalError):
+        return str(error) == "interrupted"
+    return getattr(error, "pgcode", None) == "57014" or getattr(error, "sqlstate", None) == "57014"
+
+# Turn statement timeouts of transactions whose deadline passed into 504s
+@event.listens_for(Engine, "handle_error")
+def on_statement_timeout(context):
+    if context.connection is None or context.connection.invalidated:
+        return
+    deadline = context.connection.info.get("deadline")
+    if deadline is not None and deadline.expired() and is_statement_timeout(context.original_exception):
+        raise exceeded(deadline)
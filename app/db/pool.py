@@ -0,0 +1,112 @@
+import itertools
+import threading
+import time
+
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+# Upper bounds (in seconds) of the checkout wait-time histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Collects checkout wait times for a connection pool
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.buckets = [0] * (len(WAIT_BUCKETS) + 1)
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.failures = 0
+        # Start times of the checkouts in progress, by checkout number
+        self.waiting = {}
+        self._checkouts = itertools.count()
+
+    # Note a checkout starting; returns its number for end_wait
+    def start_wait(self, started: float):
+        number = next(self._checkouts)
+        with self._lock:
+            self.waiting[number] = started
+        return number
+
+    # Note a checkout finishing (with or without a connection)
+    def end_wait(self, number: int):
+        with self._lock:
+            del self.waiting[number]
+
+    # Seconds the oldest checkout still in progress has been waiting (0 when none is), used for load shedding;
+    # checkouts are inserted in start order, so the oldest is the first
+    def longest_wait(self):
+        with self._lock:
+            oldest = next(iter(self.waiting.values()), None)
+        return 0.0 if oldest is None else time.perf_counter() - oldest
+
+    # Record how long one checkout waited for a connection
+    def observe_wait(self, seconds: float, failed: bool = False):
+        with self._lock:
+            index = 0
+            while index < len(WAIT_BUCKETS) and seconds > WAIT_BUCKETS[index]:
+                index += 1
+            self.buckets[index] += 1
+            self.wait_count += 1
+            self.wait_sum += seconds
+            if failed:
+                self.failures += 1
+
+    # Cumulative histogram in the usual "less than or equal" form, with "+Inf" as the last bucket
+    def histogram(self):
+        with self._lock:
+            counts = list(self.buckets)
+            total, wait_sum = self.wait_count, self.wait_sum
+        cumulative, running = {}, 0
+        for bound, count in zip([str(b) for b in WAIT_BUCKETS] + ["+Inf"], counts):
+            running += count
+            cumulative[bound] = running
+        return {"buckets": cumulative, "count": total, "sum": wait_sum}
+
+# Mixin timing every checkout, including the time spent queueing for an overflow slot or a free connection
+class TimedCheckoutMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        number = self.stats.start_wait(started)
+        try:
+            connection = super()._do_get()
+        except Exception:
+            # A failed checkout (pool timeout or connect error) still counts towards the wait time
+            self.stats.observe_wait(time.perf_counter() - started, failed=True)
+            raise
+        finally:
+            self.stats.end_wait(number)
+        self.stats.observe_wait(time.perf_counter() - started)
+        return connection
+
+    # Pools are recreated on dispose() / fork, so the statistics travel with the recreated pool
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+# Instrumented pool classes for the sync and async engines
+class TimedQueuePool(TimedCheckoutMixin, QueuePool):
+    pass
+
+class TimedAsyncAdaptedQueuePool(TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+# Snapshot of the live state of an engine's pool
+def pool_status(engine):
+    pool = engine.pool
+    status = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": pool._max_overflow,
+        "timeout": pool.timeout(),
+    }
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status["checkout_failures"] = stats.failures
+        status["checkout_wait_seconds"] = stats.histogram()
+    return status
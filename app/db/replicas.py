@@ -0,0 +1,110 @@
+import asyncio
+import itertools
+import time
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, make_url, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from ..environment.config import settings
+from .config import POOL_OPTIONS, SessionLocal, AsyncSessionLocal, async_url, engine, async_engine
+from .pool import TimedQueuePool, TimedAsyncAdaptedQueuePool
+from . import deadlines
+
+# Cookie set on responses to writes; while it is present and not expired the client's reads go to the primary
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+# One read replica: its engines and session factories, and the outcome of its last health check
+class Replica:
+    def __init__(self, url: str):
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine = create_engine(url, poolclass=TimedQueuePool, **POOL_OPTIONS)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.async_engine = create_async_engine(async_url(url), poolclass=TimedAsyncAdaptedQueuePool, **POOL_OPTIONS) if settings.async_database else None
+        self.AsyncSessionLocal = async_sessionmaker(bind=self.async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+        # Replicas start in rotation; the first health check runs during start-up
+        self.healthy = True
+        self.lag_seconds = None
+        self.error = None
+        self.checked_at = None
+
+    # Measure the replication lag and take the replica out of rotation when it is too far behind or unreachable
+    def check(self):
+        try:
+            with self.engine.connect() as connection:
+                self.lag_seconds = float(connection.execute(text(settings.replica_lag_query)).scalar() or 0)
+            self.error = None
+            self.healthy = self.lag_seconds <= settings.replica_max_lag_seconds
+        except Exception as exc:
+            self.lag_seconds, self.error, self.healthy = None, type(exc).__name__, False
+        self.checked_at = time.time()
+
+# Configured replicas, used in round-robin order
+replicas = [Replica(url.strip()) for url in settings.database_replica_urls.split(",") if url.strip()]
+_next_replica = itertools.count()
+
+# Every engine of the process by name (primary, async primary, replicas), for statistics and instrumentation
+def all_engines():
+    engines = {"sync": engine}
+    if async_engine is not None:
+        engines["async"] = async_engine.sync_engine
+    for index, replica in enumerate(replicas):
+        engines[f"replica-{index}"] = replica.engine
+        if replica.async_engine is not None:
+            engines[f"replica-{index}-async"] = replica.async_engine.sync_engine
+    return engines
+
+# Check every replica once
+def check_replicas():
+    for replica in replicas:
+        replica.check()
+
+# Re-check the replicas periodically (started by the lifespan handler when replicas are configured)
+async def run_health_checks():
+    while True:
+        await asyncio.sleep(settings.replica_health_interval)
+        await run_in_threadpool(check_replicas)
+
+# Whether the client wrote recently enough that its reads must see the primary
+def reads_from_primary(request: Request):
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+# Next healthy replica in round-robin order, or None when the read should go to the primary
+def pick_replica(request: Request):
+    if not replicas or reads_from_primary(request):
+        return None
+    healthy = [replica for replica in replicas if replica.healthy]
+    if not healthy:
+        return None
+    return healthy[next(_next_replica) % len(healthy)]
+
+# Engine for reads that stream past the request (exports): a replica's, or the primary's as for get_read_db
+def get_read_engine(request: Request):
+    replica = pick_replica(request)
+    return replica.engine if replica else engine
+
+# Async counterpart of get_read_engine
+def get_async_read_engine(request: Request):
+    replica = pick_replica(request)
+    return replica.async_engine if replica else async_engine
+
+# Session dependency for read-only routes: a replica session, or a primary one (no healthy replica or a recent
+# write); like get_db, its transactions are limited by the request's deadline
+def get_read_db(request: Request):
+    replica = pick_replica(request)
+    db = deadlines.attach(replica.SessionLocal() if replica else SessionLocal(), request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Async counterpart of get_read_db
+async def get_async_read_db(request: Request):
+    replica = pick_replica(request)
+    async with (replica.AsyncSessionLocal() if replica else AsyncSessionLocal()) as db:
+        yield deadlines.attach(db, request)
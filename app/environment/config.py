@@ -3,18 +3,146 @@ import hashlib
 
 # Define a Settings class that inherits from BaseSettings and specifies configuration parameters
 class Settings(BaseSettings):
-    # Database connection parameters
-    database_hostname: str
-    database_port: str
-    database_password: str
-    database_name: str
-    database_username: str
+    # Database connection parameters (not needed when database_url is set)
+    database_hostname: str = ""
+    database_port: str = ""
+    database_password: str = ""
+    database_name: str = ""
+    database_username: str = ""
+    # Full SQLAlchemy URL of the primary, overriding the parameters above (e.g. sqlite:///./primary.db locally)
+    database_url: str = ""
+
+    # Read replicas for the read-only routes: comma-separated SQLAlchemy URLs (empty disables replica routing)
+    database_replica_urls: str = ""
+    # Replicas lagging more than this many seconds are ejected until they catch up; checked every interval seconds
+    # with replica_lag_query, which returns the replica's lag in seconds (the default works on Postgres streaming
+    # replicas and reports 0 on a primary)
+    replica_max_lag_seconds: float = 5
+    replica_health_interval: float = 5
+    replica_lag_query: str = ("SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+                              "THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END")
+    # After a write, the client's reads go to the primary for this many seconds (read-your-writes)
+    read_your_writes_seconds: float = 5
+
+    # Connection pool sizing (pool + overflow should cover the threadpool, 40 threads by default)
+    db_pool_size: int = 20
+    db_max_overflow: int = 20
+    # Seconds to wait for a pooled connection before giving up, and to keep a connection before replacing it
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    # Test connections on checkout so connections dropped by the server are replaced transparently
+    db_pool_pre_ping: bool = True
+    # Development only: create missing tables from the models at startup instead of running the migrations
+    db_create_all: bool = False
     
     # Security-related parameters
     secret_key: str
     algorithm: str
     access_token_expire_minutes: int
 
+    # Password hashing: bcrypt cost factor, dedicated worker processes (0 hashes inline) and how many hashes
+    # may wait for a worker before new logins/sign-ups are turned away with a 503
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_max_queue: int = 32
+
+    # In-process cache of verified access tokens (entries never outlive the token's exp)
+    jwt_cache_enabled: bool = True
+    jwt_cache_size: int = 10000
+
+    # In-process cache of the authenticated user looked up by get_current_user (size in entries, TTL in seconds)
+    user_cache_enabled: bool = True
+    user_cache_size: int = 10000
+    user_cache_ttl: float = 60
+
+    # Maximum number of ids / order lines accepted by the batch endpoints
+    batch_max_items: int = 500
+
+    # Bulk product import: rows per INSERT/commit and how many row errors to report back
+    import_batch_size: int = 1000
+    import_max_errors: int = 100
+
+    # Startup warm-up before the worker reports ready: pooled connections to open (capped at db_pool_size, 0 skips),
+    # whether to pre-build the request/response serializers and whether to start the password hashing workers
+    warmup_db_connections: int = 5
+    warmup_serializers: bool = True
+    warmup_password_hashing: bool = True
+
+    # Shared secret for the diagnostic endpoints (GET /internal/pool, /replicas, /cache, /catalog), sent in the
+    # X-Internal-Token header; empty (the default) disables them. GET /internal/ready stays open for probes
+    internal_token: str = ""
+
+    # Opt-in async mode: serve the CRUD routes with AsyncSession handlers instead of the threadpool-bound sync ones
+    async_database: bool = False
+
+    # Per-route request metrics (count, in-flight, latency and auth/db/serialization time) exported on /metrics
+    metrics_enabled: bool = True
+
+    # SQL instrumentation: debug mode returns each request's query count and database time in X-DB-Query-* headers;
+    # statements slower than slow_query_seconds are logged (0 disables) with their parameter values redacted to
+    # their types unless slow_query_log_parameters is set (sensitive names stay redacted); a statement that runs
+    # more than n_plus_one_threshold times in one request is logged as a possible N+1 (0 disables)
+    debug: bool = False
+    slow_query_seconds: float = 0.5
+    slow_query_log_parameters: bool = False
+    n_plus_one_threshold: int = 10
+
+    # Login rate limits (token buckets): per client IP and per username, `burst` attempts at once refilling at
+    # `per_minute` a minute; the buckets live in process memory (at most rate_limit_max_keys of them) or, shared
+    # by every worker, in Redis when rate_limit_backend is a redis:// URL. Only trust X-Forwarded-For for the
+    # client IP behind a proxy that sets it
+    login_rate_limit_enabled: bool = True
+    login_ip_burst: int = 20
+    login_ip_per_minute: float = 60
+    login_username_burst: int = 5
+    login_username_per_minute: float = 10
+    rate_limit_backend: str = "memory"
+    rate_limit_max_keys: int = 100000
+    rate_limit_trust_forwarded_for: bool = False
+
+    # Response compression: JSON/text bodies of at least compression_min_size bytes are compressed with the
+    # encoding the client accepts best, ties broken by the order of compression_encodings (br and zstd are skipped
+    # when brotli/zstandard are not installed); the levels trade CPU for size per encoding
+    compression_enabled: bool = True
+    compression_min_size: int = 1024
+    compression_encodings: str = "zstd,br,gzip"
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_zstd_level: int = 3
+
+    # Streamed exports (GET /products/export, GET /orders/export): rows fetched from the server-side cursor, encoded
+    # and sent per partition, so this bounds the memory an export holds at once
+    export_batch_size: int = 1000
+
+    # Group commit for POST /orders/: a writer thread takes the first waiting order, then keeps collecting for
+    # order_group_commit_window_ms (or until order_group_commit_max_size orders) and commits them in one transaction;
+    # the window is latency added to a lone order, the max size caps the transaction under a burst
+    order_group_commit: bool = False
+    order_group_commit_window_ms: float = 2
+    order_group_commit_max_size: int = 100
+
+    # In-memory product catalog: loaded at start-up and refreshed every catalog_refresh_seconds; reads fall back to
+    # the database while the last successful refresh is older than catalog_max_staleness_seconds. With
+    # catalog_listen_notify, a Postgres primary reached through psycopg2 wakes the refresher on every change (needs
+    # the triggers of migration 0005); elsewhere it only polls
+    catalog_snapshot_enabled: bool = False
+    catalog_refresh_seconds: float = 1.0
+    catalog_max_staleness_seconds: float = 5.0
+    catalog_listen_notify: bool = True
+
+    # Request deadlines: every request's database transactions must finish within request_deadline_seconds of its
+    # admission (0 disables) or it is answered 504. request_deadlines overrides the budget per route as
+    # comma-separated name=seconds entries, keyed by the route function's name (e.g. get_orders=5); 0 disables the
+    # deadline of that route. The streamed exports read outside sessions and are exempt by default, so their
+    # authentication lookup does not get a deadline that the export itself would not have
+    request_deadline_seconds: float = 30
+    request_deadlines: str = "mass_create_products=300,export_products=0,export_orders=0"
+    # Load shedding: new requests get an immediate 503 while shed_max_in_flight requests are in progress in this
+    # worker, or while a pooled connection checkout has waited longer than shed_max_pool_wait_seconds (0 disables
+    # either check)
+    shed_max_in_flight: int = 500
+    shed_max_pool_wait_seconds: float = 2.0
+
     # Hash function based on the algorithm string
     def get_hash_function(self):
         if self.algorithm.lower() == "sha256":
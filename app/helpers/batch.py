@@ -0,0 +1,43 @@
+from fastapi import HTTPException, Response, status
+
+# Import the batch limits from the environment config module
+from ..environment.config import settings
+
+# Response headers listing requested ids that were not returned
+MISSING_IDS_HEADER = "X-Missing-Ids"
+FORBIDDEN_IDS_HEADER = "X-Forbidden-Ids"
+
+# Reject batches larger than the configured maximum
+def check_batch_size(count: int):
+    if count > settings.batch_max_items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"At most {settings.batch_max_items} items per batch request")
+
+# Parse a comma-separated id list ("3,1,2"), dropping duplicates but keeping the requested order
+def parse_ids(raw: str):
+    try:
+        ids = [int(part) for part in raw.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids must be a comma-separated list of integers")
+    ids = list(dict.fromkeys(ids))
+    check_batch_size(len(ids))
+    return ids
+
+# Arrange rows fetched with a single IN query in the requested order, keeping only rows owned by the caller,
+# and report the ids that do not exist or belong to another user in response headers
+def in_requested_order(response: Response, ids, rows, owner_id: int):
+    by_id = {row.id: row for row in rows}
+    found, missing, forbidden = [], [], []
+    for id in ids:
+        row = by_id.get(id)
+        if row is None:
+            missing.append(id)
+        elif row.owner_id != owner_id:
+            forbidden.append(id)
+        else:
+            found.append(row)
+    if missing:
+        response.headers[MISSING_IDS_HEADER] = ",".join(map(str, missing))
+    if forbidden:
+        response.headers[FORBIDDEN_IDS_HEADER] = ",".join(map(str, forbidden))
+    return found
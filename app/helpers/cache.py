@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Bounded, thread-safe LRU cache whose entries also expire after a time-to-live
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Return the cached value for key, or default when it is missing or expired
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    # Store value under key for ttl seconds (the cache default when omitted), evicting the least recently used entry when full
+    def set(self, key, value, ttl: float = None):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    # Drop the entry for key, if any
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    # Drop every entry
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    # Counters for monitoring the hit ratio and memory bound
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,340 @@
+import bisect
+import logging
+import select as io_select
+import threading
+import time
+from datetime import timedelta, timezone
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import func, or_, select
+
+from ..db.config import SessionLocal, engine
+from ..environment.config import settings
+from ..models.loaders import product_list_options
+from ..models.models import Product, User
+from ..schemas.product import Product as ProductSchema
+from ..schemas.user import UserOut
+from .batch import in_requested_order
+from .conditional import (etag, validators, product_row_state, is_conditional, is_not_modified, validator_headers,
+                          not_modified)
+from .pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+# In-memory product catalog (CATALOG_SNAPSHOT_ENABLED). Every product is held with its response JSON already
+# serialized, so GET /products/{id} and plain GET /products/ pages are answered without a query or an ORM object.
+# The snapshot is loaded at start-up and then refreshed incrementally by a background thread:
+# - changed rows are found through the updated_at watermark of products and their owners;
+# - deletes are found by comparing row counts;
+# - on Postgres, LISTEN/NOTIFY (triggers of migration 0005) wakes the thread as soon as a change commits, with
+#   polling every catalog_refresh_seconds as the fallback.
+# This process's own product writes update the snapshot immediately, and products whose stock its orders changed
+# are read from the database until the next refresh. Reads go back to the database whenever the last successful
+# refresh is older than catalog_max_staleness_seconds.
+logger = logging.getLogger(__name__)
+
+# Channel the catalog triggers notify on
+NOTIFY_CHANNEL = "catalog_changes"
+
+# Re-read changes this far behind the watermark: updated_at is set when the writing statement runs, so a
+# transaction that commits late can carry a timestamp older than rows already seen
+WATERMARK_OVERLAP = timedelta(seconds=30)
+
+# After a notification, wait this long so a burst of changes is picked up by one refresh
+NOTIFY_DEBOUNCE_SECONDS = 0.05
+
+# Sort key of (created_at, id) pagination; timestamps compared in UTC (SQLite hands back naive UTC datetimes)
+def sort_key(created_at, id: int):
+    return (created_at.replace(tzinfo=created_at.tzinfo or timezone.utc), id)
+
+# Product response fields read from the row itself (the owner is validated once per owner, see _apply)
+PRODUCT_FIELDS = [name for name in ProductSchema.model_fields if name != "owner"]
+
+# One product of the snapshot: what the routes filter, page and validate on, plus the serialized response body
+class CatalogEntry:
+    __slots__ = ("id", "owner_id", "created_at", "price", "in_stock", "version", "owner_version", "updated_at",
+                 "owner_updated_at", "json")
+
+    def __init__(self, product: Product, owner: UserOut):
+        self.id = product.id
+        self.owner_id = product.owner_id
+        self.created_at = product.created_at
+        self.price = product.price
+        self.in_stock = product.in_stock
+        self.version = product.version
+        self.owner_version = product.owner.version
+        self.updated_at = product.updated_at
+        self.owner_updated_at = product.owner.updated_at
+        fields = {name: getattr(product, name) for name in PRODUCT_FIELDS}
+        self.json = ProductSchema.model_validate({**fields, "owner": owner}).model_dump_json().encode()
+
+    # Whether the entry passes the in_stock/min_price/max_price filters of GET /products/
+    def matches(self, in_stock: bool = None, min_price: int = None, max_price: int = None):
+        return ((in_stock is None or self.in_stock == in_stock)
+                and (min_price is None or self.price >= min_price)
+                and (max_price is None or self.price <= max_price))
+
+# Products by id, their (created_at, id) order, and the refresh bookkeeping
+class CatalogSnapshot:
+    def __init__(self):
+        self.loaded = False
+        self._entries = {}
+        self._keys = []
+        # Ids deleted by this process, with the time of the delete: a refresh that started earlier may have read the
+        # row and must not bring it back; once a refresh started after the delete completes, the id is forgotten
+        self._deleted = {}
+        # Ids changed by this process but not reloaded yet (stock reservations), read from the database until then
+        self._stale = set()
+        self._lock = threading.Lock()
+        self.watermark = None
+        self.refreshed_at = None
+        self.refreshes = 0
+        self.listening = False
+
+    # Whether reads may be served from memory: loaded, and refreshed within the staleness bound
+    def is_fresh(self):
+        return self.loaded and time.monotonic() - self.refreshed_at <= settings.catalog_max_staleness_seconds
+
+    # Add or replace entries for loaded products, never replacing an entry with an older version of the same
+    # product; products whose versions did not change are not serialized again, and each owner is validated once
+    # (its email validation costs more than the rest of the product)
+    def _apply(self, products, from_refresh: bool = True):
+        entries, owners = [], {}
+        for product in products:
+            current = self._entries.get(product.id)
+            if current is None or (product.version, product.owner.version) > (current.version, current.owner_version):
+                key = (product.owner.id, product.owner.version)
+                if key not in owners:
+                    owners[key] = UserOut.model_validate(product.owner, from_attributes=True)
+                entries.append(CatalogEntry(product, owners[key]))
+        with self._lock:
+            for entry in entries:
+                if from_refresh and entry.id in self._deleted:
+                    continue
+                current = self._entries.get(entry.id)
+                if current is None:
+                    bisect.insort(self._keys, sort_key(entry.created_at, entry.id))
+                elif (entry.version, entry.owner_version) <= (current.version, current.owner_version):
+                    continue
+                self._entries[entry.id] = entry
+                for stamp in (entry.updated_at, entry.owner_updated_at):
+                    if self.watermark is None or stamp > self.watermark:
+                        self.watermark = stamp
+
+    # Drop entries by id
+    def _remove(self, ids):
+        with self._lock:
+            for id in ids:
+                entry = self._entries.pop(id, None)
+                if entry is not None:
+                    index = bisect.bisect_left(self._keys, sort_key(entry.created_at, entry.id))
+                    del self._keys[index]
+
+    # Read products (with their owners) matching a filter, in batches so a full load never holds every row
+    def _read(self, db, *criteria):
+        query = select(Product).options(*product_list_options()).filter(*criteria)
+        return db.scalars(query.execution_options(yield_per=1000))
+
+    # Load every product (start-up)
+    def load(self):
+        started = time.monotonic()
+        with SessionLocal() as db:
+            self._apply(self._read(db))
+        self.refreshed_at, self.loaded = started, True
+
+    # Load products by id, 1000 per query
+    def _apply_ids(self, db, ids):
+        ids = list(ids)
+        for start in range(0, len(ids), 1000):
+            self._apply(self._read(db, Product.id.in_(ids[start:start + 1000])))
+
+    # Ids among rows changed since the watermark whose product or owner version is newer than the snapshot's; only
+    # versions are read, so the rows of the overlap window that are already current cost no ORM load
+    def _changed_ids(self, db):
+        since = self.watermark - WATERMARK_OVERLAP
+        rows = db.execute(
+            select(Product.id, Product.version, User.version)
+            .join(User, Product.owner_id == User.id)
+            .filter(or_(Product.updated_at >= since, User.updated_at >= since))
+        )
+        changed = []
+        for id, version, owner_version in rows:
+            current = self._entries.get(id)
+            if current is None or (version, owner_version) > (current.version, current.owner_version):
+                changed.append(id)
+        return changed
+
+    # Bring the snapshot up to date: stale products and rows changed since the watermark, then deletes (and rows
+    # missed by the watermark) when the row count differs
+    def refresh(self):
+        started = time.monotonic()
+        with self._lock:
+            stale, self._stale = self._stale, set()
+        with SessionLocal() as db:
+            if self.watermark is None:
+                self._apply(self._read(db))
+            else:
+                self._apply_ids(db, stale.union(self._changed_ids(db)))
+            if db.scalar(select(func.count()).select_from(Product)) != len(self._entries):
+                ids = set(db.scalars(select(Product.id)))
+                self._remove([id for id in list(self._entries) if id not in ids])
+                self._apply_ids(db, [id for id in ids if id not in self._entries])
+        with self._lock:
+            self._deleted = {id: deleted_at for id, deleted_at in self._deleted.items() if deleted_at >= started}
+        self.refreshed_at = started
+        self.refreshes += 1
+
+    # Reload products this process just created or updated, inside the writer's session (after its commit)
+    def refresh_products(self, db, ids):
+        if self.loaded:
+            self._apply(self._read(db, Product.id.in_(ids)), from_refresh=False)
+
+    # Mark products whose stock this process just changed; cheaper than refresh_products on the order path, the
+    # next refresh reloads them
+    def invalidate(self, ids):
+        if self.loaded:
+            with self._lock:
+                self._stale.update(ids)
+
+    # Forget a product this process just deleted
+    def remove_product(self, id: int):
+        if self.loaded:
+            with self._lock:
+                self._deleted[id] = time.monotonic()
+            self._remove([id])
+
+    # Entry of a product, or None when it is not in the snapshot (or stale)
+    def get(self, id: int):
+        return None if id in self._stale else self._entries.get(id)
+
+    # Entries of a GET /products/ page: (created_at, id) order, by cursor or by skip, filtered like filter_products;
+    # None when the page would include a stale product
+    def page(self, limit: int, skip: int = 0, cursor: str = None, in_stock: bool = None, min_price: int = None,
+             max_price: int = None):
+        position = sort_key(*decode_cursor(cursor)) if cursor else None
+        if cursor:
+            skip = 0
+        page = []
+        with self._lock:
+            start = bisect.bisect_right(self._keys, position) if cursor else 0
+            for index in range(start, len(self._keys)):
+                if len(page) >= limit:
+                    break
+                entry = self._entries[self._keys[index][1]]
+                if entry.id in self._stale:
+                    return None
+                if not entry.matches(in_stock, min_price, max_price):
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                page.append(entry)
+        return page
+
+    # Counters for GET /internal/catalog
+    def stats(self):
+        return {"enabled": settings.catalog_snapshot_enabled, "loaded": self.loaded, "size": len(self._entries),
+                "age_seconds": time.monotonic() - self.refreshed_at if self.loaded else None,
+                "stale": len(self._stale), "refreshes": self.refreshes, "listening": self.listening,
+                "watermark": self.watermark.isoformat() if self.watermark else None}
+
+# The snapshot of this process
+snapshot = CatalogSnapshot()
+
+# JSON array of serialized entries
+def json_array(entries):
+    return b"[" + b",".join(entry.json for entry in entries) + b"]"
+
+# GET /products/{id} from an entry: ownership check, conditional request, then the pre-serialized body
+def product_response(request: Request, entry: CatalogEntry, owner_id: int):
+    if entry.owner_id != owner_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform request action")
+    tag, modified = validators(product_row_state(entry))
+    if is_conditional(request) and is_not_modified(request, tag, modified):
+        return not_modified(tag, modified)
+    return Response(entry.json, media_type="application/json", headers=validator_headers(tag, modified))
+
+# A plain GET /products/ page from the snapshot, with the collection ETag and the next page's cursor
+def page_response(request: Request, page, limit: int):
+    tag = etag(*(product_row_state(entry)[0] for entry in page))
+    if is_conditional(request) and is_not_modified(request, tag):
+        return not_modified(tag)
+    headers = {"ETag": tag}
+    if page and len(page) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(page[-1])
+    return Response(json_array(page), media_type="application/json", headers=headers)
+
+# GET /products/?ids= from the snapshot, or None when an id is unknown to it (the database decides then)
+def batch_response(response: Response, ids, owner_id: int):
+    entries = [snapshot.get(id) for id in ids]
+    if None in entries:
+        return None
+    found = in_requested_order(response, ids, entries, owner_id)
+    return Response(json_array(found), media_type="application/json", headers=dict(response.headers))
+
+# Dedicated autocommit connection LISTENing for catalog changes (psycopg2 only), or None to poll
+def listen():
+    if not settings.catalog_listen_notify or engine.dialect.driver != "psycopg2":
+        return None
+    try:
+        cargs, cparams = engine.dialect.create_connect_args(engine.url)
+        connection = engine.dialect.connect(*cargs, **cparams)
+        connection.autocommit = True
+        connection.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+        return connection
+    except Exception:
+        logger.warning("catalog: LISTEN %s failed, refreshing by polling only", NOTIFY_CHANNEL, exc_info=True)
+        return None
+
+# Background refresher: waits for a notification or the poll interval, then refreshes
+class CatalogRefresher(threading.Thread):
+    def __init__(self):
+        super().__init__(name="catalog-refresh", daemon=True)
+        self.stopping = threading.Event()
+
+    # Wait up to the poll interval, returning early on a notification
+    def wait(self, connection):
+        if connection is None:
+            self.stopping.wait(settings.catalog_refresh_seconds)
+            return connection
+        try:
+            if io_select.select([connection], [], [], settings.catalog_refresh_seconds)[0]:
+                connection.poll()
+                connection.notifies.clear()
+                self.stopping.wait(NOTIFY_DEBOUNCE_SECONDS)
+            return connection
+        except Exception:
+            logger.warning("catalog: LISTEN connection lost, refreshing by polling only", exc_info=True)
+            snapshot.listening = False
+            return None
+
+    def run(self):
+        connection = listen()
+        snapshot.listening = connection is not None
+        while not self.stopping.is_set():
+            connection = self.wait(connection)
+            if self.stopping.is_set():
+                break
+            try:
+                snapshot.refresh()
+            except Exception:
+                # Reads fall back to the database once the snapshot is older than the staleness bound
+                logger.exception("catalog: refresh failed")
+        if connection is not None:
+            connection.close()
+
+# Refresher thread of this process
+_refresher = None
+
+# Load the snapshot and start refreshing it (start-up)
+def start():
+    global _refresher
+    snapshot.load()
+    _refresher = CatalogRefresher()
+    _refresher.start()
+
+# Stop the refresher (shutdown)
+def stop():
+    global _refresher
+    if _refresher is not None:
+        _refresher.stopping.set()
+        _refresher.join(timeout=settings.catalog_refresh_seconds + 5)
+        _refresher = None
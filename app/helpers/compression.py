@@ -0,0 +1,120 @@
+import gzip
+import zlib
+
+from ..environment.config import settings
+
+# Response compression for the CompressionMiddleware: the encoders this process offers (gzip always, brotli and zstd
+# when their optional packages are installed), Accept-Encoding negotiation and the compressible content types.
+
+# Optional encoders: brotli and zstd are offered only when their packages are installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content types worth compressing (JSON pages, exports, plain text)
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+# gzip: one-shot compression of a whole body, and a streaming compressor flushing after every chunk
+class GzipEncoder:
+    name = "gzip"
+
+    def compress(self, data: bytes):
+        return gzip.compress(data, compresslevel=settings.compression_gzip_level, mtime=0)
+
+    def stream(self):
+        return GzipStream()
+
+class GzipStream:
+    def __init__(self):
+        # wbits 31 = deflate with a gzip header and trailer
+        self.compressor = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes):
+        return self.compressor.compress(chunk) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+# brotli ("br")
+class BrotliEncoder:
+    name = "br"
+
+    def compress(self, data: bytes):
+        return brotli.compress(data, quality=settings.compression_brotli_quality)
+
+    def stream(self):
+        return BrotliStream()
+
+class BrotliStream:
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=settings.compression_brotli_quality)
+
+    def compress(self, chunk: bytes):
+        return self.compressor.process(chunk) + self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+# zstd
+class ZstdEncoder:
+    name = "zstd"
+
+    def compress(self, data: bytes):
+        return zstandard.ZstdCompressor(level=settings.compression_zstd_level).compress(data)
+
+    def stream(self):
+        return ZstdStream()
+
+class ZstdStream:
+    def __init__(self):
+        self.compressor = zstandard.ZstdCompressor(level=settings.compression_zstd_level).compressobj()
+
+    def compress(self, chunk: bytes):
+        return self.compressor.compress(chunk) + self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self.compressor.flush()
+
+# Encoders this process can offer, by Accept-Encoding token
+AVAILABLE = {"gzip": GzipEncoder()}
+if brotli is not None:
+    AVAILABLE["br"] = BrotliEncoder()
+if zstandard is not None:
+    AVAILABLE["zstd"] = ZstdEncoder()
+
+# Enabled encoders in order of preference (COMPRESSION_ENCODINGS), skipping those not installed
+def enabled_encoders():
+    names = [name.strip() for name in settings.compression_encodings.split(",") if name.strip()]
+    return [AVAILABLE[name] for name in names if name in AVAILABLE]
+
+# Encoder for an Accept-Encoding header: the highest q-value wins, ties go to the configured preference order
+def negotiate(accept_encoding: str, encoders: list):
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if token:
+            weights[token.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoder in encoders:
+        quality = weights.get(encoder.name, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoder, quality
+    return best
+
+# Whether a response with this Content-Type/Content-Encoding should be compressed
+def is_compressible(content_type: str, content_encoding: str):
+    return not content_encoding and content_type.startswith(COMPRESSIBLE_TYPES)
@@ -0,0 +1,98 @@
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from ..models.models import Order, Product, User
+
+# Conditional GET for products and orders. A representation is identified by the versions of every row it embeds
+# (the resource, its owner and, for orders, the product and the product's owner), which the version columns bump
+# on each UPDATE: the strong ETag is a digest of those versions, Last-Modified the latest of their updated_at.
+# With If-None-Match/If-Modified-Since a version-only query decides on 304 before the full object graph is loaded.
+
+# The owner of an order's product (the order's own owner is joined as User)
+ProductOwner = aliased(User)
+
+# Version-only select of products: what product_state() reads off a loaded product, without the row data
+def product_versions():
+    return (select(Product.id, Product.owner_id, Product.version, Product.updated_at,
+                   User.version.label("owner_version"), User.updated_at.label("owner_updated_at"))
+            .join(User, Product.owner_id == User.id))
+
+# Version-only select of orders: what order_state() reads off a loaded order, without the row data
+def order_versions():
+    return (select(Order.id, Order.owner_id, Order.version, Order.updated_at,
+                   User.version.label("owner_version"), User.updated_at.label("owner_updated_at"),
+                   Product.version.label("product_version"), Product.updated_at.label("product_updated_at"),
+                   ProductOwner.version.label("product_owner_version"),
+                   ProductOwner.updated_at.label("product_owner_updated_at"))
+            .join(User, Order.owner_id == User.id)
+            .join(Product, Order.product_id == Product.id)
+            .join(ProductOwner, Product.owner_id == ProductOwner.id))
+
+# (versions, modification times) of a loaded product or a product_versions() row
+def product_state(product):
+    return (product.id, product.version, product.owner.version), (product.updated_at, product.owner.updated_at)
+
+def product_row_state(row):
+    return (row.id, row.version, row.owner_version), (row.updated_at, row.owner_updated_at)
+
+# (versions, modification times) of a loaded order or an order_versions() row
+def order_state(order):
+    return ((order.id, order.version, order.owner.version, order.product.version, order.product.owner.version),
+            (order.updated_at, order.owner.updated_at, order.product.updated_at, order.product.owner.updated_at))
+
+def order_row_state(row):
+    return ((row.id, row.version, row.owner_version, row.product_version, row.product_owner_version),
+            (row.updated_at, row.owner_updated_at, row.product_updated_at, row.product_owner_updated_at))
+
+# Strong ETag of one resource, or of a page of them (a collection version), from their versions
+def etag(*versions):
+    return '"' + hashlib.blake2b(repr(versions).encode(), digest_size=12).hexdigest() + '"'
+
+# Latest modification time, in UTC (SQLite hands back naive UTC datetimes)
+def last_modified(times):
+    latest = max(time.replace(tzinfo=time.tzinfo or timezone.utc) for time in times)
+    return latest.astimezone(timezone.utc)
+
+# (ETag, Last-Modified) of a state returned by the *_state functions
+def validators(state):
+    versions, times = state
+    return etag(*versions), last_modified(times)
+
+# Whether the request carries validators, i.e. whether a version-only lookup could save the full load
+def is_conditional(request: Request):
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+# Evaluate If-None-Match (weak comparison, as allowed for GET) or, without it, If-Modified-Since
+def is_not_modified(request: Request, tag: str, modified=None):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+        return "*" in tags or tag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return modified.replace(microsecond=0) <= since.replace(tzinfo=since.tzinfo or timezone.utc)
+    return False
+
+# ETag and Last-Modified headers
+def validator_headers(tag: str, modified=None):
+    headers = {"ETag": tag}
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+    return headers
+
+# Add the validators to a response
+def set_validators(response: Response, tag: str, modified=None):
+    response.headers.update(validator_headers(tag, modified))
+
+# Empty 304 response repeating the validators
+def not_modified(tag: str, modified=None):
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(tag, modified))
@@ -0,0 +1,92 @@
+import csv
+import io
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from ..models.models import Product
+from ..schemas.product import ProductCreate
+
+# Column order of the product CSV (a header row with these names is optional)
+COLUMNS = ("name", "description", "price", "in_stock")
+
+# Collapse a sorted list of ids into [first, last] ranges
+def id_ranges(ids):
+    ranges = []
+    for id in ids:
+        if ranges and id == ranges[-1][1] + 1:
+            ranges[-1][1] = id
+        else:
+            ranges.append([id, id])
+    return ranges
+
+# Stream product rows from a binary CSV file into the database in batches, returning a compact summary
+def import_products(db: Session, owner_id: int, binary_file, batch_size: int, max_errors: int):
+    summary = {"inserted": 0, "failed": 0, "ids": [], "errors": [], "errors_truncated": False}
+    inserted_ids = []
+
+    # Record a failed row, keeping at most max_errors messages in the response
+    def fail(line: int, message: str):
+        summary["failed"] += 1
+        if len(summary["errors"]) < max_errors:
+            summary["errors"].append({"row": line, "error": message})
+        else:
+            summary["errors_truncated"] = True
+
+    # Insert one batch with a single multi-row INSERT ... RETURNING and commit it
+    def flush(batch, lines):
+        try:
+            inserted_ids.extend(db.scalars(insert(Product).returning(Product.id), batch).all())
+            db.commit()
+            summary["inserted"] += len(batch)
+        except SQLAlchemyError as error:
+            # A rejected batch fails its own rows only; earlier batches are already committed
+            db.rollback()
+            for line in lines:
+                fail(line, f"Batch insert failed: {error.__class__.__name__}")
+
+    # Decode and parse the upload incrementally instead of reading it all into memory
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    batch, lines = [], []
+    try:
+        for row in reader:
+            # Skip blank lines and an optional header row
+            if not any(cell.strip() for cell in row):
+                continue
+            if reader.line_num == 1 and [cell.strip().lower() for cell in row] == list(COLUMNS):
+                continue
+
+            if len(row) not in (3, 4):
+                fail(reader.line_num, f"Expected 3 or 4 columns ({','.join(COLUMNS)}), got {len(row)}")
+                continue
+
+            # Validate the row with the same schema as POST /products/ (in_stock defaults to true when omitted)
+            try:
+                fields = {column: cell.strip() for column, cell in zip(COLUMNS, row)}
+                if not fields.get("in_stock"):
+                    fields.pop("in_stock", None)
+                data = ProductCreate(**fields)
+            except ValidationError as error:
+                fail(reader.line_num, "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors()))
+                continue
+
+            batch.append({**data.dict(), "owner_id": owner_id})
+            lines.append(reader.line_num)
+            if len(batch) >= batch_size:
+                flush(batch, lines)
+                batch, lines = [], []
+    except (csv.Error, UnicodeDecodeError) as error:
+        # The rest of the file is unreadable; keep what was already loaded and report where parsing stopped
+        fail(reader.line_num, f"Unreadable CSV: {error}")
+    finally:
+        # Detach the wrapper so closing it does not close the underlying upload
+        text.detach()
+
+    if batch:
+        flush(batch, lines)
+
+    summary["ids"] = id_ranges(sorted(inserted_ids))
+    return summary
@@ -0,0 +1,82 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import Literal, Optional
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from ..environment.config import settings
+from ..models.models import Order, Product
+
+# Streamed exports of the caller's products and orders. Rows are read as plain tuples (no ORM objects) from a
+# server-side cursor in partitions of export_batch_size, and each partition is encoded and sent before the next is
+# fetched, so memory stays bounded by one partition whatever the size of the export.
+
+# Export formats and their media types
+ExportFormat = Literal["ndjson", "csv"]
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Exported columns: the rows themselves, without the embedded owner/product of the JSON API
+PRODUCT_COLUMNS = (Product.id, Product.name, Product.description, Product.price, Product.in_stock, Product.stock,
+                   Product.owner_id, Product.created_at, Product.updated_at)
+ORDER_COLUMNS = (Order.id, Order.product_id, Order.quantity, Order.owner_id, Order.created_at, Order.updated_at)
+
+# Time range bound in UTC (naive datetimes are taken as UTC, like the stored timestamps)
+def utc(moment: Optional[datetime]):
+    if moment is None:
+        return None
+    return moment.astimezone(timezone.utc) if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+# Rows of model owned by owner_id created in [since, until), in (created_at, id) order, fetched in partitions
+def export_query(model, columns, owner_id: int, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    since, until = utc(since), utc(until)
+    if since and until and since >= until:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="since must be earlier than until")
+    query = select(*columns).filter(model.owner_id == owner_id)
+    if since:
+        query = query.filter(model.created_at >= since)
+    if until:
+        query = query.filter(model.created_at < until)
+    return (query.order_by(model.created_at, model.id)
+            .execution_options(stream_results=True, yield_per=settings.export_batch_size))
+
+# JSON/CSV form of a value (timestamps as ISO 8601)
+def plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+# Encode a partition of rows: one JSON object per line, or CSV lines
+def encode(format: str, keys: list, rows):
+    if format == "ndjson":
+        return "".join(json.dumps(dict(zip(keys, map(plain, row)))) + "\n" for row in rows).encode()
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([plain(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+# CSV header row (NDJSON has none)
+def header(format: str, keys: list):
+    return encode("csv", keys, [keys]) if format == "csv" else b""
+
+# Stream the rows of a query from a sync engine; StreamingResponse runs each step in the threadpool
+def stream_rows(engine, query, format: str):
+    keys = [column.key for column in query.selected_columns]
+    yield header(format, keys)
+    with engine.connect() as connection:
+        for partition in connection.execute(query).partitions():
+            yield encode(format, keys, partition)
+
+# Stream the rows of a query from an async engine
+async def stream_rows_async(engine, query, format: str):
+    keys = [column.key for column in query.selected_columns]
+    yield header(format, keys)
+    async with engine.connect() as connection:
+        result = await connection.stream(query)
+        async for partition in result.partitions():
+            yield encode(format, keys, partition)
+
+# Streaming response of an export, offered as a download named after the resource
+def export_response(rows, name: str, format: str):
+    return StreamingResponse(rows, media_type=MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="{name}.{format}"'})
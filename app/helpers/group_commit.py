@@ -0,0 +1,138 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+
+from ..db.config import SessionLocal
+from ..environment.config import settings
+from ..models.loaders import order_detail_options
+from ..models.models import Order
+from . import catalog
+from .inventory import reserve_stock
+
+# Group commit for POST /orders/ (ORDER_GROUP_COMMIT). Requests hand their order to one writer thread and wait.
+# The writer collects the orders arriving within order_group_commit_window_ms (at most
+# order_group_commit_max_size of them). It reserves their stock, inserts them with one multi-row
+# INSERT ... RETURNING and commits them in one transaction, so the group pays for one commit instead of one per
+# order. Every request is answered only after that commit, with its own order or its own 404/409. When the group
+# transaction fails, each of its orders is retried in a transaction of its own, so one bad order cannot fail the
+# others.
+
+# Orders waiting for the writer: (values, future); None asks the writer to stop
+_queue = queue.Queue()
+
+# Writer thread, started on first use
+_writer = None
+_writer_lock = threading.Lock()
+
+# Get (or lazily start) the writer thread
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run, name="order-group-commit", daemon=True)
+            _writer.start()
+        return _writer
+
+# Stop the writer once the orders already queued are written (used on shutdown)
+def shutdown_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _queue.put(None)
+            _writer.join(timeout=10)
+            _writer = None
+
+# Queue an order of owner_id; the future resolves to the committed, fully loaded Order or to the request's error
+def submit(owner_id: int, order):
+    future = Future()
+    get_writer()
+    _queue.put(({"owner_id": owner_id, **order.dict()}, future))
+    return future
+
+# Create an order through the writer, blocking until its group is committed
+def create_order(owner_id: int, order):
+    return submit(owner_id, order).result()
+
+# Async counterpart of create_order, awaiting the commit without blocking the event loop
+async def create_order_async(owner_id: int, order):
+    return await asyncio.wrap_future(submit(owner_id, order))
+
+# Next group: the first queued order plus whatever arrives within the window, up to the maximum size (None to stop)
+def _collect():
+    first = _queue.get()
+    if first is None:
+        return None
+    group = [first]
+    deadline = time.monotonic() + settings.order_group_commit_window_ms / 1000
+    while len(group) < settings.order_group_commit_max_size:
+        remaining = deadline - time.monotonic()
+        try:
+            item = _queue.get(timeout=remaining) if remaining > 0 else _queue.get_nowait()
+        except queue.Empty:
+            break
+        if item is None:
+            # Write this group first; the stop request is seen by the next _collect
+            _queue.put(None)
+            break
+        group.append(item)
+    return group
+
+# Writer loop
+def _run():
+    while True:
+        group = _collect()
+        if group is None:
+            return
+        _write(group)
+
+# Write a group, falling back to one transaction per order when the group transaction fails
+def _write(group):
+    try:
+        accepted, rejected = _commit_group(group)
+    except Exception as exc:
+        if len(group) == 1:
+            group[0][1].set_exception(exc)
+            return
+        for item in group:
+            _write([item])
+        return
+    for future, result in accepted:
+        future.set_result(result)
+    for future, exc in rejected:
+        future.set_exception(exc)
+
+# Reserve, insert and commit a group in one transaction; returns the (future, order) and (future, error) pairs to
+# resolve. A reservation that fails (404/409) writes nothing, so the others go ahead without a savepoint; its error
+# is only reported after the commit too, since it was decided against the group's uncommitted reservations.
+def _commit_group(group):
+    accepted, rejected = [], []
+    with SessionLocal(expire_on_commit=False) as db:
+        for values, future in group:
+            try:
+                reserve_stock(db, values["product_id"], values["quantity"])
+            except HTTPException as exc:
+                rejected.append((future, exc))
+                continue
+            accepted.append((future, values))
+        ids = []
+        if accepted:
+            ids = db.scalars(insert(Order).returning(Order.id, sort_by_parameter_order=True),
+                             [values for _, values in accepted]).all()
+        db.commit()
+        catalog.snapshot.invalidate({values["product_id"] for _, values in accepted})
+
+        # Load the new orders with their owner and product in one query; they stay usable once the session closes
+        orders = {}
+        try:
+            if ids:
+                orders = {order.id: order for order in db.scalars(
+                    select(Order).options(*order_detail_options()).filter(Order.id.in_(ids))).unique()}
+        except Exception as exc:
+            # Committed already: report the error rather than let _write retry (and duplicate) the orders
+            return [], rejected + [(future, exc) for future, _ in accepted]
+    return [(future, orders[id]) for (future, _), id in zip(accepted, ids)], rejected
@@ -0,0 +1,147 @@
+import random
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, delete, exists, insert, select, update
+from sqlalchemy.orm import Session
+
+from ..models.models import Product, ProductStockShard
+
+# Stock is reserved with conditional UPDATEs (`SET stock = stock - :q WHERE stock >= :q`): the check and the write
+# are one atomic statement, so concurrent orders can never oversell and no row is locked before it is written.
+# These functions take a sync Session; the async routers call them through AsyncSession.run_sync.
+# For stock-tracked products, in_stock is derived rather than set by the owner: it follows `stock > 0`, or whether any
+# counter shard still has stock for sharded products, and every reservation, release and restock keeps it current.
+# Owners take a tracked product off sale by setting its stock to 0.
+
+# SET value of in_stock for a product update: the owner's flag for untracked products, the derived one otherwise
+def updated_in_stock(in_stock: bool):
+    return case((Product.stock_shards.is_not(None), Product.in_stock),
+                (Product.stock.is_not(None), Product.stock > 0),
+                else_=in_stock)
+
+# Raise the 409 returned when a product cannot cover an order
+def insufficient_stock(product_id: int):
+    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Insufficient stock for product with id: {product_id}")
+
+# Reserve `quantity` units of a product inside the caller's transaction (404 if missing, 409 if not enough stock)
+def reserve_stock(db: Session, product_id: int, quantity: int):
+    # Fast path: one conditional UPDATE for unsharded products (untracked stock only requires in_stock)
+    reserved = db.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.in_stock.is_(True), Product.stock_shards.is_(None),
+               (Product.stock.is_(None)) | (Product.stock >= quantity))
+        .values(stock=Product.stock - quantity,
+                in_stock=case((Product.stock.is_(None), Product.in_stock), else_=Product.stock > quantity))
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if reserved is not None:
+        return
+
+    # Failure path: find out whether the product is missing, sold out, or keeps its stock in shards
+    product = db.execute(select(Product.stock_shards, Product.in_stock).filter(Product.id == product_id)).first()
+    if product is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with id: {product_id} was not found")
+    if not product.stock_shards or not product.in_stock:
+        insufficient_stock(product_id)
+    reserve_from_shards(db, product_id, quantity, product.stock_shards)
+
+# Reserve from the counter shards of a hot product, starting at a random shard to spread the row locks
+def reserve_from_shards(db: Session, product_id: int, quantity: int, shards: int):
+    start = random.randrange(shards)
+    for offset in range(shards):
+        reserved = db.execute(
+            update(ProductStockShard)
+            .where(ProductStockShard.product_id == product_id,
+                   ProductStockShard.shard == (start + offset) % shards,
+                   ProductStockShard.stock >= quantity)
+            .values(stock=ProductStockShard.stock - quantity)
+            .returning(ProductStockShard.stock)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if reserved is not None:
+            if reserved.stock == 0:
+                refresh_sharded_in_stock(db, product_id)
+            return
+
+    # No single shard covers the quantity: lock all shards in a fixed order and take from several of them
+    rows = db.execute(
+        select(ProductStockShard)
+        .filter(ProductStockShard.product_id == product_id)
+        .order_by(ProductStockShard.shard)
+        .with_for_update()
+    ).scalars().all()
+    available = sum(row.stock for row in rows)
+    if available < quantity:
+        insufficient_stock(product_id)
+    remaining = quantity
+    for row in rows:
+        taken = min(row.stock, remaining)
+        row.stock -= taken
+        remaining -= taken
+        if not remaining:
+            break
+    db.flush()
+    if available == quantity:
+        refresh_sharded_in_stock(db, product_id)
+
+# Recompute in_stock of a sharded product after a reservation emptied a shard. The product row is locked first so
+# concurrent depletions take turns, and the shards are then read in a statement of their own, which (under READ
+# COMMITTED) sees the shards the previous depletion emptied
+def refresh_sharded_in_stock(db: Session, product_id: int):
+    db.execute(select(Product.id).filter(Product.id == product_id).with_for_update())
+    db.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(in_stock=exists().where(ProductStockShard.product_id == product_id, ProductStockShard.stock > 0))
+        .execution_options(synchronize_session=False)
+    )
+
+# Give `quantity` units back to a product (cancelled or edited orders); untracked stock is left alone
+def release_stock(db: Session, product_id: int, quantity: int):
+    released = db.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.stock_shards.is_(None), Product.stock.is_not(None))
+        .values(stock=Product.stock + quantity, in_stock=Product.stock + quantity > 0)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if released is not None:
+        return
+
+    # Sharded products take the units back on a random shard, and are available again if they had sold out (the
+    # product row is only written, and locked, in that case)
+    shards = db.execute(select(Product.stock_shards).filter(Product.id == product_id)).scalar()
+    if shards:
+        db.execute(
+            update(ProductStockShard)
+            .where(ProductStockShard.product_id == product_id, ProductStockShard.shard == random.randrange(shards))
+            .values(stock=ProductStockShard.stock + quantity)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            update(Product)
+            .where(Product.id == product_id, Product.in_stock.is_(False))
+            .values(in_stock=True)
+            .execution_options(synchronize_session=False)
+        )
+
+# Set the stock of a product, either in the product row or split evenly over `shards` counter rows
+def set_stock(db: Session, product: Product, stock: int, shards: int):
+    db.execute(delete(ProductStockShard).where(ProductStockShard.product_id == product.id))
+    if shards:
+        per_shard, extra = divmod(stock, shards)
+        db.execute(insert(ProductStockShard), [
+            {"product_id": product.id, "shard": shard, "stock": per_shard + (1 if shard < extra else 0)}
+            for shard in range(shards)
+        ])
+        product.stock, product.stock_shards = None, shards
+    else:
+        product.stock, product.stock_shards = stock, None
+    product.in_stock = stock > 0
+
+# Current stock of a product: the product row, or the sum of its shards (None when stock is not tracked)
+def current_stock(db: Session, product: Product):
+    if not product.stock_shards:
+        return product.stock
+    return sum(db.scalars(select(ProductStockShard.stock).filter(ProductStockShard.product_id == product.id)))
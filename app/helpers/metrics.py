@@ -0,0 +1,196 @@
+import asyncio
+import bisect
+import functools
+import time
+from contextvars import ContextVar
+
+from fastapi import Response
+from fastapi.routing import APIRoute
+
+from ..db.replicas import all_engines
+from ..environment.config import settings
+
+# Request metrics kept per process and rendered in the Prometheus text format on /metrics. Request-level metrics
+# are only updated on the event loop thread, so they need no locks; the per-request stage timings (auth, db,
+# serialization) are accumulated in a dict carried by a context variable, which threadpool and greenlet code
+# share with the request that started them. The db stage comes from the statement timing of query_stats.
+
+# Upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Label value for requests that matched no route (keeps scanners from creating one series per path)
+UNMATCHED = "<unmatched>"
+
+# Escape a label value for the text format
+def escape(value: str):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+# Render a label set as {name="value",...}
+def format_labels(names: tuple, values: tuple):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+# Monotonic counter per label set
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple):
+        self.name, self.help, self.labels = name, help, labels
+        self.series = {}
+
+    def inc(self, labels: tuple, amount: float = 1):
+        self.series[labels] = self.series.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.series.items():
+            yield self.name, format_labels(self.labels, labels), value
+
+# Value that goes up and down per label set
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: tuple, amount: float = 1):
+        self.series[labels] = self.series.get(labels, 0) - amount
+
+# Bucketed distribution per label set
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple, buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self.series = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self):
+        for labels, (counts, total) in self.series.items():
+            running = 0
+            for bound, count in zip([str(bound) for bound in self.buckets] + ["+Inf"], counts):
+                running += count
+                yield f"{self.name}_bucket", format_labels(self.labels + ("le",), labels + (bound,)), running
+            yield f"{self.name}_sum", format_labels(self.labels, labels), total
+            yield f"{self.name}_count", format_labels(self.labels, labels), running
+
+# Metrics exported by the process
+requests_total = Counter("http_requests_total", "HTTP requests by route template and status code", ("method", "route", "status"))
+requests_in_progress = Gauge("http_requests_in_progress", "HTTP requests currently being served", ("method",))
+request_duration = Histogram("http_request_duration_seconds", "HTTP request latency by route template", ("method", "route"))
+stage_duration = Histogram("http_request_stage_duration_seconds",
+                           "Time a request spent in authentication, database calls and response serialization", ("route", "stage"))
+rate_limited_total = Counter("rate_limited_total", "Requests rejected by a rate limit", ("limit",))
+requests_shed_total = Counter("http_requests_shed_total", "Requests turned away with 503 by load shedding", ("reason",))
+deadline_exceeded_total = Counter("http_request_deadline_exceeded_total",
+                                  "Requests answered 504 because their deadline passed (statement timeouts included)",
+                                  ("method", "route"))
+METRICS = (requests_total, requests_in_progress, request_duration, stage_duration, rate_limited_total,
+           requests_shed_total, deadline_exceeded_total)
+
+# Stage timings of the request being served
+request_stages = ContextVar("request_stages", default=None)
+
+# Add time spent in a stage to the current request (a no-op outside instrumented requests)
+def record_stage(stage: str, seconds: float):
+    stages = request_stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+# Decorator timing a sync or async function (e.g. a dependency) as a stage of the current request
+def timed_stage(stage: str):
+    def decorator(function):
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    record_stage(stage, time.perf_counter() - started)
+        else:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    record_stage(stage, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+# When the endpoint of the request being served returned content for FastAPI to serialize, in a list the
+# endpoint fills in from a threadpool thread too
+endpoint_returned = ContextVar("endpoint_returned", default=None)
+
+# Wrap an endpoint so it notes when it returned (not for a Response, which FastAPI sends as it is)
+def mark_return(endpoint):
+    def mark(result):
+        returned = endpoint_returned.get()
+        if returned is not None and not isinstance(result, Response):
+            returned.append(time.perf_counter())
+        return result
+
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            return mark(await endpoint(*args, **kwargs))
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            return mark(endpoint(*args, **kwargs))
+    return wrapper
+
+# Route class of every router: times FastAPI's response validation and encoding as the "serialization" stage, from
+# the endpoint returning to the route handing back the rendered response (a plain APIRoute when metrics are off)
+class TimedRoute(APIRoute):
+    def get_route_handler(self):
+        if not settings.metrics_enabled:
+            return super().get_route_handler()
+        self.dependant.call = mark_return(self.dependant.call)
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            returned = []
+            token = endpoint_returned.set(returned)
+            try:
+                return await handler(request)
+            finally:
+                endpoint_returned.reset(token)
+                if returned:
+                    record_stage("serialization", time.perf_counter() - returned[0])
+
+        return timed_handler
+
+# Connection pool metrics, read from the instrumented pools at scrape time
+def pool_samples():
+    checked_out, waits = [], []
+    for name, engine in all_engines().items():
+        pool = engine.pool
+        checked_out.append((format_labels(("pool",), (name,)), pool.checkedout()))
+        stats = getattr(pool, "stats", None)
+        if stats is not None:
+            histogram = stats.histogram()
+            for bound, count in histogram["buckets"].items():
+                waits.append(("db_pool_checkout_wait_seconds_bucket", format_labels(("pool", "le"), (name, bound)), count))
+            waits.append(("db_pool_checkout_wait_seconds_sum", format_labels(("pool",), (name,)), histogram["sum"]))
+            waits.append(("db_pool_checkout_wait_seconds_count", format_labels(("pool",), (name,)), histogram["count"]))
+    lines = ["# HELP db_pool_checked_out Connections currently checked out of the pool", "# TYPE db_pool_checked_out gauge"]
+    lines += [f"db_pool_checked_out{labels} {value}" for labels, value in checked_out]
+    lines += ["# HELP db_pool_checkout_wait_seconds Time spent waiting for a pooled connection",
+              "# TYPE db_pool_checkout_wait_seconds histogram"]
+    lines += [f"{name}{labels} {value}" for name, labels, value in waits]
+    return lines
+
+# Everything in the Prometheus text exposition format
+def render():
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines += [f"{name}{labels} {value}" for name, labels, value in metric.samples()]
+    lines += pool_samples()
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,17 @@
+from fastapi import HTTPException, status
+from sqlalchemy import select
+
+# Writes carry the ownership check in their WHERE clause, so "no row affected" means the row is missing or owned
+# by someone else. These helpers tell the two apart with a primary-key lookup that only runs on that failure path.
+
+# Raise 404 when the row does not exist, 403 when it exists but belongs to another user
+def raise_missing_or_forbidden(db, model, id: int, name: str):
+    if db.execute(select(model.id).filter(model.id == id)).first() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{name} with id: {id} does not exist")
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform request action")
+
+# Async counterpart of raise_missing_or_forbidden
+async def raise_missing_or_forbidden_async(db, model, id: int, name: str):
+    if (await db.execute(select(model.id).filter(model.id == id))).first() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{name} with id: {id} does not exist")
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform request action")
@@ -0,0 +1,39 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import tuple_
+
+# Response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Encode the (created_at, id) position of a row as an opaque, URL-safe cursor
+def encode_cursor(row):
+    raw = json.dumps([row.created_at.isoformat(), row.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+# Decode a cursor produced by encode_cursor back into its (created_at, id) position
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+
+# Order a query (or select) on (created_at, id) and page it by cursor, falling back to limit/offset without one
+def paginate(query, model, limit: int, skip: int = 0, cursor: str = None):
+    query = query.order_by(model.created_at, model.id)
+    if cursor:
+        # Keyset: seek straight past the last row of the previous page using the (created_at, id) index
+        query = query.filter(tuple_(model.created_at, model.id) > tuple_(*decode_cursor(cursor)))
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+# Advertise the cursor of the next page when the current page came back full
+def set_next_cursor(response: Response, rows, limit: int):
+    if rows and len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1])
+    return rows
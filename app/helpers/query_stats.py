@@ -0,0 +1,101 @@
+import collections
+import logging
+import re
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from ..db.replicas import all_engines
+from ..environment.config import settings
+from .metrics import record_stage
+
+# SQL instrumentation: every statement on every engine is timed and added to the statistics of the request that
+# ran it (query count, database time and how often each statement shape ran) and to its "db" metrics stage,
+# statements slower than slow_query_seconds are logged, and the QueryStatsMiddleware reports the statistics and
+# flags N+1 patterns. This is the only statement timing of the app.
+logger = logging.getLogger(__name__)
+
+# Parameter names whose values are never logged, even with slow_query_log_parameters
+SENSITIVE_PARAMETERS = re.compile(r"password|secret|token|hash|email", re.IGNORECASE)
+
+# Bind placeholders of the supported drivers: %(name)s, %s, ?, :name and $1
+PLACEHOLDER = r"(?:%\(\w+\)s|%s|\?|:\w+|\$\d+)"
+
+# A list of placeholders, as rendered for IN (...) and multi-row VALUES; collapsed so the length does not matter
+PLACEHOLDER_LIST = re.compile(rf"\(\s*{PLACEHOLDER}(?:\s*,\s*{PLACEHOLDER})*\s*\)")
+
+# Query statistics of one request
+class RequestQueries:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = collections.Counter()
+
+# Statistics of the request being served (None outside requests, e.g. during start-up)
+request_queries = ContextVar("request_queries", default=None)
+
+# Statement shape used to spot repeated statements: whitespace and placeholder lists normalised
+def statement_shape(statement: str):
+    return PLACEHOLDER_LIST.sub("(?)", " ".join(statement.split()))
+
+# Loggable form of a value: its type only, unless parameter logging is on and the name is not sensitive
+def redact_value(name, value):
+    if not settings.slow_query_log_parameters or (name is not None and SENSITIVE_PARAMETERS.search(str(name))):
+        return f"<{type(value).__name__}>"
+    return repr(value) if len(repr(value)) <= 200 else repr(value)[:200] + "..."
+
+# Loggable form of a statement's parameters (a dict, a sequence, or a list of them for executemany); positional
+# parameters are named after the bind parameters of the compiled statement so sensitive ones are still redacted
+def redact(parameters, executemany: bool = False, names=None):
+    if executemany:
+        sets = list(parameters)
+        return f"{redact(sets[0], names=names) if sets else '()'} (+{max(len(sets) - 1, 0)} more parameter sets)"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{name!r}: {redact_value(name, value)}" for name, value in parameters.items()) + "}"
+    names = list(names or ())
+    return "(" + ", ".join(redact_value(names[index] if index < len(names) else "", value)
+                           for index, value in enumerate(parameters or ())) + ")"
+
+# Bind parameter names of a positional statement, in order (None when unknown, e.g. for textual SQL)
+def positional_names(context):
+    compiled = getattr(context, "compiled", None)
+    return getattr(compiled, "positiontup", None)
+
+# Time every statement of an engine, attribute it to the current request (statistics and metrics) and log it when
+# it is slow
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_stats_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_stats_started"].pop()
+        record_stage("db", seconds)
+        queries = request_queries.get()
+        if queries is not None:
+            queries.count += 1
+            queries.seconds += seconds
+            queries.shapes[statement_shape(statement)] += 1
+        if settings.slow_query_seconds and seconds >= settings.slow_query_seconds:
+            logger.warning("slow query (%.1f ms) on %s: %s parameters=%s", seconds * 1000, engine.url.database,
+                           " ".join(statement.split()), redact(parameters, executemany, positional_names(context)))
+
+    @event.listens_for(engine, "handle_error")
+    def on_error(context):
+        started = context.connection.info.get("query_stats_started") if context.connection is not None else None
+        if started:
+            record_stage("db", time.perf_counter() - started.pop())
+
+# Hook the instrumentation into every engine (called once at import of the app)
+def instrument():
+    for engine in all_engines().values():
+        instrument_engine(engine)
+
+# Statement shapes that ran more than n_plus_one_threshold times in one request, most repeated first
+def repeated_statements(queries: RequestQueries):
+    threshold = settings.n_plus_one_threshold
+    if not threshold:
+        return []
+    return [(shape, count) for shape, count in queries.shapes.most_common() if count > threshold]
@@ -0,0 +1,124 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security.oauth2 import OAuth2PasswordRequestForm
+
+from ..environment.config import settings
+from . import metrics
+
+# Token-bucket rate limiting for POST /login. Every client IP and every username has a bucket holding up to
+# `burst` tokens that refills at `per_minute` tokens a minute; an attempt takes one token from both, and is
+# rejected with 429 before any database or bcrypt work when either bucket is empty.
+
+# Per-process buckets in a bounded LRU; thread-safe, so it works from sync and async code alike
+class MemoryBackend:
+    # Calls are cheap and never block, so they run directly on the event loop
+    blocking = False
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Take a token from the bucket of key; returns (allowed, seconds until a token is available)
+    def take(self, key: str, burst: int, per_second: float):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * per_second)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # Evicting the least recently used bucket forgets it, i.e. refills it
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / per_second
+
+    # Drop every bucket
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+# Atomic token bucket in Redis: KEYS[1] = bucket, ARGV = burst, tokens per second; uses the server clock so every
+# worker process and host sees the same buckets
+REDIS_TAKE = """
+local burst, per_second = tonumber(ARGV[1]), tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = math.min(burst, (tonumber(bucket[1]) or burst) + (now - (tonumber(bucket[2]) or now)) * per_second)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / per_second) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+# Buckets shared by every worker through Redis (needs the optional `redis` package)
+class RedisBackend:
+    # Calls are network round trips, so async handlers run them in the threadpool
+    blocking = True
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("RATE_LIMIT_BACKEND points at Redis but the `redis` package is not installed") from exc
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(REDIS_TAKE)
+
+    def take(self, key: str, burst: int, per_second: float):
+        allowed, tokens = self.script(keys=[f"rate-limit:{key}"], args=[burst, per_second])
+        return bool(allowed), 0.0 if allowed else (1 - float(tokens)) / per_second
+
+    def clear(self):
+        for key in self.client.scan_iter("rate-limit:*"):
+            self.client.delete(key)
+
+# Backend selected by RATE_LIMIT_BACKEND: "memory", or a redis:// / rediss:// URL
+def create_backend(spec: str):
+    if spec == "memory":
+        return MemoryBackend(settings.rate_limit_max_keys)
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(spec)
+    raise ValueError(f"Unsupported rate limit backend: {spec}")
+
+backend = create_backend(settings.rate_limit_backend)
+
+# Client address used for the per-IP bucket (the first X-Forwarded-For hop when the proxy is trusted)
+def client_ip(request: Request):
+    if settings.rate_limit_trust_forwarded_for:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+# Take a token from a bucket, raising 429 with Retry-After when it is empty
+async def take(limit: str, key: str, burst: int, per_minute: float):
+    if backend.blocking:
+        allowed, retry_after = await run_in_threadpool(backend.take, f"{limit}:{key}", burst, per_minute / 60)
+    else:
+        allowed, retry_after = backend.take(f"{limit}:{key}", burst, per_minute / 60)
+    if not allowed:
+        metrics.rate_limited_total.inc((limit,))
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            detail="Too many login attempts, please retry later",
+                            headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+# Dependency of POST /login: admits the attempt or rejects it before the handler touches the database (FastAPI
+# reuses the parsed form for the handler's own OAuth2PasswordRequestForm dependency)
+async def limit_login(request: Request, user_credentials: OAuth2PasswordRequestForm = Depends()):
+    if not settings.login_rate_limit_enabled:
+        return
+    await take("login_ip", client_ip(request), settings.login_ip_burst, settings.login_ip_per_minute)
+    await take("login_username", user_credentials.username.strip().lower(),
+               settings.login_username_burst, settings.login_username_per_minute)
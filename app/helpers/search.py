@@ -0,0 +1,56 @@
+import re
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, case, false, func, or_
+
+from ..models.models import Product, SEARCH_CONFIG, search_document
+from .pagination import paginate
+
+# Longest search string accepted, so a single request cannot build an arbitrarily large query
+MAX_SEARCH_LENGTH = 200
+
+# Narrow a product query (or select) to the requested availability and price range
+def filter_products(query, in_stock: bool = None, min_price: int = None, max_price: int = None):
+    if in_stock is not None:
+        query = query.filter(Product.in_stock == in_stock)
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    return query
+
+# Words and "quoted phrases" of a search string
+SEARCH_TERMS = re.compile(r'"([^"]+)"|(\S+)')
+
+# Escape LIKE wildcards in a search term
+def like_pattern(term: str):
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+# Restrict a product query (or select) to rows matching `search` and order it by relevance, then id.
+# Postgres: web-search syntax ("quoted phrases", -excluded, or) against the GIN-indexed tsvector, ranked by
+# ts_rank. Other databases (SQLite in local runs): every word or quoted phrase must appear in the name or
+# description; name matches rank first.
+def search_products(query, dialect: str, search: str):
+    search = search.strip()[:MAX_SEARCH_LENGTH]
+    if dialect == "postgresql":
+        document = search_document(Product.name, Product.description)
+        tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, search)
+        return query.filter(document.op("@@")(tsquery)).order_by(func.ts_rank(document, tsquery).desc(), Product.id)
+
+    patterns = [like_pattern(phrase or word.strip('"')) for phrase, word in SEARCH_TERMS.findall(search)
+                if phrase or word.strip('"')]
+    if not patterns:
+        return query.filter(false())
+    matches = [or_(Product.name.ilike(pattern, escape="\\"), Product.description.ilike(pattern, escape="\\"))
+               for pattern in patterns]
+    name_matches = sum(case((Product.name.ilike(pattern, escape="\\"), 1), else_=0) for pattern in patterns)
+    return query.filter(and_(*matches)).order_by(name_matches.desc(), Product.id)
+
+# Page a product query (or select): the best matches first, by limit and offset, when searching (cursors do not
+# apply to a relevance order), otherwise on (created_at, id) by cursor or by limit and offset
+def page_products(query, dialect: str, search: str, limit: int, skip: int = 0, cursor: str = None):
+    if not (search and search.strip()):
+        return paginate(query, Product, limit, skip, cursor)
+    if cursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor pagination is not available with search, use skip")
+    return search_products(query, dialect, search).offset(skip).limit(limit)
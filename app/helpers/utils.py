@@ -1,12 +1,110 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from passlib.context import CryptContext
 
-# Create a CryptContext instance for password hashing using the bcrypt scheme
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Import the hashing configuration from the environment config module
+from ..environment.config import settings
+
+# Create a CryptContext instance for password hashing using the bcrypt scheme at the configured cost factor;
+# hashes made with fewer rounds are reported as needing an update by verify_and_update
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto",
+                           bcrypt__rounds=settings.bcrypt_rounds, bcrypt__min_rounds=settings.bcrypt_rounds)
+
+# Dedicated, size-limited process pool for bcrypt, created on first use (spawned, never forked from a threaded server)
+_executor = None
+_executor_lock = threading.Lock()
+
+# Hashing jobs currently running or waiting for a worker, bounded by workers + max queue
+_pending = 0
+_pending_lock = threading.Lock()
+
+# Get (or lazily start) the hashing process pool
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=settings.password_hash_workers,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+# Stop the hashing process pool (used on shutdown)
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+# Start every hashing worker (or load the bcrypt backend inline) with one throwaway hash each, so the first
+# sign-ups and logins do not pay for process start-up and passlib's backend self-test
+def warm_up():
+    if settings.password_hash_workers <= 0:
+        _hash("warm-up")
+        return
+    futures = [get_executor().submit(_hash, "warm-up") for _ in range(settings.password_hash_workers)]
+    for future in futures:
+        future.result()
+
+# Release an admission slot once a job finished
+def _release(_future=None):
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+# Submit a hashing job to the process pool, failing fast with a 503 when the queue is full
+def _submit(function, *args):
+    global _pending
+    with _pending_lock:
+        if _pending >= settings.password_hash_workers + settings.password_hash_max_queue:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Server busy, please retry shortly",
+                                headers={"Retry-After": "1"})
+        _pending += 1
+    try:
+        future = get_executor().submit(function, *args)
+    except Exception:
+        _release()
+        raise
+    future.add_done_callback(_release)
+    return future
+
+# Worker-side functions (module level so they can be pickled into the pool processes)
+def _hash(password: str):
+    return pwd_context.hash(password)
+
+def _verify_and_update(plain_password: str, hashed_password: str):
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+# Run a hashing function in the pool, or inline when the pool is disabled (password_hash_workers = 0)
+def _run(function, *args):
+    if settings.password_hash_workers <= 0:
+        return function(*args)
+    return _submit(function, *args).result()
+
+async def _run_async(function, *args):
+    if settings.password_hash_workers <= 0:
+        return await run_in_threadpool(function, *args)
+    return await asyncio.wrap_future(_submit(function, *args))
 
 # Function to hash a password using the configured CryptContext instance
 def hash(password: str):
-    return pwd_context.hash(password)
+    return _run(_hash, password)
 
 # Function to verify a plain password against a hashed password using the configured CryptContext instance
 def verify(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return _run(_verify_and_update, plain_password, hashed_password)[0]
+
+# Verify a password and get a replacement hash when the stored one uses an outdated cost: (valid, new_hash or None)
+def verify_and_update(plain_password, hashed_password):
+    return _run(_verify_and_update, plain_password, hashed_password)
+
+# Async counterparts awaiting the pool without blocking the event loop
+async def hash_async(password: str):
+    return await _run_async(_hash, password)
+
+async def verify_and_update_async(plain_password, hashed_password):
+    return await _run_async(_verify_and_update, plain_password, hashed_password)
@@ -0,0 +1,97 @@
+import time
+import types
+import typing
+from datetime import datetime, timezone
+from inspect import isclass
+
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, EmailStr
+from sqlalchemy import text
+
+from ..db.config import engine, async_engine
+from ..environment.config import settings
+from . import utils
+
+# Startup warm-up run by the lifespan handler before the worker reports ready: open pooled connections, push sample
+# payloads through every request/response model, and start the password hashing workers, so the first real requests
+# do not pay for any of it
+
+# Set once the warm-up finished (readiness), with the seconds spent in each step
+ready = False
+timings = {}
+
+# Placeholder values used to build sample payloads for the schemas
+SAMPLES = {int: 1, float: 1.0, str: "warmup", bool: True, EmailStr: "warmup@example.com"}
+
+# Build a sample value for a type annotation (models become dicts of sample field values)
+def sample_value(annotation):
+    origin = typing.get_origin(annotation)
+    if origin in (typing.Union, types.UnionType):
+        return sample_value(next(arg for arg in typing.get_args(annotation) if arg is not type(None)))
+    if origin in (list, set, tuple):
+        return [sample_value(typing.get_args(annotation)[0])]
+    if origin is dict:
+        return {}
+    if isclass(annotation) and issubclass(annotation, BaseModel):
+        return {name: sample_value(field.annotation) for name, field in annotation.model_fields.items()}
+    if annotation is datetime:
+        return datetime.now(timezone.utc)
+    return SAMPLES.get(annotation)
+
+# Open `connections` pooled connections at once and hand them back, so the pool starts with live connections
+def warm_pool(connections: int):
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = engine.connect()
+            opened.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            connection.close()
+
+async def warm_async_pool(connections: int):
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = await async_engine.connect()
+            opened.append(connection)
+            await connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            await connection.close()
+
+# Validate and serialize a sample payload through the body and response model of every route
+def warm_serializers(app: FastAPI):
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        for field in (route.body_field, route.response_field):
+            if field is None:
+                continue
+            # Invalid samples still exercise the validator; only valid ones can be serialized
+            value, errors = field.validate(sample_value(field.type_), {}, loc=("warmup",))
+            if not errors:
+                field.serialize(value, mode="json")
+
+# Run the warm-up steps enabled in the settings, timing each of them, then report the worker as ready
+async def warm_up(app: FastAPI):
+    global ready
+    steps = []
+    connections = min(settings.warmup_db_connections, settings.db_pool_size)
+    if connections > 0:
+        steps.append(("db_pool", lambda: run_in_threadpool(warm_pool, connections)))
+        if async_engine is not None:
+            steps.append(("async_db_pool", lambda: warm_async_pool(connections)))
+    if settings.warmup_serializers:
+        steps.append(("serializers", lambda: run_in_threadpool(warm_serializers, app)))
+    if settings.warmup_password_hashing:
+        steps.append(("password_hashing", lambda: run_in_threadpool(utils.warm_up)))
+
+    for name, step in steps:
+        started = time.perf_counter()
+        await step()
+        timings[name] = round(time.perf_counter() - started, 4)
+    ready = True
@@ -1,22 +1,113 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, APIRouter
+from fastapi.concurrency import run_in_threadpool
 
 # Import modules related to models, database configuration, routes, and environment settings
 from .models import models
-from .db.config import engine
-from .routes import product, user, auth, order
-from .environment.config import Settings
+from .db.config import engine, async_engine
+from .db import replicas
+from .routes import product, user, auth, order, internal, metrics
+from .environment.config import Settings, settings
+from .helpers import utils, warmup, group_commit, catalog
+from .helpers import metrics as request_metrics, query_stats
+from .middleware.read_your_writes import ReadYourWritesMiddleware
+from .middleware.metrics import MetricsMiddleware
+from .middleware.query_stats import QueryStatsMiddleware
+from .middleware.compression import CompressionMiddleware
+from .middleware.load_shedding import LoadSheddingMiddleware
 
-# Create database tables based on the defined models
-models.Base.metadata.create_all(bind=engine)
+# Start-up and shutdown work runs here rather than at import, so `import app.main` stays cheap
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Development shortcut: create missing tables straight from the models (the schema is otherwise managed by
+    # `alembic upgrade head`, see migrations/)
+    if settings.db_create_all:
+        await run_in_threadpool(models.Base.metadata.create_all, bind=engine)
 
-# Initialize the FastAPI application
-app = FastAPI()
+    # Check the read replicas once before serving, then keep re-checking them in the background
+    health_checks = None
+    if replicas.replicas:
+        await run_in_threadpool(replicas.check_replicas)
+        health_checks = asyncio.create_task(replicas.run_health_checks())
+
+    # Load the in-memory product catalog and start refreshing it
+    if settings.catalog_snapshot_enabled:
+        await run_in_threadpool(catalog.start)
+
+    # Pre-warm the pool, serializers and hashing workers; GET /internal/ready answers 200 only after this
+    await warmup.warm_up(app)
+    yield
+
+    # Stop reporting ready, the replica health checks and the password hashing worker processes on shutdown
+    warmup.ready = False
+    if health_checks is not None:
+        health_checks.cancel()
+    utils.shutdown_executor()
+
+    # Write the orders still waiting for a group commit, then stop the writer thread
+    await run_in_threadpool(group_commit.shutdown_writer)
+
+    # Stop refreshing the product catalog
+    await run_in_threadpool(catalog.stop)
+
+    # Close the async pools' connections while their event loop is still running
+    for pool_engine in (async_engine, *(replica.async_engine for replica in replicas.replicas)):
+        if pool_engine is not None:
+            await pool_engine.dispose()
+
+# Initialize the FastAPI application; its own routes (/) use the routers' route class too
+app = FastAPI(lifespan=lifespan)
+app.router.route_class = request_metrics.TimedRoute
+
+# With read replicas, clients that just wrote read from the primary for a few seconds (read-your-writes)
+if replicas.replicas:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+# Per-request SQL statistics and metrics timing, the slow-query log and the N+1 detector
+query_stats.instrument()
+app.add_middleware(QueryStatsMiddleware)
+
+# Compression of large responses (list pages) with the best encoding the client accepts
+if settings.compression_enabled:
+    app.add_middleware(CompressionMiddleware)
+
+# Load shedding and request deadlines, outside the other middlewares so shed requests cost as little as possible
+app.add_middleware(LoadSheddingMiddleware)
+
+# Per-route request metrics, added last so the middleware wraps (and times) everything else; the database stage is
+# timed by the SQL instrumentation above, the serialization stage by the routers' TimedRoute class
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+# Keep only the routes of a sync router that the matching async router does not serve itself
+def sync_only_routes(sync_router: APIRouter, async_router: APIRouter):
+    served = {(route.path_format, method) for route in async_router.routes for method in route.methods}
+    remaining = APIRouter()
+    remaining.routes.extend(route for route in sync_router.routes
+                            if not any((route.path_format, method) in served for method in route.methods))
+    return remaining
 
 # Include routers for different components (user, authentication, product, and order)
-app.include_router(user.router)
-app.include_router(auth.router)
-app.include_router(product.router)
-app.include_router(order.router)
+if settings.async_database:
+    # Async mode: AsyncSession handlers serve the CRUD routes, the sync routers keep serving everything else
+    from .routes import async_product, async_user, async_auth, async_order
+    for sync_router, async_router in ((user.router, async_user.router), (auth.router, async_auth.router),
+                                      (product.router, async_product.router), (order.router, async_order.router)):
+        app.include_router(async_router)
+        app.include_router(sync_only_routes(sync_router, async_router))
+else:
+    app.include_router(user.router)
+    app.include_router(auth.router)
+    app.include_router(product.router)
+    app.include_router(order.router)
+
+# Include the operational endpoints (pool and cache statistics, readiness)
+app.include_router(internal.router)
+
+# Include the Prometheus scrape endpoint
+if settings.metrics_enabled:
+    app.include_router(metrics.router)
 
 # Define a simple root endpoint returning the docs path
 @app.get("/")
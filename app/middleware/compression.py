@@ -0,0 +1,85 @@
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from ..environment.config import settings
+from ..helpers.compression import enabled_encoders, negotiate, is_compressible
+
+# Bodies up to this size are compressed on the event loop (tens of microseconds); larger ones in the threadpool,
+# where zlib, brotli and zstd release the GIL
+INLINE_MAX_SIZE = 16 * 1024
+
+# Run a compression step inline for small inputs and in the threadpool for large ones
+async def run_compression(function, data: bytes):
+    if len(data) <= INLINE_MAX_SIZE:
+        return function(data)
+    return await run_in_threadpool(function, data)
+
+# ASGI middleware compressing responses with the best encoding the client accepts (Accept-Encoding). Bodies sent
+# in one piece are compressed when at least compression_min_size bytes long; streamed bodies are compressed chunk
+# by chunk, flushing after each so clients still receive them progressively
+class CompressionMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.encoders = enabled_encoders()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            return await self.app(scope, receive, send)
+        encoder = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encoders)
+        if encoder is None:
+            return await self.app(scope, receive, send)
+
+        # The start message is held back until the first body chunk shows whether (and how) to compress
+        start = None
+        passthrough = False
+        stream = None
+
+        # Rewrite the held start message for an encoded body (Content-Length is set for one-shot bodies only)
+        def encoded_start(length: int = None):
+            headers = MutableHeaders(raw=list(start["headers"]))
+            headers["Content-Encoding"] = encoder.name
+            headers.add_vary_header("Accept-Encoding")
+            del headers["Content-Length"]
+            if length is not None:
+                headers["Content-Length"] = str(length)
+            # The encoded bytes differ from the identity representation, so a strong ETag becomes weak
+            etag = headers.get("ETag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            return {**start, "headers": headers.raw}
+
+        async def send_compressed(message):
+            nonlocal start, passthrough, stream
+            if message["type"] == "http.response.start":
+                start = message
+                headers = Headers(raw=start["headers"])
+                passthrough = start["status"] < 200 or start["status"] in (204, 304) or not is_compressible(
+                    headers.get("content-type", ""), headers.get("content-encoding", ""))
+                if passthrough:
+                    await send(start)
+                return
+            if passthrough or message["type"] != "http.response.body":
+                return await send(message)
+
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if stream is None and start is not None:
+                # Whole body in one message: compress it in one go, or send it as is when it is small
+                if not more_body:
+                    if len(body) < settings.compression_min_size:
+                        await send(start)
+                    else:
+                        body = await run_compression(encoder.compress, body)
+                        await send(encoded_start(len(body)))
+                    start = None
+                    return await send({**message, "body": body})
+                # Streamed body: switch to the incremental compressor
+                stream = encoder.stream()
+                await send(encoded_start())
+                start = None
+
+            chunk = await run_compression(stream.compress, body) if body else b""
+            if not more_body:
+                chunk += stream.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
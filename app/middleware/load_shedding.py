@@ -0,0 +1,55 @@
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+from ..db.deadlines import Deadline, request_deadline
+from ..db.replicas import all_engines
+from ..environment.config import settings
+from ..helpers.metrics import requests_shed_total, deadline_exceeded_total
+from .metrics import route_template
+
+# Paths never shed: scrapes and the readiness/health routes must keep answering while the process is overloaded
+EXEMPT_PATHS = ("/metrics", "/internal/")
+
+# Why the process is overloaded right now ("in_flight" or "pool_wait"), or None when it can take new work
+def overload_reason(in_flight: int):
+    if settings.shed_max_in_flight and in_flight >= settings.shed_max_in_flight:
+        return "in_flight"
+    if settings.shed_max_pool_wait_seconds:
+        for engine in all_engines().values():
+            stats = getattr(engine.pool, "stats", None)
+            if stats is not None and stats.longest_wait() > settings.shed_max_pool_wait_seconds:
+                return "pool_wait"
+    return None
+
+# ASGI middleware admitting requests: new requests are answered 503 (with Retry-After) while shed_max_in_flight
+# requests are in progress or a pooled connection checkout has been waiting longer than shed_max_pool_wait_seconds,
+# so an overloaded process turns work away at once instead of queueing it until clients time out. Admitted requests
+# get their deadline (see db/deadlines), and those that run out of it are counted per route.
+class LoadSheddingMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = 0
+        # Route template per endpoint, filled in as deadlines are exceeded
+        self.templates = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        reason = None if scope["path"].startswith(EXEMPT_PATHS) else overload_reason(self.in_flight)
+        if reason is not None:
+            requests_shed_total.inc((reason,))
+            response = JSONResponse({"detail": "Server overloaded, please retry shortly"},
+                                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"})
+            return await response(scope, receive, send)
+
+        deadline = Deadline()
+        token = request_deadline.set(deadline)
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            request_deadline.reset(token)
+            if deadline.exceeded:
+                deadline_exceeded_total.inc((scope["method"], route_template(scope, self.templates)))
@@ -0,0 +1,51 @@
+import time
+
+from ..helpers.metrics import UNMATCHED, request_stages, requests_total, requests_in_progress, request_duration, stage_duration
+
+# Route template of a request (e.g. /products/{id}), looked up from the endpoint the router matched and stored in
+# the scope, so requests are not matched against the route table a second time
+def route_template(scope, templates: dict):
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return UNMATCHED
+    template = templates.get(endpoint)
+    if template is None:
+        template = templates[endpoint] = next((route.path_format for route in scope["app"].router.routes
+                                               if getattr(route, "endpoint", None) is endpoint), UNMATCHED)
+    return template
+
+# ASGI middleware counting requests and timing them per route template
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+        # Route template per endpoint, filled in as endpoints are first hit
+        self.templates = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status_code = 500
+        stages = {}
+        token = request_stages.set(stages)
+        requests_in_progress.inc((method,))
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = route_template(scope, self.templates)
+            request_duration.observe((method, route), elapsed)
+            requests_in_progress.dec((method,))
+            requests_total.inc((method, route, str(status_code)))
+            for stage, seconds in stages.items():
+                stage_duration.observe((route, stage), seconds)
+            request_stages.reset(token)
@@ -1,9 +1,14 @@
-from ..db.config import get_db
+from collections import namedtuple
+from ..db.config import get_db, get_async_db
 from ..models.models import User
 from fastapi import Depends, status, HTTPException
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..environment.config import settings
+from ..helpers.cache import TTLCache
+from ..helpers.metrics import timed_stage
 from .validate_jwt import verify_access_token
 
 # Create an OAuth2PasswordBearer instance for handling token retrieval from the 'login' endpoint
@@ -14,18 +19,82 @@ SECRECT_KEY = settings.secret_key
 ALGORITHM = settings.algorithm
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
 
-# Dependency function to get the current user based on the provided token and database session
+# Detached snapshot of the user fields handlers need (the password hash is deliberately left out)
+CurrentUser = namedtuple("CurrentUser", ["id", "fullname", "email", "created_at"])
+
+# Per-process cache of authenticated users keyed by user id; the TTL bounds staleness across worker processes
+user_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl)
+
+# Snapshot a User row for the cache
+def snapshot(user: User):
+    return CurrentUser(id=user.id, fullname=user.fullname, email=user.email, created_at=user.created_at)
+
+# Drop a user from the cache after it was updated or deleted
+def invalidate_user(id: int):
+    user_cache.pop(id)
+
+# Dependency function to get the current user based on the provided token and database session (timed as the
+# "auth" stage of the request metrics, including its user lookup)
+@timed_stage("auth")
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     # Define an HTTPException for unauthorized access
-    credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, 
-                                          detail=f"Could not validate credentials", 
+    credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                                          detail=f"Could not validate credentials",
+                                          headers={"WWW-Authenticate": "Bearer"})
+
+    # Verify the access token using the validate_jwt module
+    token = verify_access_token(token, credentials_exception)
+    user_id = int(token.id)
+
+    # Serve the user from the cache when enabled, skipping the database round trip
+    if settings.user_cache_enabled:
+        user = user_cache.get(user_id)
+        if user is not None:
+            return user
+
+    # Query the database for the user associated with the provided token's user ID
+    user = db.query(User).filter(User.id == user_id).first()
+
+    # A token for a deleted user is no longer valid
+    if user is None:
+        raise credentials_exception
+
+    if settings.user_cache_enabled:
+        user = snapshot(user)
+        user_cache.set(user_id, user)
+
+    # Return the user
+    return user
+
+# Async counterpart of get_current_user for the AsyncSession routers
+@timed_stage("auth")
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    # Define an HTTPException for unauthorized access
+    credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                                          detail=f"Could not validate credentials",
                                           headers={"WWW-Authenticate": "Bearer"})
-    
+
     # Verify the access token using the validate_jwt module
     token = verify_access_token(token, credentials_exception)
+    user_id = int(token.id)
+
+    # Serve the user from the cache when enabled, skipping the database round trip
+    if settings.user_cache_enabled:
+        user = user_cache.get(user_id)
+        if user is not None:
+            return user
 
     # Query the database for the user associated with the provided token's user ID
-    user = db.query(User).filter(User.id == token.id).first()
+    result = await db.execute(select(User).filter(User.id == user_id))
+    user = result.scalars().first()
+
+    # A token for a deleted user is no longer valid
+    if user is None:
+        raise credentials_exception
+
+    if settings.user_cache_enabled:
+        user = snapshot(user)
+        user_cache.set(user_id, user)
 
     # Return the user
     return user
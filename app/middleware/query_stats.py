@@ -0,0 +1,31 @@
+from ..environment.config import settings
+from ..helpers.query_stats import RequestQueries, request_queries, repeated_statements, logger
+
+# ASGI middleware collecting the SQL statements of each request: in debug mode their count and total time are
+# returned in the X-DB-Query-Count and X-DB-Query-Time response headers (statements run after the response
+# started, e.g. by a streaming body, are not included), and repeated statement shapes are logged as N+1 suspects
+class QueryStatsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        queries = RequestQueries()
+        token = request_queries.set(queries)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start" and settings.debug:
+                headers = [(b"x-db-query-count", str(queries.count).encode()),
+                           (b"x-db-query-time", f"{queries.seconds * 1000:.2f}ms".encode())]
+                message = {**message, "headers": [*message.get("headers", []), *headers]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            request_queries.reset(token)
+            for shape, count in repeated_statements(queries):
+                logger.warning("possible N+1: %s %s ran the same statement %d times: %s",
+                               scope["method"], scope["path"], count, shape)
@@ -0,0 +1,24 @@
+import math
+import time
+
+from ..db.replicas import READ_PRIMARY_COOKIE
+from ..environment.config import settings
+
+# ASGI middleware marking clients that just wrote, so their next reads skip the (possibly lagging) replicas
+class ReadYourWritesMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            return await self.app(scope, receive, send)
+
+        async def send_with_cookie(message):
+            # Successful writes pin the client's reads to the primary for read_your_writes_seconds
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                seconds = settings.read_your_writes_seconds
+                cookie = f"{READ_PRIMARY_COOKIE}={time.time() + seconds:.3f}; Max-Age={math.ceil(seconds)}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
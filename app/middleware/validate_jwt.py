@@ -1,7 +1,10 @@
+import hashlib
+import time
 from jose import JWTError, jwt
 from ..schemas import user
 from fastapi.security import OAuth2PasswordBearer
 from ..environment.config import settings
+from ..helpers.cache import TTLCache
 
 # Create an OAuth2PasswordBearer instance for handling token retrieval from the 'login' endpoint
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='login')
@@ -11,8 +14,18 @@ SECRECT_KEY = settings.secret_key
 ALGORITHM = settings.algorithm
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
 
+# Cache of already verified tokens keyed by a hash of the token string; each entry expires with its token
+token_cache = TTLCache(maxsize=settings.jwt_cache_size, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
 # Function to verify and decode an access token
 def verify_access_token(token: str, credentials_exception):
+    # Serve tokens verified earlier from the cache, skipping the parse and signature check
+    if settings.jwt_cache_enabled:
+        cache_key = hashlib.sha256(token.encode()).digest()
+        token_data = token_cache.get(cache_key)
+        if token_data is not None:
+            return token_data
+
     try:
         # Decode the JWT (JSON Web Token) using the specified secret key and algorithm
         payload = jwt.decode(token, SECRECT_KEY, algorithms=[ALGORITHM])
@@ -30,6 +43,12 @@ def verify_access_token(token: str, credentials_exception):
     except JWTError:
         # Raise an exception if there's an error decoding the token
         raise credentials_exception
+
+    # Remember the verified token until it expires (tokens without an expiry are not cached)
+    if settings.jwt_cache_enabled and isinstance(payload.get("exp"), (int, float)):
+        remaining = payload["exp"] - time.time()
+        if remaining > 0:
+            token_cache.set(cache_key, token_data, ttl=remaining)
     
     # Return the TokenData instance
     return token_data
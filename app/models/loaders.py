@@ -0,0 +1,31 @@
+from sqlalchemy.orm import joinedload, selectinload
+
+# Import the models whose relationships are serialized in the responses
+from .models import Order, Product
+
+# Eager-loading strategies for the response schemas, so serializing a page never triggers per-row lazy loads.
+# Lists: a handful of owners is shared by many rows, so owners are fetched once each with a select-in query,
+# while the (mostly distinct) product of each order rides along in the main query with a JOIN.
+# Detail: a single row, so everything is joined into one statement.
+
+# Loader options for a page of products (products + one select-in for owners)
+def product_list_options():
+    return (selectinload(Product.owner),)
+
+# Loader options for a single product (one joined statement)
+def product_detail_options():
+    return (joinedload(Product.owner),)
+
+# Loader options for a page of orders (orders joined with products + select-ins for order and product owners)
+def order_list_options():
+    return (
+        selectinload(Order.owner),
+        joinedload(Order.product).selectinload(Product.owner),
+    )
+
+# Loader options for a single order (one joined statement)
+def order_detail_options():
+    return (
+        joinedload(Order.owner),
+        joinedload(Order.product).joinedload(Product.owner),
+    )
@@ -1,11 +1,34 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Index, CheckConstraint, func, literal_column
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql.expression import text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement, true
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 
 # Import the Base class from the db.config module
 from ..db.config import Base
 
+# Database-side current timestamp used as the created_at default: now() on Postgres, and on SQLite (local runs) a
+# text timestamp in the exact format SQLAlchemy writes datetimes in, so keyset cursors compare correctly
+class utcnow(FunctionElement):
+    type = TIMESTAMP(timezone=True)
+    inherit_cache = True
+
+@compiles(utcnow)
+def compile_utcnow(element, compiler, **kw):
+    return "now()"
+
+@compiles(utcnow, "sqlite")
+def compile_utcnow_sqlite(element, compiler, **kw):
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+# Row version and last-modified columns of the models served with ETag/Last-Modified validators: every UPDATE
+# statement (ORM or Core) bumps the version and refreshes updated_at through the column onupdate defaults
+def version_column():
+    return Column(Integer, nullable=False, server_default="1", onupdate=literal_column("version + 1"))
+
+def updated_at_column():
+    return Column(TIMESTAMP(timezone=True), nullable=False, server_default=utcnow(), onupdate=utcnow())
+
 # Define the User class representing the 'users' table in the database
 class User(Base):
     # Specify the table name
@@ -17,7 +40,20 @@ class User(Base):
     email = Column(String, nullable=False, unique=True)
     password = Column(String, nullable=False)
     created_at = Column(TIMESTAMP(timezone=True), 
-                       nullable=False, server_default=text('now()'))
+                       nullable=False, server_default=utcnow())
+    version = version_column()
+    updated_at = updated_at_column()
+
+    # Change watermark of the catalog snapshot (owners embedded in products that changed since)
+    __table_args__ = (Index("ix_users_updated_at", "updated_at"),)
+
+# Full-text search document of a product on Postgres: name matches weigh more (A) than description matches (B).
+# The text search configuration is inlined as a literal so queries match the GIN index expression with every driver
+SEARCH_CONFIG = literal_column("'english'")
+
+def search_document(name, description):
+    return func.setweight(func.to_tsvector(SEARCH_CONFIG, name), literal_column("'A'")).op("||")(
+        func.setweight(func.to_tsvector(SEARCH_CONFIG, description), literal_column("'B'")))
 
 # Define the Product class representing the 'products' table in the database
 class Product(Base):
@@ -29,14 +65,43 @@ class Product(Base):
     name = Column(String, nullable=False)
     description = Column(String, nullable=False)
     price = Column(Integer, nullable=False)
-    in_stock = Column(Boolean, server_default='TRUE', nullable=False)
+    in_stock = Column(Boolean, server_default=true(), nullable=False)
+    # Units available for ordering (NULL means stock is not tracked for this product)
+    stock = Column(Integer, nullable=True)
+    # Number of counter shards when the stock of a hot product lives in product_stock_shards instead of `stock`
+    stock_shards = Column(Integer, nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), 
-                       nullable=False, server_default=text('now()'))
+                       nullable=False, server_default=utcnow())
+    version = version_column()
+    updated_at = updated_at_column()
     
     # Define a foreign key relationship with the 'users' table
-    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     owner = relationship("User")
 
+    # Composite index backing the (created_at, id) keyset pagination of the product list
+    __table_args__ = (
+        Index("ix_products_created_at_id", "created_at", "id"),
+        # Change watermark of the catalog snapshot (products changed since its last refresh)
+        Index("ix_products_updated_at", "updated_at"),
+        # Last line of defence against overselling
+        CheckConstraint("stock >= 0", name="ck_products_stock_non_negative"),
+        # GIN index over the search document (Postgres only; SQLite falls back to LIKE scans)
+        Index("ix_products_search", search_document(name, description), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
+# Define the ProductStockShard class representing the 'product_stock_shards' table in the database
+class ProductStockShard(Base):
+    # Specify the table name
+    __tablename__ = "product_stock_shards"
+
+    # The stock of a hot product split over several rows, so concurrent reservations lock different rows
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True, nullable=False)
+    shard = Column(Integer, primary_key=True, nullable=False)
+    stock = Column(Integer, nullable=False)
+
+    __table_args__ = (CheckConstraint("stock >= 0", name="ck_product_stock_shards_stock_non_negative"),)
+
 # Define the Order class representing the 'orders' table in the database
 class Order(Base):
     # Specify the table name
@@ -45,11 +110,16 @@ class Order(Base):
     # Define columns for the 'orders' table
     id = Column(Integer, primary_key=True, nullable=False)
     quantity = Column(Integer, nullable=False)
-    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
     created_at = Column(TIMESTAMP(timezone=True), 
-                       nullable=False, server_default=text('now()'))
+                       nullable=False, server_default=utcnow())
+    version = version_column()
+    updated_at = updated_at_column()
     
     # Define foreign key relationships with the 'users' and 'products' tables
     owner = relationship("User")
     product = relationship("Product")
+
+    # Composite index backing the (created_at, id) keyset pagination of the order list
+    __table_args__ = (Index("ix_orders_created_at_id", "created_at", "id"),)
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi.security.oauth2 import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Import database-related modules and functions
+from ..db.config import get_async_db
+from ..schemas.user import Token
+from ..models.models import User
+
+# Import utility functions and JWT token generation function
+from ..helpers import utils
+from ..helpers.generate_jwt import create_access_token
+from ..helpers.rate_limit import limit_login
+from ..helpers.metrics import TimedRoute
+
+# Create an instance of APIRouter for the async authentication routes
+router = APIRouter(tags=['Authentication'], route_class=TimedRoute)
+
+# Define a route for handling user login and issuing access tokens (rate limited per client IP and username
+# before any database or hashing work)
+@router.post('/login', response_model=Token, dependencies=[Depends(limit_login)])
+async def login(user_credentials: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+
+    # Query the database to retrieve a user with the provided email
+    result = await db.execute(select(User).filter(
+        User.email == user_credentials.username))
+    user = result.scalars().first()
+
+    # Validation: Check if the user exists and verify the password
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail=f"Invalid credentials")
+
+    # Verify the password in the hashing pool, getting a new hash back if the stored one uses an outdated cost
+    valid, new_hash = await utils.verify_and_update_async(user_credentials.password, user.password)
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail=f"Invalid credentials")
+
+    # Transparently upgrade the stored hash to the current cost factor
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
+
+    # Create an access token using the user's ID
+    access_token = create_access_token(data={"user_id": user.id})
+
+    # Return the generated access token along with its type
+    return {"access_token": access_token, "token_type": "bearer"}
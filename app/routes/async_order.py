@@ -0,0 +1,177 @@
+from fastapi import Request, Response, status, HTTPException, Depends, APIRouter
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.loaders import order_list_options, order_detail_options, product_detail_options
+from ..models.models import Order, Product
+from ..schemas import order
+from ..db.config import get_async_db
+from ..db.replicas import get_async_read_db, get_async_read_engine
+from ..helpers.pagination import paginate, set_next_cursor
+from ..helpers.conditional import (order_versions, order_state, order_row_state, etag, validators,
+                                   is_conditional, is_not_modified, set_validators, not_modified)
+from ..helpers.ownership import raise_missing_or_forbidden_async
+from ..helpers.inventory import reserve_stock, release_stock
+from ..helpers import catalog, group_commit
+from ..environment.config import settings
+from ..helpers.export import ExportFormat, ORDER_COLUMNS, export_query, stream_rows_async, export_response
+from ..middleware.oauth2 import get_current_user_async
+from ..helpers.metrics import TimedRoute
+from datetime import datetime
+from typing import List, Optional
+
+# Create an instance of APIRouter for the async orders routes (same prefix and schemas as the sync router)
+router = APIRouter(
+    prefix="/orders",
+    tags=['Orders'],
+    route_class=TimedRoute
+)
+
+# Define a route to retrieve a list of orders
+@router.get("/", response_model=List[order.Order])
+async def get_orders(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: int = Depends(get_current_user_async),
+    limit: int = 10, skip: int = 0, search: Optional[str] = "",
+    cursor: Optional[str] = None
+):
+    # Conditional request: compare the page's collection version with a version-only query of the same page first
+    if is_conditional(request):
+        result = await db.execute(paginate(order_versions(), Order, limit, skip, cursor))
+        tag = etag(*(order_row_state(row)[0] for row in result.all()))
+        if is_not_modified(request, tag):
+            return not_modified(tag)
+
+    # Query the database to retrieve a page of orders ordered on (created_at, id), by cursor or by limit and offset
+    result = await db.execute(paginate(select(Order).options(*order_list_options()), Order, limit, skip, cursor))
+    orders = result.scalars().all()
+    set_validators(response, etag(*(order_state(row)[0] for row in orders)))
+
+    # Return the page, advertising the next page's cursor in the X-Next-Cursor header
+    return set_next_cursor(response, orders, limit)
+
+# Define a route to export the caller's orders as NDJSON or CSV, streamed from a server-side cursor
+@router.get("/export")
+async def export_orders(
+    engine = Depends(get_async_read_engine),
+    current_user: int = Depends(get_current_user_async),
+    format: ExportFormat = "ndjson",
+    since: Optional[datetime] = None, until: Optional[datetime] = None
+):
+    query = export_query(Order, ORDER_COLUMNS, current_user.id, since, until)
+    return export_response(stream_rows_async(engine, query, format), "orders", format)
+
+# Define a route to create a new order
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=order.Order)
+async def create_order(
+    order: order.OrderCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: int = Depends(get_current_user_async)
+):
+    # Group commit: the order is written and committed together with concurrent ones, then returned
+    if settings.order_group_commit:
+        return await group_commit.create_order_async(current_user.id, order)
+
+    # Reserve the stock with one conditional UPDATE (409 when sold out); it rolls back with the order if the insert fails
+    await db.run_sync(reserve_stock, order.product_id, order.quantity)
+
+    # Create a new order instance with the owner ID and order details
+    new_task = Order(owner_id=current_user.id, **order.dict())
+    # Add the order to the database and commit the reservation and the order together
+    db.add(new_task)
+    await db.commit()
+    catalog.snapshot.invalidate([order.product_id])
+
+    # Reload the new order together with its owner and product
+    result = await db.execute(select(Order).options(*order_detail_options()).filter(Order.id == new_task.id).execution_options(populate_existing=True))
+    return result.scalars().first()
+
+# Define a route to retrieve a specific order by ID
+# The int convertor lets other GET routes on this prefix fall through to the sync router
+@router.get("/{id:int}", response_model=order.Order)
+async def get_order(id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db), current_user: int = Depends(get_current_user_async)):
+    # Conditional request: answer 304 from the versions alone when the client's copy is current
+    if is_conditional(request):
+        row = (await db.execute(order_versions().filter(Order.id == id))).first()
+        if row is not None and row.owner_id == current_user.id:
+            tag, modified = validators(order_row_state(row))
+            if is_not_modified(request, tag, modified):
+                return not_modified(tag, modified)
+
+    # Query the database to retrieve a specific order by ID
+    result = await db.execute(select(Order).options(*order_detail_options()).filter(Order.id == id))
+    order = result.scalars().first()
+
+    # Validation: Check if the order exists and if the current user is authorized
+    if not order:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Order with id: {id} was not found")
+
+    if order.owner_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform request action")
+
+    set_validators(response, *validators(order_state(order)))
+    return order
+
+# Define a route to update a specific order by ID
+@router.put("/{id:int}", response_model=order.Order, status_code=status.HTTP_200_OK)
+async def update_order(id: int, updated_order: order.OrderCreate, db: AsyncSession = Depends(get_async_db), current_user: int = Depends(get_current_user_async)):
+    # Lock the current order row so concurrent edits cannot release the same quantity twice
+    result = await db.execute(
+        select(Order.product_id, Order.quantity)
+        .where(Order.id == id, Order.owner_id == current_user.id)
+        .with_for_update()
+    )
+    current = result.first()
+
+    # Validation: No row found means the order does not exist or the current user is not its owner
+    if current is None:
+        await raise_missing_or_forbidden_async(db, Order, id, "Order")
+
+    # Give back the old quantity and reserve the new one in the same transaction (409 rolls both back)
+    await db.run_sync(release_stock, current.product_id, current.quantity)
+    await db.run_sync(reserve_stock, updated_order.product_id, updated_order.quantity)
+
+    # Update the order, RETURNING hands back the new row
+    result = await db.execute(
+        update(Order)
+        .where(Order.id == id)
+        .values(**updated_order.dict())
+        .returning(*Order.__table__.columns)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.mappings().first()
+
+    # Commit changes
+    await db.commit()
+    catalog.snapshot.invalidate({current.product_id, row["product_id"]})
+
+    # Load the (possibly changed) product with its owner; the order's owner is the current user
+    result = await db.execute(select(Product).options(*product_detail_options()).filter(Product.id == row["product_id"]))
+    product = result.scalars().first()
+    return {**row, "owner": current_user, "product": product}
+
+# Define a route to delete a specific order by ID
+@router.delete("/{id:int}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_order(id: int, db: AsyncSession = Depends(get_async_db), current_user: int = Depends(get_current_user_async)):
+    # Delete the order in a single statement with the ownership check in the WHERE clause
+    result = await db.execute(
+        delete(Order)
+        .where(Order.id == id, Order.owner_id == current_user.id)
+        .returning(Order.product_id, Order.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = result.first()
+
+    # Validation: No row deleted means the order does not exist or the current user is not its owner
+    if deleted is None:
+        await raise_missing_or_forbidden_async(db, Order, id, "Order")
+
+    # Give the ordered quantity back to the product
+    await db.run_sync(release_stock, deleted.product_id, deleted.quantity)
+
+    # Commit changes and return a success response
+    await db.commit()
+    catalog.snapshot.invalidate([deleted.product_id])
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
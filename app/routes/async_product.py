@@ -0,0 +1,190 @@
+from fastapi import Request, Response, status, HTTPException, Depends, APIRouter
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.loaders import product_list_options, product_detail_options
+from ..models.models import Product
+from ..schemas import product
+from ..db.config import get_async_db
+from ..db.replicas import get_async_read_db, get_async_read_engine
+from ..helpers.pagination import set_next_cursor
+from ..helpers.search import filter_products, page_products
+from ..helpers.conditional import (product_versions, product_state, product_row_state, etag, validators,
+                                   is_conditional, is_not_modified, set_validators, not_modified)
+from ..helpers.batch import parse_ids, in_requested_order
+from ..helpers import catalog
+from ..helpers.export import ExportFormat, PRODUCT_COLUMNS, export_query, stream_rows_async, export_response
+from ..helpers.ownership import raise_missing_or_forbidden_async
+from ..helpers.inventory import updated_in_stock
+from ..middleware.oauth2 import get_current_user_async
+from ..helpers.metrics import TimedRoute
+from datetime import datetime
+from typing import List, Optional
+
+# Create an instance of APIRouter for the async products routes (same prefix and schemas as the sync router)
+router = APIRouter(
+    prefix="/products",
+    tags=['Products'],
+    route_class=TimedRoute
+)
+
+# Define a route to retrieve a list of products
+@router.get("/", response_model=List[product.Product])
+async def get_products(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: int = Depends(get_current_user_async),
+    limit: int = 10, skip: int = 0, search: Optional[str] = "",
+    cursor: Optional[str] = None, ids: Optional[str] = None,
+    in_stock: Optional[bool] = None, min_price: Optional[int] = None, max_price: Optional[int] = None
+):
+    # Catalog snapshot: batch reads and plain pages are served from memory while it is fresh (search stays in the
+    # database, as do batches and pages involving products the snapshot does not know yet or has marked stale)
+    if catalog.snapshot.is_fresh() and not (search and search.strip()):
+        if not ids:
+            page = catalog.snapshot.page(limit, skip, cursor, in_stock, min_price, max_price)
+            if page is not None:
+                return catalog.page_response(request, page, limit)
+        else:
+            served = catalog.batch_response(response, parse_ids(ids), current_user.id)
+            if served is not None:
+                return served
+
+    # Batch read: fetch the requested ids with a single IN query, returned in the requested order
+    if ids:
+        requested = parse_ids(ids)
+        result = await db.execute(select(Product).options(*product_list_options()).filter(Product.id.in_(requested)))
+        return in_requested_order(response, requested, result.scalars().all(), current_user.id)
+
+    dialect = db.bind.dialect.name
+
+    # Conditional request: compare the page's collection version with a version-only query of the same page first
+    if is_conditional(request):
+        result = await db.execute(page_products(filter_products(product_versions(), in_stock, min_price, max_price),
+                                                dialect, search, limit, skip, cursor))
+        tag = etag(*(product_row_state(row)[0] for row in result.all()))
+        if is_not_modified(request, tag):
+            return not_modified(tag)
+
+    # Query the database to retrieve a page of products: search matches by relevance, otherwise ordered on
+    # (created_at, id), by cursor or by limit and offset
+    query = filter_products(select(Product).options(*product_list_options()), in_stock, min_price, max_price)
+    result = await db.execute(page_products(query, dialect, search, limit, skip, cursor))
+    products = result.scalars().all()
+    set_validators(response, etag(*(product_state(row)[0] for row in products)))
+
+    # Return the page, advertising the next page's cursor in the X-Next-Cursor header (search pages use skip)
+    if search and search.strip():
+        return products
+    return set_next_cursor(response, products, limit)
+
+# Define a route to export the caller's products as NDJSON or CSV, streamed from a server-side cursor
+@router.get("/export")
+async def export_products(
+    engine = Depends(get_async_read_engine),
+    current_user: int = Depends(get_current_user_async),
+    format: ExportFormat = "ndjson",
+    since: Optional[datetime] = None, until: Optional[datetime] = None
+):
+    query = export_query(Product, PRODUCT_COLUMNS, current_user.id, since, until)
+    return export_response(stream_rows_async(engine, query, format), "products", format)
+
+# Define a route to create a new product
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=product.Product)
+async def create_product(
+    product: product.ProductCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: int = Depends(get_current_user_async)
+):
+    # Create a new product instance with the owner ID and product details
+    new_product = Product(owner_id=current_user.id, **product.dict())
+    # A tracked stock decides availability
+    if product.stock is not None:
+        new_product.in_stock = product.stock > 0
+    # Add the product to the database, commit, and refresh (including the owner relationship)
+    db.add(new_product)
+    await db.commit()
+    await db.refresh(new_product, attribute_names=["id", "created_at", "owner"])
+    if catalog.snapshot.loaded:
+        await db.run_sync(catalog.snapshot.refresh_products, [new_product.id])
+
+    return new_product
+
+# Define a route to retrieve a specific product by ID
+# The int convertor lets other GET routes on this prefix fall through to the sync router
+@router.get("/{id:int}", response_model=product.Product)
+async def get_product(id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db), current_user: int = Depends(get_current_user_async)):
+    # Catalog snapshot: served from memory while it is fresh (products it does not know yet fall through)
+    entry = catalog.snapshot.get(id) if catalog.snapshot.is_fresh() else None
+    if entry is not None:
+        return catalog.product_response(request, entry, current_user.id)
+
+    # Conditional request: answer 304 from the versions alone when the client's copy is current
+    if is_conditional(request):
+        row = (await db.execute(product_versions().filter(Product.id == id))).first()
+        if row is not None and row.owner_id == current_user.id:
+            tag, modified = validators(product_row_state(row))
+            if is_not_modified(request, tag, modified):
+                return not_modified(tag, modified)
+
+    # Query the database to retrieve a specific product by ID
+    result = await db.execute(select(Product).options(*product_detail_options()).filter(Product.id == id))
+    product = result.scalars().first()
+
+    # Validation: Check if the product exists and if the current user is authorized
+    if not product:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with id: {id} was not found")
+
+    if product.owner_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform request action")
+
+    set_validators(response, *validators(product_state(product)))
+    return product
+
+# Define a route to update a specific product by ID
+@router.put("/{id:int}", response_model=product.Product, status_code=status.HTTP_200_OK)
+async def update_product(id: int, updated_product: product.ProductCreate, db: AsyncSession = Depends(get_async_db), current_user: int = Depends(get_current_user_async)):
+    # Update the product in a single statement: the ownership check sits in the WHERE clause and RETURNING hands back the new row
+    # (stock is left out: it only changes through order reservations and the /stock endpoint; in_stock is only taken
+    # from the request for products whose stock is not tracked)
+    result = await db.execute(
+        update(Product)
+        .where(Product.id == id, Product.owner_id == current_user.id)
+        .values(**updated_product.dict(exclude={"stock", "in_stock"}), in_stock=updated_in_stock(updated_product.in_stock))
+        .returning(*Product.__table__.columns)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.mappings().first()
+
+    # Validation: No row updated means the product does not exist or the current user is not its owner
+    if row is None:
+        await raise_missing_or_forbidden_async(db, Product, id, "Product")
+
+    # Commit changes
+    await db.commit()
+    if catalog.snapshot.loaded:
+        await db.run_sync(catalog.snapshot.refresh_products, [id])
+
+    # The owner is the current user, so it is embedded without loading the relationship
+    return {**row, "owner": current_user}
+
+# Define a route to delete a specific product by ID
+@router.delete("/{id:int}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_product(id: int, db: AsyncSession = Depends(get_async_db), current_user: int = Depends(get_current_user_async)):
+    # Delete the product in a single statement with the ownership check in the WHERE clause
+    result = await db.execute(
+        delete(Product)
+        .where(Product.id == id, Product.owner_id == current_user.id)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )
+
+    # Validation: No row deleted means the product does not exist or the current user is not its owner
+    if result.first() is None:
+        await raise_missing_or_forbidden_async(db, Product, id, "Product")
+
+    # Commit changes and return a success response
+    await db.commit()
+    catalog.snapshot.remove_product(id)
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
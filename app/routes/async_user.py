@@ -0,0 +1,97 @@
+from fastapi import Response, status, HTTPException, Depends, APIRouter
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.models import User
+from ..schemas import user
+from ..db.config import get_async_db
+from ..db.replicas import get_async_read_db
+from ..helpers.ownership import raise_missing_or_forbidden_async
+from ..middleware.oauth2 import get_current_user_async, invalidate_user
+from ..helpers import utils
+from ..helpers.metrics import TimedRoute
+
+# Create an instance of APIRouter for the async user routes (same prefix and schemas as the sync router)
+router = APIRouter(
+    prefix="/users",
+    tags=['Users'],
+    route_class=TimedRoute
+)
+
+# Define a route to create a new user
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=user.UserOut)
+async def create_user(user: user.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    # Hash the password in the hashing pool before storing it in the database (a full pool answers 503)
+    hashed_password = await utils.hash_async(user.password)
+    user.password = hashed_password
+
+    try:
+        # Create a new user instance with the provided data
+        new_user = User(**user.dict())
+
+        # Add the user to the database, commit changes, and refresh
+        db.add(new_user)
+        await db.commit()
+        await db.refresh(new_user)
+
+        return new_user
+
+    except:
+        # Handle the case where a user with the same data already exists
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"User already exists")
+
+# Define a route to retrieve a specific user by ID
+@router.get("/{id:int}", response_model=user.UserOut)
+async def get_user(id: int, db: AsyncSession = Depends(get_async_read_db)):
+    # Query the database to retrieve a specific user by ID
+    result = await db.execute(select(User).filter(User.id == id))
+    user = result.scalars().first()
+
+    # Validation: Check if the user exists
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id: {id} does not exist")
+
+    return user
+
+# Define a route to update a specific user by ID
+@router.put("/{id:int}", response_model=user.UserUpdate, status_code=status.HTTP_200_OK)
+async def update_user(id: int, updated_user: user.UserCreate, db: AsyncSession = Depends(get_async_db), current_user: int = Depends(get_current_user_async)):
+    # Update the user in a single statement: only the user themselves matches the WHERE clause, RETURNING hands back the new row
+    result = await db.execute(
+        update(User)
+        .where(User.id == id, User.id == current_user.id)
+        .values(**updated_user.dict())
+        .returning(*User.__table__.columns)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.mappings().first()
+
+    # Validation: No row updated means the user does not exist or is not the current user
+    if row is None:
+        await raise_missing_or_forbidden_async(db, User, id, "User")
+
+    # Commit changes and drop the stale cached copy
+    await db.commit()
+    invalidate_user(id)
+
+    return dict(row)
+
+# Define a route to delete a specific user by ID
+@router.delete("/{id:int}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_user(id: int, db: AsyncSession = Depends(get_async_db), current_user: int = Depends(get_current_user_async)):
+    # Delete the user in a single statement; only the user themselves matches the WHERE clause
+    result = await db.execute(
+        delete(User)
+        .where(User.id == id, User.id == current_user.id)
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+
+    # Validation: No row deleted means the user does not exist or is not the current user
+    if result.first() is None:
+        await raise_missing_or_forbidden_async(db, User, id, "User")
+
+    # Commit changes, drop the cached copy, and return a success response
+    await db.commit()
+    invalidate_user(id)
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
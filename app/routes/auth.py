@@ -10,13 +10,16 @@ from ..models.models import User
 # Import utility functions and JWT token generation function
 from ..helpers import utils
 from ..helpers.generate_jwt import create_access_token
+from ..helpers.rate_limit import limit_login
+from ..helpers.metrics import TimedRoute
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
 
 # Create an instance of APIRouter for authentication-related routes
-router = APIRouter(tags=['Authentication'])
+router = APIRouter(tags=['Authentication'], route_class=TimedRoute)
 
-# Define a route for handling user login and issuing access tokens
-@router.post('/login', response_model=Token)
+# Define a route for handling user login and issuing access tokens (rate limited per client IP and username
+# before any database or hashing work)
+@router.post('/login', response_model=Token, dependencies=[Depends(limit_login)])
 def login(user_credentials: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
 
     # Query the database to retrieve a user with the provided email
@@ -28,10 +31,17 @@ def login(user_credentials: OAuth2PasswordRequestForm = Depends(), db: Session =
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail=f"Invalid credentials")
     
-    if not utils.verify(user_credentials.password, user.password):
+    # Verify the password in the hashing pool, getting a new hash back if the stored one uses an outdated cost
+    valid, new_hash = utils.verify_and_update(user_credentials.password, user.password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail=f"Invalid credentials")
     
+    # Transparently upgrade the stored hash to the current cost factor
+    if new_hash:
+        user.password = new_hash
+        db.commit()
+    
     # Create an access token using the user's ID
     access_token = create_access_token(data={"user_id": user.id})
     
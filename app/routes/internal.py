@@ -0,0 +1,61 @@
+import secrets
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from typing import Dict, List, Optional
+
+from ..db.pool import pool_status
+from ..db.replicas import replicas, all_engines
+from ..middleware.oauth2 import user_cache
+from ..middleware.validate_jwt import token_cache
+from ..environment.config import settings
+from ..helpers import warmup, catalog
+from ..schemas import internal
+from ..helpers.metrics import TimedRoute
+
+# Dependency guarding the diagnostic endpoints: they expose pool sizes, replica hosts and cache counters, so they
+# answer 404 unless internal_token is set, and then only to requests sending it in the X-Internal-Token header
+def require_internal_token(x_internal_token: Optional[str] = Header(None)):
+    if not settings.internal_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_internal_token is None or not secrets.compare_digest(x_internal_token, settings.internal_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid internal token")
+
+# Create an instance of APIRouter for operational endpoints (hidden from the public API docs); only the readiness
+# probe is open, the diagnostic routes require the internal token
+router = APIRouter(
+    prefix="/internal",
+    tags=['Internal'],
+    include_in_schema=False,
+    route_class=TimedRoute
+)
+diagnostics = APIRouter(dependencies=[Depends(require_internal_token)], route_class=TimedRoute)
+
+# Define a route reporting live connection pool statistics, keyed by engine
+@diagnostics.get("/pool", response_model=Dict[str, internal.PoolStatus])
+def get_pool_stats():
+    return {name: pool_status(engine) for name, engine in all_engines().items()}
+
+# Define a route reporting the read replicas with their last measured lag and whether they are in rotation
+@diagnostics.get("/replicas", response_model=List[internal.ReplicaStatus])
+def get_replica_status():
+    return [{"name": replica.name, "healthy": replica.healthy, "lag_seconds": replica.lag_seconds,
+             "error": replica.error, "checked_at": replica.checked_at} for replica in replicas]
+
+# Define a route reporting hit/miss counters of the in-process caches
+@diagnostics.get("/cache", response_model=Dict[str, internal.CacheStatus])
+def get_cache_stats():
+    return {"users": user_cache.stats(), "tokens": token_cache.stats()}
+
+# Define a route reporting the size and freshness of the in-memory product catalog
+@diagnostics.get("/catalog", response_model=internal.CatalogStatus)
+def get_catalog_status():
+    return catalog.snapshot.stats()
+
+# Define a readiness route for load balancers: 503 until the start-up warm-up finished, then 200
+@router.get("/ready", response_model=internal.ReadinessStatus)
+def get_readiness(response: Response):
+    if not warmup.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"ready": warmup.ready, "warmup_seconds": warmup.timings}
+
+# Mount the diagnostic routes under the same prefix
+router.include_router(diagnostics)
@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..helpers import metrics
+from ..helpers.metrics import TimedRoute
+
+# Create an instance of APIRouter for the Prometheus scrape endpoint (hidden from the public API docs)
+router = APIRouter(
+    tags=['Metrics'],
+    include_in_schema=False,
+    route_class=TimedRoute
+)
+
+# Define a route rendering the process's request and pool metrics in the Prometheus text format; it is async so
+# scrapes do not queue behind request handlers for a threadpool slot
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
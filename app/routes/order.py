@@ -1,28 +1,69 @@
-from fastapi import FastAPI, Response, status, HTTPException, Depends, APIRouter
+from contextlib import nullcontext
+from fastapi import FastAPI, Request, Response, status, HTTPException, Depends, APIRouter
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from ..models.models import Order
+from ..models.models import Order, Product
+from ..models.loaders import order_list_options, order_detail_options, product_detail_options
 from ..schemas import order
 from ..db.config import get_db
+from ..db.replicas import get_read_db, get_read_engine
+from ..helpers.pagination import paginate, set_next_cursor
+from ..helpers.conditional import (order_versions, order_state, order_row_state, etag, validators,
+                                   is_conditional, is_not_modified, set_validators, not_modified)
+from ..helpers.ownership import raise_missing_or_forbidden
+from ..helpers.batch import check_batch_size
+from ..helpers.export import ExportFormat, ORDER_COLUMNS, export_query, stream_rows, export_response
+from ..helpers.inventory import reserve_stock, release_stock
+from ..helpers import catalog, group_commit
+from ..environment.config import settings
 from ..middleware.oauth2 import get_current_user
+from ..helpers.metrics import TimedRoute
+from datetime import datetime
 from typing import List, Optional
 
 # Create an instance of APIRouter for handling orders-related routes
 router = APIRouter(
     prefix="/orders",
-    tags=['Orders']
+    tags=['Orders'],
+    route_class=TimedRoute
 )
 
 # Define a route to retrieve a list of orders
 @router.get("/", response_model=List[order.Order])
 def get_orders(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user: int = Depends(get_current_user),
-    limit: int = 10, skip: int = 0, search: Optional[str] = ""
+    limit: int = 10, skip: int = 0, search: Optional[str] = "",
+    cursor: Optional[str] = None
 ):
-    # Query the database to retrieve a list of orders with optional limit and offset
-    tasks = db.query(Order).limit(limit).offset(skip).all()
+    # Conditional request: compare the page's collection version with a version-only query of the same page first
+    if is_conditional(request):
+        rows = db.execute(paginate(order_versions(), Order, limit, skip, cursor)).all()
+        tag = etag(*(order_row_state(row)[0] for row in rows))
+        if is_not_modified(request, tag):
+            return not_modified(tag)
+
+    # Query the database to retrieve a page of orders ordered on (created_at, id), by cursor or by limit and offset
+    tasks = paginate(db.query(Order).options(*order_list_options()), Order, limit, skip, cursor).all()
+    set_validators(response, etag(*(order_state(row)[0] for row in tasks)))
     
-    return tasks
+    # Return the page, advertising the next page's cursor in the X-Next-Cursor header
+    return set_next_cursor(response, tasks, limit)
+
+# Define a route to export the caller's orders as NDJSON or CSV, streamed from a server-side cursor
+# Declared before /{id} so "export" is not taken for an id
+@router.get("/export")
+def export_orders(
+    engine = Depends(get_read_engine),
+    current_user: int = Depends(get_current_user),
+    format: ExportFormat = "ndjson",
+    since: Optional[datetime] = None, until: Optional[datetime] = None
+):
+    query = export_query(Order, ORDER_COLUMNS, current_user.id, since, until)
+    return export_response(stream_rows(engine, query, format), "orders", format)
 
 # Define a route to create a new order
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=order.Order)
@@ -31,20 +72,91 @@ def create_order(
     db: Session = Depends(get_db),
     current_user: int = Depends(get_current_user)
 ):
+    # Group commit: the order is written and committed together with concurrent ones, then returned
+    if settings.order_group_commit:
+        return group_commit.create_order(current_user.id, order)
+
+    # Reserve the stock with one conditional UPDATE (409 when sold out); it rolls back with the order if the insert fails
+    reserve_stock(db, order.product_id, order.quantity)
+
     # Create a new order instance with the owner ID and order details
     new_task = Order(owner_id=current_user.id, **order.dict())
-    # Add the order to the database, commit, and refresh
+    # Add the order to the database, commit the reservation and the order together, and refresh
     db.add(new_task)
     db.commit()
+    catalog.snapshot.invalidate([order.product_id])
     db.refresh(new_task)
 
     return new_task
 
+# Define a route to create several orders in one transaction, validating all referenced products with one query
+@router.post("/batch", status_code=status.HTTP_201_CREATED, response_model=order.OrderBatchResult)
+def create_orders_batch(
+    batch: order.OrderBatchCreate,
+    db: Session = Depends(get_db),
+    current_user: int = Depends(get_current_user)
+):
+    check_batch_size(len(batch.orders))
+
+    # Validation: Check that every referenced product exists, with a single IN query
+    product_ids = {line.product_id for line in batch.orders}
+    existing = set(db.scalars(select(Product.id).filter(Product.id.in_(product_ids))))
+    errors = [{"index": index, "product_id": line.product_id, "error": f"Product with id: {line.product_id} was not found"}
+              for index, line in enumerate(batch.orders) if line.product_id not in existing]
+
+    # All-or-nothing batches are rejected as a whole when any line is invalid
+    if errors and batch.atomic:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=errors)
+
+    # Reserve the stock of every valid line; partial batches use a savepoint per line so a sold-out line only drops itself
+    lines = []
+    for index, line in enumerate(batch.orders):
+        if line.product_id not in existing:
+            continue
+        try:
+            with (nullcontext() if batch.atomic else db.begin_nested()):
+                reserve_stock(db, line.product_id, line.quantity)
+        except HTTPException as exc:
+            # An atomic batch stops at the first line it cannot cover, rolling back the reservations made so far
+            if batch.atomic:
+                db.rollback()
+                raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                    detail=[{"index": index, "product_id": line.product_id, "error": exc.detail}])
+            errors.append({"index": index, "product_id": line.product_id, "error": exc.detail})
+            continue
+        lines.append({"owner_id": current_user.id, **line.dict()})
+    errors.sort(key=lambda error: error["index"])
+
+    # Insert the valid lines with one multi-row INSERT ... RETURNING and commit them with their reservations
+    if not lines:
+        db.rollback()
+        return {"created": [], "errors": errors}
+    try:
+        ids = db.scalars(insert(Order).returning(Order.id, sort_by_parameter_order=True), lines).all()
+        db.commit()
+        catalog.snapshot.invalidate({line["product_id"] for line in lines})
+    except IntegrityError:
+        # A product was deleted between the validation and the insert
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A referenced product no longer exists, please retry")
+
+    # Load the created orders with their relationships, in the order they were submitted
+    created = {row.id: row for row in db.query(Order).options(*order_list_options()).filter(Order.id.in_(ids))}
+    return {"created": [created[id] for id in ids], "errors": errors}
+
 # Define a route to retrieve a specific order by ID
 @router.get("/{id}", response_model=order.Order)
-def get_order(id: int, db: Session = Depends(get_db), current_user: int = Depends(get_current_user)):
-    # Query the database to retrieve a specific order by ID
-    order = db.query(Order).group_by(Order.id).filter(Order.id == id).first()
+def get_order(id: int, request: Request, response: Response, db: Session = Depends(get_read_db), current_user: int = Depends(get_current_user)):
+    # Conditional request: answer 304 from the versions alone when the client's copy is current
+    if is_conditional(request):
+        row = db.execute(order_versions().filter(Order.id == id)).first()
+        if row is not None and row.owner_id == current_user.id:
+            tag, modified = validators(order_row_state(row))
+            if is_not_modified(request, tag, modified):
+                return not_modified(tag, modified)
+
+    # Query the database to retrieve a specific order by ID, with its embedded relationships joined in
+    order = db.query(Order).options(*order_detail_options()).filter(Order.id == id).first()
 
     # Validation: Check if the order exists and if the current user is authorized
     if not order:
@@ -53,44 +165,64 @@ def get_order(id: int, db: Session = Depends(get_db), current_user: int = Depend
     if order.owner_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform request action")
     
+    set_validators(response, *validators(order_state(order)))
     return order
 
 # Define a route to update a specific order by ID
 @router.put("/{id}", response_model=order.Order, status_code=status.HTTP_200_OK)
 def update_order(id: int, updated_order: order.OrderCreate, db: Session = Depends(get_db), current_user: int = Depends(get_current_user)):
-    # Query the database to retrieve the order for updating
-    task_order = db.query(Order).filter(Order.id == id)
-    order = task_order.first()
+    # Lock the current order row so concurrent edits cannot release the same quantity twice
+    current = db.execute(
+        select(Order.product_id, Order.quantity)
+        .where(Order.id == id, Order.owner_id == current_user.id)
+        .with_for_update()
+    ).first()
 
-    # Validation: Check if the order exists and if the current user is authorized
-    if order == None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Order with id: {id} does not exist")
-    
-    if order.owner_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform request action")
-    
-    # Update the order with the provided data and commit changes
-    task_order.update(updated_order.dict(), synchronize_session=False)
+    # Validation: No row found means the order does not exist or the current user is not its owner
+    if current is None:
+        raise_missing_or_forbidden(db, Order, id, "Order")
+
+    # Give back the old quantity and reserve the new one in the same transaction (409 rolls both back)
+    release_stock(db, current.product_id, current.quantity)
+    reserve_stock(db, updated_order.product_id, updated_order.quantity)
+
+    # Update the order, RETURNING hands back the new row
+    row = db.execute(
+        update(Order)
+        .where(Order.id == id)
+        .values(**updated_order.dict())
+        .returning(*Order.__table__.columns)
+        .execution_options(synchronize_session=False)
+    ).mappings().first()
+
+    # Commit changes
     db.commit()
+    catalog.snapshot.invalidate({current.product_id, row["product_id"]})
 
-    return task_order.first()
+    # Load the (possibly changed) product with its owner; the order's owner is the current user
+    product = db.query(Product).options(*product_detail_options()).filter(Product.id == row["product_id"]).first()
+    return {**row, "owner": current_user, "product": product}
 
 # Define a route to delete a specific order by ID
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_order(id: int, db: Session = Depends(get_db), current_user: int = Depends(get_current_user)):
-    # Query the database to retrieve the order for deletion
-    task_order = db.query(Order).filter(Order.id == id)
-    order = task_order.first()
+    # Delete the order in a single statement with the ownership check in the WHERE clause
+    deleted = db.execute(
+        delete(Order)
+        .where(Order.id == id, Order.owner_id == current_user.id)
+        .returning(Order.product_id, Order.quantity)
+        .execution_options(synchronize_session=False)
+    ).first()
 
-    # Validation: Check if the order exists and if the current user is authorized
-    if order == None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Order with id: {id} does not exist")
-    
-    if order.owner_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform request action")
-    
-    # Delete the order from the database, commit changes, and return a success response
-    task_order.delete(synchronize_session=False)
+    # Validation: No row deleted means the order does not exist or the current user is not its owner
+    if deleted is None:
+        raise_missing_or_forbidden(db, Order, id, "Order")
+
+    # Give the ordered quantity back to the product
+    release_stock(db, deleted.product_id, deleted.quantity)
+
+    # Commit changes and return a success response
     db.commit()
+    catalog.snapshot.invalidate([deleted.product_id])
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,28 +1,95 @@
-from fastapi import FastAPI, Response, status, HTTPException, Depends, APIRouter,File, UploadFile
+from fastapi import FastAPI, Request, Response, status, HTTPException, Depends, APIRouter,File, UploadFile
+from sqlalchemy import update, delete
 from sqlalchemy.orm import Session
 from ..models.models import Product
+from ..models.loaders import product_list_options, product_detail_options
 from ..schemas import product
 from ..db.config import get_db
+from ..db.replicas import get_read_db, get_read_engine
+from ..helpers.pagination import set_next_cursor
+from ..helpers.search import filter_products, page_products
+from ..helpers.conditional import (product_versions, product_state, product_row_state, etag, validators,
+                                   is_conditional, is_not_modified, set_validators, not_modified)
+from ..helpers.csv_import import import_products
+from ..helpers.export import ExportFormat, PRODUCT_COLUMNS, export_query, stream_rows, export_response
+from ..helpers.inventory import set_stock, current_stock, updated_in_stock
+from ..helpers.batch import parse_ids, in_requested_order
+from ..helpers import catalog
+from ..environment.config import settings
+from ..helpers.ownership import raise_missing_or_forbidden
 from ..middleware.oauth2 import get_current_user
+from ..helpers.metrics import TimedRoute
+from datetime import datetime
 from typing import List, Optional
 
 # Create an instance of APIRouter for handling products-related routes
 router = APIRouter(
     prefix="/products",
-    tags=['Products']
+    tags=['Products'],
+    route_class=TimedRoute
 )
 
 # Define a route to retrieve a list of products
 @router.get("/", response_model=List[product.Product])
 def get_products(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user: int = Depends(get_current_user),
-    limit: int = 10, skip: int = 0, search: Optional[str] = ""
+    limit: int = 10, skip: int = 0, search: Optional[str] = "",
+    cursor: Optional[str] = None, ids: Optional[str] = None,
+    in_stock: Optional[bool] = None, min_price: Optional[int] = None, max_price: Optional[int] = None
 ):
-    # Query the database to retrieve a list of products with optional limit and offset
-    product = db.query(Product).limit(limit).offset(skip).all()
-    
-    return product
+    # Catalog snapshot: batch reads and plain pages are served from memory while it is fresh (search stays in the
+    # database, as do batches and pages involving products the snapshot does not know yet or has marked stale)
+    if catalog.snapshot.is_fresh() and not (search and search.strip()):
+        if not ids:
+            page = catalog.snapshot.page(limit, skip, cursor, in_stock, min_price, max_price)
+            if page is not None:
+                return catalog.page_response(request, page, limit)
+        else:
+            served = catalog.batch_response(response, parse_ids(ids), current_user.id)
+            if served is not None:
+                return served
+
+    # Batch read: fetch the requested ids with a single IN query, returned in the requested order
+    if ids:
+        requested = parse_ids(ids)
+        rows = db.query(Product).options(*product_list_options()).filter(Product.id.in_(requested)).all()
+        return in_requested_order(response, requested, rows, current_user.id)
+
+    dialect = db.get_bind().dialect.name
+
+    # Conditional request: compare the page's collection version with a version-only query of the same page first
+    if is_conditional(request):
+        rows = db.execute(page_products(filter_products(product_versions(), in_stock, min_price, max_price),
+                                        dialect, search, limit, skip, cursor)).all()
+        tag = etag(*(product_row_state(row)[0] for row in rows))
+        if is_not_modified(request, tag):
+            return not_modified(tag)
+
+    # Query the database to retrieve a page of products: search matches by relevance, otherwise ordered on
+    # (created_at, id), by cursor or by limit and offset
+    query = filter_products(db.query(Product).options(*product_list_options()), in_stock, min_price, max_price)
+    product = page_products(query, dialect, search, limit, skip, cursor).all()
+    set_validators(response, etag(*(product_state(row)[0] for row in product)))
+
+    # Return the page, advertising the next page's cursor in the X-Next-Cursor header (search pages use skip)
+    if search and search.strip():
+        return product
+    return set_next_cursor(response, product, limit)
+
+# Define a route to export the caller's products as NDJSON or CSV, streamed from a server-side cursor
+# Declared before /{id} so "export" is not taken for an id
+@router.get("/export")
+def export_products(
+    engine = Depends(get_read_engine),
+    current_user: int = Depends(get_current_user),
+    format: ExportFormat = "ndjson",
+    since: Optional[datetime] = None, until: Optional[datetime] = None
+):
+    query = export_query(Product, PRODUCT_COLUMNS, current_user.id, since, until)
+    return export_response(stream_rows(engine, query, format), "products", format)
 
 # Define a route to create a new product
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=product.Product)
@@ -33,18 +100,35 @@ def create_product(
 ):
     # Create a new product instance with the owner ID and product details
     new_product = Product(owner_id=current_user.id, **product.dict())
+    # A tracked stock decides availability
+    if product.stock is not None:
+        new_product.in_stock = product.stock > 0
     # Add the product to the database, commit, and refresh
     db.add(new_product)
     db.commit()
     db.refresh(new_product)
+    catalog.snapshot.refresh_products(db, [new_product.id])
 
     return new_product
 
 # Define a route to retrieve a specific product by ID
 @router.get("/{id}", response_model=product.Product)
-def get_product(id: int, db: Session = Depends(get_db), current_user: int = Depends(get_current_user)):
-    # Query the database to retrieve a specific product by ID
-    product = db.query(Product).group_by(Product.id).filter(Product.id == id).first()
+def get_product(id: int, request: Request, response: Response, db: Session = Depends(get_read_db), current_user: int = Depends(get_current_user)):
+    # Catalog snapshot: served from memory while it is fresh (products it does not know yet fall through)
+    entry = catalog.snapshot.get(id) if catalog.snapshot.is_fresh() else None
+    if entry is not None:
+        return catalog.product_response(request, entry, current_user.id)
+
+    # Conditional request: answer 304 from the versions alone when the client's copy is current
+    if is_conditional(request):
+        row = db.execute(product_versions().filter(Product.id == id)).first()
+        if row is not None and row.owner_id == current_user.id:
+            tag, modified = validators(product_row_state(row))
+            if is_not_modified(request, tag, modified):
+                return not_modified(tag, modified)
+
+    # Query the database to retrieve a specific product by ID, with its embedded relationships joined in
+    product = db.query(Product).options(*product_detail_options()).filter(Product.id == id).first()
 
     # Validation: Check if the product exists and if the current user is authorized
     if not product:
@@ -53,72 +137,97 @@ def get_product(id: int, db: Session = Depends(get_db), current_user: int = Depe
     if product.owner_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform request action")
     
+    set_validators(response, *validators(product_state(product)))
     return product
 
 # Define a route to update a specific product by ID
 @router.put("/{id}", response_model=product.Product, status_code=status.HTTP_200_OK)
 def update_product(id: int, updated_product: product.ProductCreate, db: Session = Depends(get_db), current_user: int = Depends(get_current_user)):
-    # Query the database to retrieve the product for updating
-    task_product = db.query(Product).filter(Product.id == id)
-    product = task_product.first()
+    # Update the product in a single statement: the ownership check sits in the WHERE clause and RETURNING hands back the new row
+    # (stock is left out: it only changes through order reservations and the /stock endpoint; in_stock is only taken
+    # from the request for products whose stock is not tracked)
+    result = db.execute(
+        update(Product)
+        .where(Product.id == id, Product.owner_id == current_user.id)
+        .values(**updated_product.dict(exclude={"stock", "in_stock"}), in_stock=updated_in_stock(updated_product.in_stock))
+        .returning(*Product.__table__.columns)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.mappings().first()
 
-    # Validation: Check if the product exists and if the current user is authorized
-    if product == None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with id: {id} does not exist")
-    
-    if product.owner_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform request action")
-    
-    # Update the product with the provided data and commit changes
-    task_product.update(updated_product.dict(), synchronize_session=False)
+    # Validation: No row updated means the product does not exist or the current user is not its owner
+    if row is None:
+        raise_missing_or_forbidden(db, Product, id, "Product")
+
+    # Commit changes
     db.commit()
+    catalog.snapshot.refresh_products(db, [id])
 
-    return task_product.first()
+    # The owner is the current user, so it is embedded without loading the relationship
+    return {**row, "owner": current_user}
 
 # Define a route to delete a specific product by ID
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_product(id: int, db: Session = Depends(get_db), current_user: int = Depends(get_current_user)):
-    # Query the database to retrieve the product for deletion
-    task_product = db.query(Product).filter(Product.id == id)
-    product = task_product.first()
+    # Delete the product in a single statement with the ownership check in the WHERE clause
+    result = db.execute(
+        delete(Product)
+        .where(Product.id == id, Product.owner_id == current_user.id)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )
+
+    # Validation: No row deleted means the product does not exist or the current user is not its owner
+    if result.first() is None:
+        raise_missing_or_forbidden(db, Product, id, "Product")
+
+    # Commit changes and return a success response
+    db.commit()
+    catalog.snapshot.remove_product(id)
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+# Define a route to set the stock of a product, optionally sharding it over counter rows for very hot products
+@router.put("/{id}/stock", response_model=product.StockStatus)
+def update_stock(id: int, stock: product.StockUpdate, db: Session = Depends(get_db), current_user: int = Depends(get_current_user)):
+    # Lock the product row so concurrent stock changes apply one after the other
+    product = db.query(Product).filter(Product.id == id, Product.owner_id == current_user.id).with_for_update().first()
+
+    # Validation: No row found means the product does not exist or the current user is not its owner
+    if product is None:
+        raise_missing_or_forbidden(db, Product, id, "Product")
+
+    # Replace the stock (and its shards), then commit changes
+    set_stock(db, product, stock.stock, stock.shards)
+    db.commit()
+    catalog.snapshot.refresh_products(db, [id])
+
+    return {"product_id": id, "stock": stock.stock, "shards": stock.shards or None}
+
+# Define a route to retrieve the current stock of a product (summed over its shards when sharded)
+@router.get("/{id}/stock", response_model=product.StockStatus)
+def get_stock(id: int, db: Session = Depends(get_db), current_user: int = Depends(get_current_user)):
+    # Query the database to retrieve a specific product by ID
+    product = db.query(Product).filter(Product.id == id).first()
 
     # Validation: Check if the product exists and if the current user is authorized
-    if product == None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with id: {id} does not exist")
-    
+    if not product:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with id: {id} was not found")
+
     if product.owner_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform request action")
-    
-    # Delete the product from the database, commit changes, and return a success response
-    task_product.delete(synchronize_session=False)
-    db.commit()
 
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
+    return {"product_id": id, "stock": current_stock(db, product), "shards": product.stock_shards}
 
-#Define a route to mass add products using a csv file returning a list of created products
-@router.post("/mass-create", status_code=status.HTTP_201_CREATED, response_model=List[product.Product])
-async def mass_create_products(
+# Define a route to mass add products from a CSV upload (name,description,price[,in_stock]), returning an import summary
+@router.post("/mass-create", status_code=status.HTTP_201_CREATED, response_model=product.ImportSummary)
+def mass_create_products(
     file: UploadFile = File(...),  # Use FastAPI's UploadFile for handling file uploads
+    batch_size: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: int = Depends(get_current_user)
 ):
-    # Read the CSV file content
-    csv_content = await file.read()
-
-    # Process CSV content and create products
-    products = []
-    for line in csv_content.decode().split('\n'):
-        # Assuming CSV format: name,description,price,in_stock
-        parts = line.strip().split(',')
-        if len(parts) == 4:
-            product_data = {
-                "name": parts[0],
-                "description": parts[1],
-                "price": float(parts[2]),
-                "in_stock": bool(parts[3].lower() == 'true'),  # Convert 'true' or 'false' to a boolean
-            }
-            # Use the existing create_product function
-            new_product = create_product(product.productCreate(**product_data), db, current_user)
-            products.append(new_product)
-
-    return {"Products added :":products}
\ No newline at end of file
+    # Stream the upload through the CSV importer, inserting valid rows in batches and collecting row errors
+    return import_products(db, current_user.id, file.file,
+                           batch_size=max(1, batch_size or settings.import_batch_size),
+                           max_errors=settings.import_max_errors)
@@ -1,25 +1,30 @@
 from fastapi import FastAPI, Response, status, HTTPException, Depends, APIRouter
+from sqlalchemy import update, delete
 from sqlalchemy.orm import Session
 from ..models.models import User
 from ..schemas import user
 from ..db.config import get_db
-from ..middleware.oauth2 import get_current_user
+from ..db.replicas import get_read_db
+from ..helpers.ownership import raise_missing_or_forbidden
+from ..middleware.oauth2 import get_current_user, invalidate_user
 from ..helpers import utils
+from ..helpers.metrics import TimedRoute
 
 # Create an instance of APIRouter for handling user-related routes
 router = APIRouter(
     prefix="/users",
-    tags=['Users']
+    tags=['Users'],
+    route_class=TimedRoute
 )
 
 # Define a route to create a new user
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=user.UserOut)
 def create_user(user: user.UserCreate, db: Session = Depends(get_db)):
-    try:
-        # Hash the password before storing it in the database
-        hashed_password = utils.hash(user.password)
-        user.password = hashed_password
+    # Hash the password in the hashing pool before storing it in the database (a full pool answers 503)
+    hashed_password = utils.hash(user.password)
+    user.password = hashed_password
 
+    try:
         # Create a new user instance with the provided data
         new_user = User(**user.dict())
 
@@ -36,7 +41,7 @@ def create_user(user: user.UserCreate, db: Session = Depends(get_db)):
 
 # Define a route to retrieve a specific user by ID
 @router.get("/{id}", response_model=user.UserOut)
-def get_user(id: int, db: Session = Depends(get_db)):
+def get_user(id: int, db: Session = Depends(get_read_db)):
     # Query the database to retrieve a specific user by ID
     user = db.query(User).filter(User.id == id).first()
 
@@ -49,39 +54,43 @@ def get_user(id: int, db: Session = Depends(get_db)):
 # Define a route to update a specific user by ID
 @router.put("/{id}", response_model=user.UserUpdate, status_code=status.HTTP_200_OK)
 def update_user(id: int, updated_user: user.UserCreate, db: Session = Depends(get_db), current_user: int = Depends(get_current_user)):
-    # Query the database to retrieve the user for updating
-    user_query = db.query(User).filter(User.id == id)
-    user = user_query.first()
+    # Update the user in a single statement: only the user themselves matches the WHERE clause, RETURNING hands back the new row
+    result = db.execute(
+        update(User)
+        .where(User.id == id, User.id == current_user.id)
+        .values(**updated_user.dict())
+        .returning(*User.__table__.columns)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.mappings().first()
 
-    # Validation: Check if the user exists and if the current user is authorized
-    if user == None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id: {id} does not exist")
-    
-    if user.id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform request action")
-    
-    # Update the user with the provided data and commit changes
-    user_query.update(updated_user.dict(), synchronize_session=False)
+    # Validation: No row updated means the user does not exist or is not the current user
+    if row is None:
+        raise_missing_or_forbidden(db, User, id, "User")
+
+    # Commit changes and drop the stale cached copy
     db.commit()
+    invalidate_user(id)
 
-    return user_query.first()
+    return dict(row)
 
 # Define a route to delete a specific user by ID
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_user(id: int, db: Session = Depends(get_db), current_user: int = Depends(get_current_user)):
-    # Query the database to retrieve the user for deletion
-    user_query = db.query(User).filter(User.id == id)
-    user = user_query.first()
+    # Delete the user in a single statement; only the user themselves matches the WHERE clause
+    result = db.execute(
+        delete(User)
+        .where(User.id == id, User.id == current_user.id)
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
 
-    # Validation: Check if the user exists and if the current user is authorized
-    if user == None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id: {id} does not exist")
-    
-    if user.id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform request action")
-    
-    # Delete the user from the database, commit changes, and return a success response
-    user_query.delete(synchronize_session=False)
+    # Validation: No row deleted means the user does not exist or is not the current user
+    if result.first() is None:
+        raise_missing_or_forbidden(db, User, id, "User")
+
+    # Commit changes, drop the cached copy, and return a success response
     db.commit()
+    invalidate_user(id)
 
-    return Response(status_code=status.HTTP_204_NO_CONTENT, detail=f"User {user} was deleted")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
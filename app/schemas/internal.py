@@ -0,0 +1,51 @@
+from pydantic import BaseModel
+from typing import Dict, Optional
+
+# Define a Pydantic model for the checkout wait-time histogram (cumulative bucket counts keyed by upper bound)
+class WaitHistogram(BaseModel):
+    buckets: Dict[str, int]
+    count: int
+    sum: float
+
+# Define a Pydantic model for the live state of a connection pool
+class PoolStatus(BaseModel):
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    max_overflow: int
+    timeout: float
+    checkout_failures: Optional[int] = None
+    checkout_wait_seconds: Optional[WaitHistogram] = None
+
+# Define a Pydantic model for the counters of an in-process cache
+class CacheStatus(BaseModel):
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
+    evictions: int
+
+# Define a Pydantic model for the state of the in-memory product catalog (age of the last refresh, change watermark)
+class CatalogStatus(BaseModel):
+    enabled: bool
+    loaded: bool
+    size: int
+    age_seconds: Optional[float] = None
+    stale: int
+    refreshes: int
+    listening: bool
+    watermark: Optional[str] = None
+
+# Define a Pydantic model for the health of a read replica (checked_at is a Unix timestamp)
+class ReplicaStatus(BaseModel):
+    name: str
+    healthy: bool
+    lag_seconds: Optional[float] = None
+    error: Optional[str] = None
+    checked_at: Optional[float] = None
+
+# Define a Pydantic model for the readiness of the worker, with the time spent in each warm-up step
+class ReadinessStatus(BaseModel):
+    ready: bool
+    warmup_seconds: Dict[str, float]
@@ -1,12 +1,13 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import List
 from .user import UserOut
 from .product import Product
 
 # Define a Pydantic model for the base order data
 class OrderBase(BaseModel):
     product_id: int
-    quantity: int
+    quantity: int = Field(gt=0)
 
 # Define a Pydantic model for creating new orders, inheriting from OrderBase
 class OrderCreate(OrderBase):
@@ -23,3 +24,19 @@ class Order(OrderBase):
 
     class Config:
         orm_mode = True  # Enables ORM mode for better compatibility with SQLAlchemy
+
+# Define a Pydantic model for creating several orders in one request
+class OrderBatchCreate(BaseModel):
+    orders: List[OrderCreate]
+    atomic: bool = True  # All-or-nothing when true, otherwise valid lines are created and invalid ones reported
+
+# Define a Pydantic model for an order line rejected in a batch
+class OrderBatchError(BaseModel):
+    index: int
+    product_id: int
+    error: str
+
+# Define a Pydantic model for the result of a batch of orders
+class OrderBatchResult(BaseModel):
+    created: List[Order]
+    errors: List[OrderBatchError]
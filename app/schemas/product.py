@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import List, Optional
 from .user import UserOut
 
 # Define a Pydantic model for the base product data
@@ -8,6 +9,7 @@ class ProductBase(BaseModel):
     description: str
     price: int
     in_stock: bool = True
+    stock: Optional[int] = Field(None, ge=0)  # Initial units available (omitted: stock is not tracked)
 
 # Define a Pydantic model for creating new products, inheriting from ProductBase
 class ProductCreate(ProductBase):
@@ -18,11 +20,36 @@ class Product(ProductBase):
     id: int
     created_at: datetime
     owner_id: int
+    stock_shards: Optional[int] = None  # Set when the stock is sharded (see GET /products/{id}/stock for the total)
     owner: UserOut  # Embedded user details
 
     class Config:
         orm_mode = True  # Enables ORM mode for better compatibility with SQLAlchemy
 
+# Define a Pydantic model for setting the stock of a product, optionally split over counter shards for hot products
+class StockUpdate(BaseModel):
+    stock: int = Field(ge=0)
+    shards: int = Field(0, ge=0, le=64)
+
+# Define a Pydantic model for the stock of a product (stock is null when not tracked)
+class StockStatus(BaseModel):
+    product_id: int
+    stock: Optional[int]
+    shards: Optional[int]
+
+# Define a Pydantic model for a CSV row rejected during a bulk import
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+# Define a Pydantic model summarizing a bulk import (created ids are reported as [first, last] ranges)
+class ImportSummary(BaseModel):
+    inserted: int
+    failed: int
+    ids: List[List[int]]
+    errors: List[ImportRowError]
+    errors_truncated: bool
+
 # (Optional) Commented-out class for a potential ProductOut model (if needed)
 # class ProductOut(BaseModel):
 #     product: Product
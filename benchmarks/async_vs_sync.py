@@ -0,0 +1,105 @@
+# Compare throughput of the sync and async database modes at high concurrency.
+#
+# Boots `app.main:app` twice with uvicorn (ASYNC_DATABASE=false, then true) against the database
+# configured in .env, seeds a user and a few products, then hammers GET /products/ and GET /products/{id}.
+#
+#   python -m benchmarks.async_vs_sync --concurrency 200 --duration 15
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+
+# Start a uvicorn worker for the app with the given database mode and wait until it answers
+def start_server(port: int, async_database: bool):
+    env = dict(os.environ, ASYNC_DATABASE=str(async_database).lower())
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start in time")
+
+
+# Create a throwaway user with a handful of products and return the auth headers and product ids
+def seed(base_url: str, products: int):
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    with httpx.Client(base_url=base_url, timeout=30) as client:
+        client.post("/users/", json={"fullname": "Bench", "email": email, "password": "bench"}).raise_for_status()
+        token = client.post("/login", data={"username": email, "password": "bench"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        ids = []
+        for i in range(products):
+            response = client.post("/products/", headers=headers,
+                                   json={"name": f"bench-{i}", "description": "benchmark product", "price": i})
+            ids.append(response.json()["id"])
+    return headers, ids
+
+
+# Keep `concurrency` requests in flight for `duration` seconds and collect per-request latencies
+async def hammer(base_url: str, headers: dict, paths: list, concurrency: int, duration: float):
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+        stop_at = time.perf_counter() + duration
+
+        async def worker(offset: int):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                response = await client.get(paths[i % len(paths)])
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+                i += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+# Print throughput and latency percentiles for one run
+def report(label: str, latencies: list, errors: int, elapsed: float):
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"{label:<6} {len(latencies) / elapsed:10.1f} req/s   "
+          f"p50 {quantiles[49] * 1000:7.1f} ms   p99 {quantiles[98] * 1000:7.1f} ms   errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sync and async database modes")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    for label, async_database in (("sync", False), ("async", True)):
+        process = start_server(args.port, async_database)
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            headers, ids = seed(base_url, args.products)
+            paths = ["/products/"] + [f"/products/{id}" for id in ids]
+            report(label, *asyncio.run(hammer(base_url, headers, paths, args.concurrency, args.duration)))
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
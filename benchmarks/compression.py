@@ -0,0 +1,111 @@
+# Bytes on the wire and CPU cost of response compression for the list endpoints.
+#
+# Seeds products and orders, then fetches GET /products/ and GET /orders/ in-process through the ASGI app at
+# several page sizes, once without compression (Accept-Encoding: identity) and once per encoder available in this
+# process (gzip always; br and zstd when the brotli and zstandard packages are installed). For each it reports the
+# response size on the wire, the compression ratio, the CPU time spent compressing that body and the mean request
+# latency. Runs against a fresh SQLite file unless --database-url points elsewhere.
+#
+#   python -m benchmarks.compression
+#   python -m benchmarks.compression --limits 10 100 1000 --requests 50
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+
+# Point the app at the benchmark database; must run before anything from `app` is imported
+def configure(database_url: str):
+    database_url = database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='compression-'), 'compression.db')}"
+    os.environ.update(DATABASE_URL=database_url, DB_CREATE_ALL="true", COMPRESSION_ENABLED="true")
+    os.environ.setdefault("SECRET_KEY", "compression-benchmark")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "240")
+    return database_url
+
+
+# Insert `count` products and as many orders, all owned by one new user
+def seed(count: int):
+    from sqlalchemy import insert
+    from app.db.config import SessionLocal
+    from app.models.models import Order, Product, User
+
+    db = SessionLocal()
+    try:
+        owner = db.scalar(insert(User).returning(User.id), [{
+            "fullname": "Compression", "email": f"compression-{time.time_ns()}@example.com", "password": "-"}])
+        products = db.scalars(insert(Product).returning(Product.id), [
+            {"name": f"Product {index}", "description": f"Description of product {index}, a sturdy everyday item",
+             "price": 10 + index % 990, "stock": 1000, "owner_id": owner}
+            for index in range(count)
+        ]).all()
+        db.execute(insert(Order), [{"quantity": 1 + index % 5, "product_id": product, "owner_id": owner}
+                                   for index, product in enumerate(products)])
+        db.commit()
+    finally:
+        db.close()
+    return owner
+
+
+# CPU seconds an encoder spends compressing body, averaged over `repeat` runs
+def compress_seconds(encoder, body: bytes, repeat: int):
+    started = time.process_time()
+    for _ in range(repeat):
+        encoder.compress(body)
+    return (time.process_time() - started) / repeat
+
+
+async def run(headers: dict, limits: list, requests: int):
+    from app.helpers.compression import enabled_encoders
+    from app.main import app
+    from .suite.drivers import asgi_client
+
+    encoders = enabled_encoders()
+    print(f"encoders: {', '.join(encoder.name for encoder in encoders)}")
+    async with asgi_client(app) as client:
+        for path in ("/products/", "/orders/"):
+            for limit in limits:
+                for encoder in [None, *encoders]:
+                    accept = encoder.name if encoder else "identity"
+                    latencies = []
+                    for _ in range(requests):
+                        started = time.perf_counter()
+                        response = await client.get(path, params={"limit": limit},
+                                                    headers={**headers, "Accept-Encoding": accept})
+                        latencies.append(time.perf_counter() - started)
+                        response.raise_for_status()
+                    if encoder is None:
+                        identity = response.num_bytes_downloaded
+                        body = response.content
+                    wire = response.num_bytes_downloaded
+                    cpu = compress_seconds(encoder, body, requests) if encoder else 0.0
+                    print(f"{path:<11} limit {limit:<5} {accept:<9} {wire:>9} B   ratio {identity / wire:6.2f}   "
+                          f"compress {cpu * 1000:7.3f} ms   request {statistics.mean(latencies) * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response compression of the list endpoints")
+    parser.add_argument("--database-url")
+    parser.add_argument("--limits", type=int, nargs="+", default=[10, 50, 100, 500], help="page sizes")
+    parser.add_argument("--requests", type=int, default=20, help="requests per page size and encoding")
+    args = parser.parse_args()
+
+    database_url = configure(args.database_url)
+
+    # Import the app only now that the environment points at the benchmark database
+    from app.db.config import engine
+    from app.helpers.generate_jwt import create_access_token
+    from app.models.models import Base
+
+    Base.metadata.create_all(bind=engine)
+    owner = seed(max(args.limits))
+    print(f"seeded {max(args.limits)} products and orders into {database_url.split(':', 1)[0]}")
+
+    headers = {"Authorization": f"Bearer {create_access_token(data={'user_id': owner})}"}
+    asyncio.run(run(headers, args.limits, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# Microbenchmark of access-token verification cost per request, with and without the verified-token cache.
+#
+# Verifies the same bearer token over and over, as a busy client does, using the settings from .env.
+#
+#   python -m benchmarks.jwt_verify --iterations 100000
+import argparse
+import time
+
+from fastapi import HTTPException
+
+from app.environment.config import settings
+from app.helpers.generate_jwt import create_access_token
+from app.middleware.validate_jwt import verify_access_token, token_cache
+
+
+# Average time of one verify_access_token call over `iterations` calls
+def time_verification(token: str, iterations: int):
+    credentials_exception = HTTPException(status_code=401)
+    verify_access_token(token, credentials_exception)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        verify_access_token(token, credentials_exception)
+    return (time.perf_counter() - started) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure access-token verification cost per request")
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    token = create_access_token(data={"user_id": 1})
+    results = {}
+    for label, enabled in (("uncached", False), ("cached", True)):
+        settings.jwt_cache_enabled = enabled
+        token_cache.clear()
+        results[label] = time_verification(token, args.iterations)
+        print(f"{label:<9} {results[label] * 1e6:8.2f} us/verification")
+    print(f"speedup   {results['uncached'] / results['cached']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# Microbenchmark of the per-request cost of the request metrics middleware.
+#
+# Sends the same request straight into two ASGI apps that serve the application's routers plus a trivial /ping
+# route (registered last, so route matching scans the whole table, the worst case): one bare, one wrapped in
+# MetricsMiddleware with the database and serialization instrumentation installed. The difference in time per
+# request is the overhead the metrics add; the end-to-end effect can be measured with the benchmark suite by
+# running it with METRICS_ENABLED=false and =true and comparing the two result files.
+#
+#   python -m benchmarks.metrics_overhead --iterations 50000
+import argparse
+import asyncio
+import os
+import time
+
+# Settings the app needs at import (the database is never touched)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "metrics-overhead")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+# Routes time their serialization only when metrics are enabled at import; the bare app uses plain APIRoutes
+os.environ["METRICS_ENABLED"] = "true"
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+
+from app.helpers import metrics, query_stats
+from app.middleware.metrics import MetricsMiddleware
+from app.routes import product, user, auth, order, internal
+
+
+# An app serving the application's routers and /ping, optionally wrapped in the metrics middleware (with /ping
+# then timing its serialization)
+def build_app(with_metrics: bool):
+    app = FastAPI()
+    app.router.route_class = metrics.TimedRoute if with_metrics else APIRoute
+    for router in (user.router, auth.router, product.router, order.router, internal.router):
+        app.include_router(router)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    if with_metrics:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+# Average time of one GET /ping through `app` over `iterations` requests
+async def time_requests(app, iterations: int):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": "/ping", "raw_path": b"/ping", "root_path": "", "query_string": b"", "headers": [],
+             "client": ("127.0.0.1", 1234), "server": ("benchmark", 80)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(1000):
+        await app(dict(scope), receive, send)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / iterations
+
+
+async def run(iterations: int, rounds: int):
+    bare, instrumented = build_app(False), build_app(True)
+    query_stats.instrument()
+    # Alternate the two apps and keep the best round of each, so CPU frequency and noise affect both alike
+    results = {"bare": [], "metrics": []}
+    for _ in range(rounds):
+        results["bare"].append(await time_requests(bare, iterations))
+        results["metrics"].append(await time_requests(instrumented, iterations))
+    return {label: min(times) for label, times in results.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the per-request overhead of the metrics middleware")
+    parser.add_argument("--iterations", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.iterations, args.rounds))
+    for label, seconds in results.items():
+        print(f"{label:<8} {seconds * 1e6:8.2f} us/request")
+    overhead = results["metrics"] - results["bare"]
+    print(f"overhead {overhead * 1e6:8.2f} us/request ({overhead / results['bare'] * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Check that list and detail routes issue a fixed number of SQL statements whatever the page size.
+#
+# Runs the app in-process (TestClient) against the database configured in .env, seeds a throwaway user with
+# products owned by several users and orders on them, then counts the statements each request executes.
+# Exits non-zero when the count for a route varies with the page size (an N+1 lazy load slipped back in).
+#
+#   python -m benchmarks.query_count --rows 100
+import argparse
+import sys
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.main import app
+from app.db.config import engine
+
+PAGE_SIZES = (1, 10, 50, 100)
+
+
+# Count the statements executed on the engine while running `call`
+def count_queries(call):
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        response = call()
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+    response.raise_for_status()
+    return len(statements)
+
+
+# Register a throwaway user and return its auth headers
+def login(client: TestClient, tag: str):
+    email = f"qc-{tag}-{uuid.uuid4().hex[:8]}@example.com"
+    client.post("/users/", json={"fullname": tag, "email": email, "password": "qc"}).raise_for_status()
+    token = client.post("/login", data={"username": email, "password": "qc"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check for per-row lazy loads in list and detail routes")
+    parser.add_argument("--rows", type=int, default=max(PAGE_SIZES))
+    parser.add_argument("--owners", type=int, default=5)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    # Several owners, so the select-in loaders really have to fetch more than one user
+    owners = [login(client, f"owner{n}") for n in range(args.owners)]
+    product_ids = []
+    for i in range(args.rows):
+        headers = owners[i % len(owners)]
+        response = client.post("/products/", headers=headers,
+                               json={"name": f"qc-{i}", "description": "query count", "price": i})
+        product_ids.append(response.json()["id"])
+        client.post("/orders/", headers=headers, json={"product_id": product_ids[-1], "quantity": 1})
+
+    headers = owners[0]
+    routes = {
+        "GET /products/": lambda limit: client.get("/products/", params={"limit": limit}, headers=headers),
+        "GET /orders/": lambda limit: client.get("/orders/", params={"limit": limit}, headers=headers),
+        "GET /products/{id}": lambda limit: client.get(f"/products/{product_ids[0]}", headers=headers),
+    }
+
+    failed = False
+    for route, call in routes.items():
+        counts = {limit: count_queries(lambda: call(limit)) for limit in PAGE_SIZES}
+        stable = len(set(counts.values())) == 1
+        failed |= not stable
+        print(f"{route:<20} " + "  ".join(f"limit={k}: {v}" for k, v in counts.items())
+              + ("" if stable else "   <-- varies with page size"))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
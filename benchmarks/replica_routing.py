@@ -0,0 +1,118 @@
+# Local check of read-replica routing with two SQLite files standing in for a primary and its replica.
+#
+# Verifies that read-only routes are served by the replica, that a client's reads go to the primary right after
+# it wrote (read-your-writes), and that a lagging replica is ejected from rotation and readmitted once it catches
+# up. "Replication" is simulated by copying the primary's tables into the replica file, and the lag by a
+# replica_lag table read through REPLICA_LAG_QUERY.
+#
+#   python -m benchmarks.replica_routing
+#   python -m benchmarks.replica_routing --async   # AsyncSession routes, needs the aiosqlite driver
+import os
+import sys
+import tempfile
+import time
+
+# Header of the diagnostic endpoints (GET /internal/replicas)
+INTERNAL_HEADERS = {"X-Internal-Token": "replica-routing-check"}
+
+# Configure the app for the two files before it is imported
+DIRECTORY = tempfile.mkdtemp(prefix="replica-routing-")
+PRIMARY, REPLICA = os.path.join(DIRECTORY, "primary.db"), os.path.join(DIRECTORY, "replica.db")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{PRIMARY}",
+    DATABASE_REPLICA_URLS=f"sqlite:///{REPLICA}",
+    DB_CREATE_ALL="true",
+    REPLICA_LAG_QUERY="SELECT seconds FROM replica_lag",
+    REPLICA_HEALTH_INTERVAL="0.2",
+    READ_YOUR_WRITES_SECONDS="2",
+    ASYNC_DATABASE="true" if "--async" in sys.argv else "false",
+    PASSWORD_HASH_WORKERS="0",
+    BCRYPT_ROUNDS="4",
+    WARMUP_PASSWORD_HASHING="false",
+    INTERNAL_TOKEN=INTERNAL_HEADERS["X-Internal-Token"],
+)
+os.environ.setdefault("SECRET_KEY", "replica-routing-check")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.db.config import Base
+from app.db.replicas import replicas
+from app.main import app
+
+replica = replicas[0]
+failures = []
+
+
+# Print one check and remember failures for the exit code
+def check(label: str, passed: bool):
+    print(f"{'ok  ' if passed else 'FAIL'} {label}")
+    if not passed:
+        failures.append(label)
+
+
+# Bring the replica up to date by copying every table from the primary
+def replicate():
+    with replica.engine.begin() as connection:
+        connection.exec_driver_sql(f"ATTACH DATABASE '{PRIMARY}' AS source")
+        for table in Base.metadata.sorted_tables:
+            connection.exec_driver_sql(f"DELETE FROM main.{table.name}")
+            connection.exec_driver_sql(f"INSERT INTO main.{table.name} SELECT * FROM source.{table.name}")
+    with replica.engine.begin() as connection:
+        connection.exec_driver_sql("DETACH DATABASE source")
+
+
+# Pretend the replica is `seconds` behind and wait for the health check to notice
+def set_lag(seconds: float):
+    with replica.engine.begin() as connection:
+        connection.execute(text("UPDATE replica_lag SET seconds = :seconds"), {"seconds": seconds})
+    time.sleep(0.5)
+
+
+def main():
+    # The replica gets the same schema plus the table its lag is read from
+    Base.metadata.create_all(replica.engine)
+    with replica.engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE replica_lag (seconds REAL NOT NULL)")
+        connection.exec_driver_sql("INSERT INTO replica_lag VALUES (0)")
+
+    with TestClient(app) as client:
+        client.post("/users/", json={"fullname": "Replica", "email": "replica@example.com", "password": "pw"})
+        token = client.post("/login", data={"username": "replica@example.com", "password": "pw"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        # A write sets the read-your-writes cookie, so the new row is visible straight away
+        created = client.post("/products/", json={"name": "p", "description": "d", "price": 1}, headers=headers)
+        check("write sets the read-your-writes cookie", "read_primary_until" in created.headers.get("set-cookie", ""))
+        product = created.json()["id"]
+        check("read after write goes to the primary", client.get(f"/products/{product}", headers=headers).status_code == 200)
+
+        # Without the cookie the read is served by the replica, which has not seen the product yet
+        client.cookies.clear()
+        check("reads without a recent write go to the replica",
+              client.get(f"/products/{product}", headers=headers).status_code == 404)
+        replicate()
+        check("replica serves the row once replicated", client.get(f"/products/{product}", headers=headers).status_code == 200)
+
+        # A lagging replica is ejected and reads fall back to the primary
+        second = client.post("/products/", json={"name": "q", "description": "d", "price": 1}, headers=headers).json()["id"]
+        client.cookies.clear()
+        set_lag(60)
+        status = client.get("/internal/replicas", headers=INTERNAL_HEADERS).json()[0]
+        check("lagging replica is ejected", status["healthy"] is False and status["lag_seconds"] == 60)
+        check("reads fall back to the primary", client.get(f"/products/{second}", headers=headers).status_code == 200)
+
+        # Once it caught up it is back in rotation
+        set_lag(0)
+        status = client.get("/internal/replicas", headers=INTERNAL_HEADERS).json()[0]
+        check("replica is readmitted after catching up", status["healthy"] is True)
+        check("reads go to the replica again", client.get(f"/products/{second}", headers=headers).status_code == 404)
+
+    print(f"{len(failures)} failure(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
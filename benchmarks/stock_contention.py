@@ -0,0 +1,96 @@
+# Flash-sale contention: many workers order the same product until it is sold out, checking that the conditional
+# stock UPDATE never oversells and reporting the order throughput (optionally with the stock split over shards).
+#
+# Runs directly against the database configured in .env, on a throwaway user and product. Use at most
+# DB_POOL_SIZE + DB_MAX_OVERFLOW workers.
+#
+#   python -m benchmarks.stock_contention --stock 5000 --workers 32
+#   python -m benchmarks.stock_contention --stock 5000 --workers 32 --shards 16
+import argparse
+import threading
+import time
+import uuid
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from app.db.config import SessionLocal
+from app.helpers.inventory import current_stock, reserve_stock, set_stock
+from app.models.models import Order, Product, User
+
+
+# Place orders of `quantity` units in a loop, the way create_order does, until the product is sold out
+def worker(product_id: int, owner_id: int, quantity: int, counts: dict, lock: threading.Lock):
+    placed = failed = 0
+    while True:
+        db = SessionLocal()
+        try:
+            reserve_stock(db, product_id, quantity)
+            db.add(Order(owner_id=owner_id, product_id=product_id, quantity=quantity))
+            db.commit()
+            placed += 1
+        except HTTPException:
+            # Sold out: this worker is done
+            break
+        except Exception:
+            # Deadlock or serialization failure reported by the database: count it and retry
+            failed += 1
+        finally:
+            db.close()
+    with lock:
+        counts["placed"] += placed
+        counts["failed"] += failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hammer one product with concurrent orders")
+    parser.add_argument("--stock", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--quantity", type=int, default=1)
+    parser.add_argument("--shards", type=int, default=0)
+    args = parser.parse_args()
+
+    # Seed a throwaway owner and product with the requested stock
+    db = SessionLocal()
+    owner = User(fullname="Bench", email=f"bench-{uuid.uuid4().hex[:12]}@example.com", password="x")
+    db.add(owner)
+    db.flush()
+    product = Product(name="bench", description="stock contention", price=0, in_stock=True, owner_id=owner.id)
+    db.add(product)
+    db.flush()
+    set_stock(db, product, args.stock, args.shards)
+    db.commit()
+    owner_id, product_id = owner.id, product.id
+
+    try:
+        counts, lock = {"placed": 0, "failed": 0}, threading.Lock()
+        threads = [threading.Thread(target=worker, args=(product_id, owner_id, args.quantity, counts, lock))
+                   for _ in range(args.workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        # Every unit is accounted for by exactly one order, and nothing is left or oversold
+        db.expire_all()
+        remaining = current_stock(db, db.get(Product, product_id))
+        ordered = db.scalar(select(func.coalesce(func.sum(Order.quantity), 0)).filter(Order.product_id == product_id))
+        print(f"workers {args.workers}   shards {args.shards or '-'}   orders {counts['placed']}   "
+              f"retries {counts['failed']}   {counts['placed'] / elapsed:8.1f} orders/s")
+        print(f"stock {args.stock}   ordered {ordered}   remaining {remaining}")
+        if ordered + remaining != args.stock or remaining < 0:
+            raise SystemExit("OVERSOLD: ordered units and remaining stock do not add up to the initial stock")
+        if remaining >= args.quantity:
+            raise SystemExit("UNDERSOLD: orders were refused while stock was still available")
+        print("ok: sold out without overselling")
+    finally:
+        # Deleting the owner cascades to the product, its shards and its orders
+        db.delete(db.get(User, owner_id))
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
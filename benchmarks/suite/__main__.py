@@ -0,0 +1,129 @@
+# Reproducible API benchmark suite.
+#
+# `run` seeds a database with users, products and orders, then drives GET /products/, GET /products/{id} (plain
+# and revalidated with If-None-Match), GET /orders/, GET /orders/{id} and POST /login at each concurrency level,
+# in-process through the ASGI app ("asgi", which also counts SQL statements per request) and/or over HTTP against
+# uvicorn ("http"). It reports throughput and p50/p95/p99 latency and saves everything as JSON. `compare` diffs two result files and exits
+# non-zero when a scenario regressed by more than the threshold.
+#
+# By default every run uses a fresh SQLite file; pass --database-url to benchmark against Postgres (tables are
+# created when missing, seeded rows are left in place).
+#
+#   python -m benchmarks.suite run --users 20 --products 5000 --orders 20000 --concurrency 1,16,64 --output before.json
+#   python -m benchmarks.suite run ... --output after.json
+#   python -m benchmarks.suite compare before.json after.json --threshold 0.10
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+# Scales selectable with --scale (users, products, orders); explicit counts override them
+SCALES = {"small": (10, 1000, 5000), "medium": (50, 20000, 100000), "large": (200, 200000, 1000000)}
+
+
+# Point the app at the benchmark database; must run before anything from `app` is imported
+def configure(args):
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='benchmark-'), 'bench.db')}"
+    os.environ.update(DATABASE_URL=database_url, DB_CREATE_ALL="true")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "240")
+    # The POST /login scenario logs in far faster than the login rate limits allow
+    os.environ.setdefault("LOGIN_RATE_LIMIT_ENABLED", "false")
+    return database_url
+
+
+# Drive every scenario at every concurrency level in-process, counting SQL statements per request
+async def run_asgi(app, dataset, args, scenarios, rows):
+    from . import drivers, report
+    async with drivers.asgi_client(app) as client:
+        with drivers.QueryCounter() as counter:
+            for name, scenario in scenarios.items():
+                for concurrency in args.concurrency:
+                    run = await drivers.drive(client, scenario, dataset, concurrency, args.duration, args.warmup,
+                                              args.seed, counter)
+                    rows.append(report.summarize("asgi", name, concurrency, run))
+                    report.print_row(rows[-1])
+
+
+# Drive every scenario at every concurrency level over HTTP against the running server
+async def run_http(dataset, args, scenarios, rows):
+    from . import drivers, report
+    async with drivers.http_client(args.port, max(args.concurrency)) as client:
+        for name, scenario in scenarios.items():
+            for concurrency in args.concurrency:
+                run = await drivers.drive(client, scenario, dataset, concurrency, args.duration, args.warmup, args.seed)
+                rows.append(report.summarize("http", name, concurrency, run))
+                report.print_row(rows[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite", description="API benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="seed a database and benchmark the API")
+    run_parser.add_argument("--scale", choices=SCALES, default="small")
+    run_parser.add_argument("--users", type=int)
+    run_parser.add_argument("--products", type=int)
+    run_parser.add_argument("--orders", type=int)
+    run_parser.add_argument("--database-url")
+    run_parser.add_argument("--mode", default="asgi,http", help="comma-separated: asgi, http")
+    run_parser.add_argument("--scenarios", help="comma-separated scenario names (default: all)")
+    run_parser.add_argument("--concurrency", default="1,16,64", help="comma-separated concurrency levels")
+    run_parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per scenario and level")
+    run_parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each measurement")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--port", type=int, default=8766)
+    run_parser.add_argument("--workers", type=int, default=1, help="uvicorn workers in http mode")
+    run_parser.add_argument("--output", default="benchmark-results.json")
+
+    compare_parser = commands.add_parser("compare", help="diff two result files and flag regressions")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="tolerated relative change")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        from . import report
+        regressions = report.compare(report.load(args.baseline), report.load(args.candidate), args.threshold)
+        print(f"{len(regressions)} regression(s)")
+        sys.exit(1 if regressions else 0)
+
+    args.concurrency = [int(level) for level in args.concurrency.split(",")]
+    users, products, orders = SCALES[args.scale]
+    users, products, orders = args.users or users, args.products or products, args.orders or orders
+    database_url = configure(args)
+
+    # Import the app only now that the environment points at the benchmark database
+    from app.db.config import engine
+    from app.main import app
+    from app.models.models import Base
+    from . import drivers, report, scenarios, seed
+
+    Base.metadata.create_all(bind=engine)
+    dataset = seed.seed(users, products, orders, seed=args.seed)
+    selected = {name: scenario for name, scenario in scenarios.SCENARIOS.items()
+                if not args.scenarios or name in args.scenarios.split(",")}
+
+    rows = []
+    modes = args.mode.split(",")
+    if "asgi" in modes:
+        asyncio.run(run_asgi(app, dataset, args, selected, rows))
+    if "http" in modes:
+        process = drivers.start_server(args.port, args.workers)
+        try:
+            asyncio.run(run_http(dataset, args, selected, rows))
+        finally:
+            process.terminate()
+            process.wait()
+
+    meta = report.metadata({"users": users, "products": products, "orders": orders,
+                            "database": database_url.split(":", 1)[0], "duration": args.duration,
+                            "warmup": args.warmup, "seed": args.seed, "workers": args.workers})
+    report.save(args.output, meta, rows)
+    print(f"saved {len(rows)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
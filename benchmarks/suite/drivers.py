@@ -0,0 +1,110 @@
+# Drive a scenario at a fixed concurrency, either in-process through the ASGI app or over real HTTP against a
+# uvicorn server, and collect latencies, errors and the number of SQL statements executed.
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from sqlalchemy import event
+
+from app.db.replicas import all_engines
+
+
+# Raw measurements of one scenario run
+class Run:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.elapsed = 0.0
+        self.queries = None
+
+
+# Count the statements executed by this process while the block runs
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        for counted in all_engines().values():
+            event.listen(counted, "before_cursor_execute", self.on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        for counted in all_engines().values():
+            event.remove(counted, "before_cursor_execute", self.on_execute)
+
+
+# Keep `concurrency` requests of a scenario in flight for `duration` seconds, after `warmup` unmeasured seconds;
+# with a QueryCounter, the statements of the measured requests are recorded too
+async def drive(client: httpx.AsyncClient, scenario, dataset, concurrency: int, duration: float, warmup: float,
+                seed: int, counter: QueryCounter = None):
+    run = Run()
+    measuring = False
+
+    async def worker(number: int):
+        rng = random.Random(seed * 10007 + number)
+        while time.perf_counter() < stop_at:
+            method, path, kwargs = scenario(dataset, rng)
+            started = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            if measuring:
+                run.latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    run.errors += 1
+
+    # Warm-up pass (connections, caches), then the measured pass
+    if warmup > 0:
+        stop_at = time.perf_counter() + warmup
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    measuring = True
+    counted_before = counter.count if counter else None
+    started = time.perf_counter()
+    stop_at = started + duration
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    run.elapsed = time.perf_counter() - started
+    if counter:
+        run.queries = counter.count - counted_before
+    return run
+
+
+# In-process client: requests go straight into the ASGI app (lifespan included), statements are counted
+@asynccontextmanager
+async def asgi_client(app):
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            yield client
+
+
+# Start uvicorn for app.main:app with the benchmark environment and wait until it reports ready
+def start_server(port: int, workers: int):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        env=dict(os.environ)
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/internal/ready", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("uvicorn did not become ready in time")
+
+
+# Over-the-wire client against a running server (statements run in the server process and are not counted)
+@asynccontextmanager
+async def http_client(port: int, max_concurrency: int):
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        yield client
@@ -0,0 +1,98 @@
+# Summaries of benchmark runs, the JSON result file, and the comparison of two result files.
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+
+# Latency percentile in milliseconds (nearest rank)
+def percentile(latencies: list, fraction: float):
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000 if ordered else None
+
+
+# One result row: throughput, latency percentiles and statements per request of a run
+def summarize(mode: str, scenario: str, concurrency: int, run):
+    requests = len(run.latencies)
+    return {
+        "mode": mode,
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": run.errors,
+        "throughput": requests / run.elapsed if run.elapsed else 0.0,
+        "latency_ms": {
+            "mean": statistics.mean(run.latencies) * 1000 if requests else None,
+            "p50": percentile(run.latencies, 0.50),
+            "p95": percentile(run.latencies, 0.95),
+            "p99": percentile(run.latencies, 0.99),
+        },
+        "queries_per_request": run.queries / requests if run.queries is not None and requests else None,
+    }
+
+
+# Print one result row
+def print_row(row: dict):
+    latency = row["latency_ms"]
+    queries = row["queries_per_request"]
+    print(f"{row['mode']:<5} {row['scenario']:<20} c={row['concurrency']:<4} {row['throughput']:9.1f} req/s   "
+          f"p50 {latency['p50'] or 0:8.2f}   p95 {latency['p95'] or 0:8.2f}   p99 {latency['p99'] or 0:8.2f} ms   "
+          f"queries/req {'-' if queries is None else f'{queries:.2f}'}   errors {row['errors']}")
+
+
+# Describe the code and machine a result file was produced on
+def metadata(args: dict):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit or None,
+            "python": platform.python_version(), "machine": platform.machine(), "args": args}
+
+
+def save(path: str, meta: dict, rows: list):
+    with open(path, "w") as file:
+        json.dump({"meta": meta, "results": rows}, file, indent=2)
+
+
+def load(path: str):
+    with open(path) as file:
+        return json.load(file)
+
+
+# Relative change from `old` to `new` (None when either side is missing)
+def change(old, new):
+    if old is None or new is None or old == 0:
+        return None
+    return (new - old) / old
+
+
+# Compare two result files row by row; a row regresses when throughput drops or p95/p99 latency rises by more
+# than `threshold` (a fraction), or when it runs more statements per request than before
+def compare(baseline: dict, candidate: dict, threshold: float):
+    old_rows = {(row["mode"], row["scenario"], row["concurrency"]): row for row in baseline["results"]}
+    regressions = []
+    for row in candidate["results"]:
+        key = (row["mode"], row["scenario"], row["concurrency"])
+        old = old_rows.get(key)
+        if old is None:
+            continue
+        deltas = {
+            "throughput": change(old["throughput"], row["throughput"]),
+            "p95": change(old["latency_ms"]["p95"], row["latency_ms"]["p95"]),
+            "p99": change(old["latency_ms"]["p99"], row["latency_ms"]["p99"]),
+        }
+        problems = []
+        if deltas["throughput"] is not None and deltas["throughput"] < -threshold:
+            problems.append("throughput")
+        problems += [name for name in ("p95", "p99") if deltas[name] is not None and deltas[name] > threshold]
+        old_queries, new_queries = old["queries_per_request"], row["queries_per_request"]
+        if old_queries is not None and new_queries is not None and new_queries > old_queries + 0.01:
+            problems.append("queries")
+        formatted = "   ".join(f"{name} {'   n/a' if value is None else f'{value * 100:+6.1f}%'}" for name, value in deltas.items())
+        print(f"{key[0]:<5} {key[1]:<20} c={key[2]:<4} {formatted}"
+              + (f"   <-- REGRESSION ({', '.join(problems)})" if problems else ""))
+        if problems:
+            regressions.append({"key": key, "problems": problems})
+    return regressions
@@ -0,0 +1,46 @@
+# The requests each benchmark scenario sends. Every scenario picks a user at random (seeded per worker, so runs
+# are reproducible) and only touches rows that user owns.
+from .seed import PASSWORD
+
+
+# Build the arguments of the next request of a scenario as (method, path, keyword arguments for httpx)
+def list_products(dataset, rng):
+    user = rng.randrange(len(dataset.headers))
+    return "GET", "/products/", {"params": {"limit": 20}, "headers": dataset.headers[user]}
+
+
+def get_product(dataset, rng):
+    user = rng.randrange(len(dataset.headers))
+    return "GET", f"/products/{rng.choice(dataset.products[user])}", {"headers": dataset.headers[user]}
+
+
+# Revalidation of a cached copy, as polling clients send it; If-None-Match: * matches any current version (304)
+def revalidate_product(dataset, rng):
+    user = rng.randrange(len(dataset.headers))
+    return "GET", f"/products/{rng.choice(dataset.products[user])}", {"headers": {**dataset.headers[user], "If-None-Match": "*"}}
+
+
+def list_orders(dataset, rng):
+    user = rng.randrange(len(dataset.headers))
+    return "GET", "/orders/", {"params": {"limit": 20}, "headers": dataset.headers[user]}
+
+
+def get_order(dataset, rng):
+    user = rng.randrange(len(dataset.headers))
+    return "GET", f"/orders/{rng.choice(dataset.orders[user])}", {"headers": dataset.headers[user]}
+
+
+def login(dataset, rng):
+    email = rng.choice(dataset.emails)
+    return "POST", "/login", {"data": {"username": email, "password": PASSWORD}}
+
+
+# Scenarios by name, in the order they run
+SCENARIOS = {
+    "GET /products/": list_products,
+    "GET /products/{id}": get_product,
+    "GET /products/{id} 304": revalidate_product,
+    "GET /orders/": list_orders,
+    "GET /orders/{id}": get_order,
+    "POST /login": login,
+}
@@ -0,0 +1,68 @@
+# Seed the benchmark database with users, products and orders at a given scale, using bulk inserts.
+import random
+from dataclasses import dataclass, field
+
+from sqlalchemy import insert, select
+
+from app.db.config import SessionLocal
+from app.helpers import utils
+from app.helpers.generate_jwt import create_access_token
+from app.models.models import Order, Product, User
+
+# Password of every seeded user (hashed once, at the configured bcrypt cost)
+PASSWORD = "bench-password"
+
+# Rows per INSERT statement
+CHUNK = 1000
+
+
+# What the scenarios need to know about the seeded data
+@dataclass
+class Dataset:
+    # Per user: email, bearer token headers, ids of its products and orders
+    emails: list = field(default_factory=list)
+    headers: list = field(default_factory=list)
+    products: list = field(default_factory=list)
+    orders: list = field(default_factory=list)
+
+
+# Insert rows in chunks and return the generated ids in insertion order
+def insert_rows(db, model, rows: list):
+    ids = []
+    for start in range(0, len(rows), CHUNK):
+        ids += db.scalars(insert(model).returning(model.id, sort_by_parameter_order=True), rows[start:start + CHUNK]).all()
+    return ids
+
+
+# Create `users` users owning `products` products and `orders` orders between them, deterministically for `seed`
+def seed(users: int, products: int, orders: int, seed: int = 0):
+    rng = random.Random(seed)
+    hashed = utils.pwd_context.hash(PASSWORD)
+    db = SessionLocal()
+    try:
+        # Unique emails per run, so a shared database can be seeded more than once
+        tag = db.scalar(select(User.id).order_by(User.id.desc()).limit(1)) or 0
+        emails = [f"bench-{tag}-{n}@example.com" for n in range(users)]
+        user_ids = insert_rows(db, User, [{"fullname": f"Bench {n}", "email": email, "password": hashed}
+                                          for n, email in enumerate(emails)])
+        product_owners = [user_ids[n % users] for n in range(products)]
+        product_ids = insert_rows(db, Product, [
+            {"name": f"bench-{n}", "description": "benchmark product", "price": rng.randint(1, 10000),
+             "in_stock": True, "owner_id": owner}
+            for n, owner in enumerate(product_owners)
+        ])
+        order_owners = [user_ids[n % users] for n in range(orders)]
+        order_ids = insert_rows(db, Order, [
+            {"owner_id": owner, "product_id": rng.choice(product_ids), "quantity": rng.randint(1, 5)}
+            for owner in order_owners
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    dataset = Dataset(emails=emails)
+    for user_id in user_ids:
+        dataset.headers.append({"Authorization": f"Bearer {create_access_token(data={'user_id': user_id})}"})
+        dataset.products.append([id for id, owner in zip(product_ids, product_owners) if owner == user_id])
+        dataset.orders.append([id for id, owner in zip(order_ids, order_owners) if owner == user_id])
+    return dataset
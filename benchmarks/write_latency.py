@@ -0,0 +1,87 @@
+# Write latency of an owner-checked product update: the former read-check-write pattern versus a single
+# UPDATE ... WHERE owner_id = :user RETURNING statement.
+#
+# Runs directly against the database configured in .env, on a throwaway user and product.
+#
+#   python -m benchmarks.write_latency --iterations 2000
+import argparse
+import statistics
+import time
+import uuid
+
+from sqlalchemy import update
+
+from app.db.config import SessionLocal
+from app.models.models import Product, User
+
+
+# SELECT the row, check ownership in Python, UPDATE it, then SELECT it again (three round trips plus the commit)
+def read_check_write(db, id: int, owner_id: int, values: dict):
+    query = db.query(Product).filter(Product.id == id)
+    product = query.first()
+    if product is None or product.owner_id != owner_id:
+        raise RuntimeError("unexpected ownership failure")
+    query.update(values, synchronize_session=False)
+    db.commit()
+    return query.first()
+
+
+# One UPDATE with the ownership check in the WHERE clause, returning the new row (one round trip plus the commit)
+def single_statement(db, id: int, owner_id: int, values: dict):
+    row = db.execute(
+        update(Product)
+        .where(Product.id == id, Product.owner_id == owner_id)
+        .values(**values)
+        .returning(*Product.__table__.columns)
+        .execution_options(synchronize_session=False)
+    ).mappings().first()
+    if row is None:
+        raise RuntimeError("unexpected ownership failure")
+    db.commit()
+    return row
+
+
+# Time `iterations` updates with the given strategy, each in a fresh session as a request would
+def measure(strategy, id: int, owner_id: int, iterations: int):
+    latencies = []
+    for i in range(iterations):
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            strategy(db, id, owner_id, {"price": i})
+            latencies.append(time.perf_counter() - started)
+        finally:
+            db.close()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare owner-checked update strategies")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Seed a throwaway owner and product
+    db = SessionLocal()
+    owner = User(fullname="Bench", email=f"bench-{uuid.uuid4().hex[:12]}@example.com", password="x")
+    db.add(owner)
+    db.flush()
+    product = Product(name="bench", description="write latency", price=0, owner_id=owner.id)
+    db.add(product)
+    db.commit()
+    owner_id, product_id = owner.id, product.id
+
+    try:
+        for label, strategy in (("read-check-write", read_check_write), ("single statement", single_statement)):
+            latencies = measure(strategy, product_id, owner_id, args.iterations)
+            quantiles = statistics.quantiles(latencies, n=100)
+            print(f"{label:<17} mean {statistics.mean(latencies) * 1000:7.3f} ms   "
+                  f"p50 {quantiles[49] * 1000:7.3f} ms   p99 {quantiles[98] * 1000:7.3f} ms")
+    finally:
+        # Deleting the owner cascades to the product
+        db.delete(db.get(User, owner_id))
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+# Import the models so every table is registered on the metadata, and the URL built from the environment settings
+from app.models import models
+from app.db.config import SQLALCHEMY_DATABASE_URL
+
+# Set up logging from alembic.ini
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+# Metadata compared against the database by `alembic revision --autogenerate`
+target_metadata = models.Base.metadata
+
+# Emit the migration SQL without connecting (`alembic upgrade head --sql`)
+def run_migrations_offline():
+    context.configure(url=SQLALCHEMY_DATABASE_URL, target_metadata=target_metadata, literal_binds=True,
+                      dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+# Run the migrations on a dedicated, unpooled connection
+def run_migrations_online():
+    connectable = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,79 @@
+"""initial schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.models import utcnow
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('fullname', sa.String(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('password', sa.String(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=utcnow(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+    )
+    op.create_table(
+        'products',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('description', sa.String(), nullable=False),
+        sa.Column('price', sa.Integer(), nullable=False),
+        sa.Column('in_stock', sa.Boolean(), server_default=sa.true(), nullable=False),
+        sa.Column('stock', sa.Integer(), nullable=True),
+        sa.Column('stock_shards', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=utcnow(), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.CheckConstraint('stock >= 0', name='ck_products_stock_non_negative'),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_products_created_at_id', 'products', ['created_at', 'id'])
+    op.create_table(
+        'product_stock_shards',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('shard', sa.Integer(), nullable=False),
+        sa.Column('stock', sa.Integer(), nullable=False),
+        sa.CheckConstraint('stock >= 0', name='ck_product_stock_shards_stock_non_negative'),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id', 'shard'),
+    )
+    op.create_table(
+        'orders',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=utcnow(), nullable=False),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_orders_created_at_id', 'orders', ['created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_orders_created_at_id', table_name='orders')
+    op.drop_table('orders')
+    op.drop_table('product_stock_shards')
+    op.drop_index('ix_products_created_at_id', table_name='products')
+    op.drop_table('products')
+    op.drop_table('users')
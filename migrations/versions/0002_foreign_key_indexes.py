@@ -0,0 +1,36 @@
+"""index foreign keys used by ownership checks and joins
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Postgres does not index foreign key columns by itself: without these, ownership filters, the owner/product
+# joins of the listings and every ON DELETE CASCADE from users/products scan the whole child table.
+# (created_at is already covered by the (created_at, id) pagination indexes of the initial revision.)
+# The indexes are built CONCURRENTLY, outside the migration transaction, so existing tables keep taking writes.
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_products_owner_id', 'products', ['owner_id'], postgresql_concurrently=True)
+        op.create_index('ix_orders_owner_id', 'orders', ['owner_id'], postgresql_concurrently=True)
+        op.create_index('ix_orders_product_id', 'orders', ['product_id'], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_orders_product_id', table_name='orders', postgresql_concurrently=True)
+        op.drop_index('ix_orders_owner_id', table_name='orders', postgresql_concurrently=True)
+        op.drop_index('ix_products_owner_id', table_name='products', postgresql_concurrently=True)
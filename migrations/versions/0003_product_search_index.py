@@ -0,0 +1,40 @@
+"""full-text search index on products
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 11:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# GIN index over the weighted tsvector of name (A) and description (B) that GET /products/?search= queries with
+# websearch_to_tsquery; the expression must stay identical to models.search_document(). Postgres only
+# (other databases search with LIKE scans), built CONCURRENTLY so the products table keeps taking writes.
+SEARCH_DOCUMENT = ("(setweight(to_tsvector('english', name), 'A') || "
+                   "setweight(to_tsvector('english', description), 'B'))")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        op.create_index('ix_products_search', 'products', [sa.text(SEARCH_DOCUMENT)],
+                        postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_products_search', table_name='products', postgresql_concurrently=True)
@@ -0,0 +1,41 @@
+"""row versions and updated_at for conditional GET
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 13:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.models import utcnow
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Tables whose rows appear in ETag'd representations (products and orders, and users as their embedded owners)
+TABLES = ('users', 'products', 'orders')
+
+
+# Both columns get non-volatile defaults, so Postgres (11+) adds them without rewriting the tables; existing rows
+# start at version 1 with the migration time as updated_at. SQLite cannot add a column with an expression default,
+# so batch mode copies its tables instead (on Postgres it emits the plain ALTER TABLE statements).
+def upgrade() -> None:
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch:
+            batch.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+            batch.add_column(sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=utcnow(), nullable=False))
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column('updated_at')
+            batch.drop_column('version')
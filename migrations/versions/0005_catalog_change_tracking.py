@@ -0,0 +1,53 @@
+"""change tracking for the in-memory product catalog
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 15:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# The catalog snapshot polls products (and product owners) changed since its watermark, so updated_at is indexed.
+# On Postgres, statement-level triggers also NOTIFY the catalog_changes channel whenever products change or users
+# (the embedded owners) are updated, waking the snapshot refreshers as soon as the change commits.
+NOTIFY_FUNCTION = """
+CREATE OR REPLACE FUNCTION notify_catalog_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('catalog_changes', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_products_updated_at', 'products', ['updated_at'], postgresql_concurrently=True)
+        op.create_index('ix_users_updated_at', 'users', ['updated_at'], postgresql_concurrently=True)
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(NOTIFY_FUNCTION)
+    op.execute("CREATE TRIGGER products_catalog_notify AFTER INSERT OR UPDATE OR DELETE ON products "
+               "FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_change()")
+    op.execute("CREATE TRIGGER users_catalog_notify AFTER UPDATE ON users "
+               "FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_change()")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP TRIGGER IF EXISTS users_catalog_notify ON users")
+        op.execute("DROP TRIGGER IF EXISTS products_catalog_notify ON products")
+        op.execute("DROP FUNCTION IF EXISTS notify_catalog_change()")
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_updated_at', table_name='users', postgresql_concurrently=True)
+        op.drop_index('ix_products_updated_at', table_name='products', postgresql_concurrently=True)
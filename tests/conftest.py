@@ -0,0 +1,39 @@
+# Shared fixtures: the app runs in-process against a throwaway SQLite file created from the models, so the tests
+# need no .env and no running database.
+import os
+import tempfile
+import uuid
+
+import pytest
+
+# Point the app at the test database; must run before anything from `app` is imported
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='fastcommerce-tests-'), 'test.db')}",
+    DB_CREATE_ALL="true",
+    SECRET_KEY="tests",
+    ALGORITHM="HS256",
+    ACCESS_TOKEN_EXPIRE_MINUTES="60",
+    PASSWORD_HASH_WORKERS="0",
+    BCRYPT_ROUNDS="4",
+    SLOW_QUERY_SECONDS="0",
+)
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+# The app with its lifespan (tables created, warm-up done) for the whole session
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+# Register a throwaway user and return its auth headers
+def signup(client: TestClient, name: str = "tests"):
+    email = f"{name}-{uuid.uuid4().hex[:8]}@example.com"
+    client.post("/users/", json={"fullname": name, "email": email, "password": "tests"}).raise_for_status()
+    response = client.post("/login", data={"username": email, "password": "tests"})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
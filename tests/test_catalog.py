@@ -0,0 +1,36 @@
+# The app boots with the in-memory catalog enabled (loading the existing products) and keeps it current on writes.
+from fastapi.testclient import TestClient
+
+from app.environment.config import settings
+from app.helpers import catalog, warmup
+from app.main import app
+from conftest import signup
+
+
+def test_boot_with_catalog_snapshot(client, monkeypatch):
+    headers = signup(client, "catalog")
+    existing = client.post("/products/", headers=headers,
+                           json={"name": "Existing", "description": "Loaded at start-up", "price": 10}).json()
+
+    # A snapshot of its own, so later tests read from the database again; the second app's shutdown must not leave
+    # the session's app reporting not ready
+    monkeypatch.setattr(catalog, "snapshot", catalog.CatalogSnapshot())
+    monkeypatch.setattr(warmup, "ready", warmup.ready)
+    monkeypatch.setattr(settings, "catalog_snapshot_enabled", True)
+    with TestClient(app) as booted:
+        assert catalog.snapshot.loaded
+        assert catalog.snapshot.get(existing["id"]) is not None
+
+        response = booted.post("/products/", headers=headers,
+                               json={"name": "Created", "description": "Added by the writer", "price": 20})
+        assert response.status_code == 201
+        created = response.json()["id"]
+        response = booted.put(f"/products/{created}", headers=headers,
+                              json={"name": "Renamed", "description": "Updated by the writer", "price": 30})
+        assert response.status_code == 200
+
+        # Served from the snapshot, which the writes refreshed
+        assert catalog.snapshot.get(created) is not None
+        response = booted.get(f"/products/{created}", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["name"] == "Renamed"
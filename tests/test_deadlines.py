@@ -0,0 +1,54 @@
+# Request deadlines bound the transactions of a session, and only those: the pooled connection is released from the
+# deadline when the transaction ends.
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db.config import engine
+from app.db.deadlines import Deadline, DeadlineExceeded, request_deadline
+
+# Counts to n in SQLite's virtual machine: long enough to hit the progress handler
+SLOW = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < :n) SELECT count(*) FROM c"
+
+
+# Deadline of a request admitted now with `seconds` to go, set as the current request's deadline
+@pytest.fixture
+def deadline():
+    def start(seconds: float):
+        deadline = Deadline()
+        deadline.expires = deadline.admitted + seconds
+        tokens.append(request_deadline.set(deadline))
+        return deadline
+
+    tokens = []
+    yield start
+    for token in reversed(tokens):
+        request_deadline.reset(token)
+
+
+def test_statement_past_deadline_fails(deadline):
+    with Session(engine) as db:
+        db.info["deadline"] = deadline(0.1)
+        with pytest.raises(DeadlineExceeded):
+            db.execute(text(SLOW), {"n": 10 ** 9})
+
+
+def test_query_after_deadline_fails(deadline):
+    with Session(engine) as db:
+        db.info["deadline"] = deadline(0.05)
+        db.execute(text("SELECT 1"))
+        time.sleep(0.1)
+        with pytest.raises(DeadlineExceeded):
+            db.execute(text("SELECT 1"))
+
+
+# Later work on the same connection in the same request (e.g. a streamed export) is not interrupted
+def test_connection_is_released_from_deadline(deadline):
+    with engine.connect() as connection:
+        with Session(bind=connection) as db:
+            db.info["deadline"] = deadline(0.05)
+            db.execute(text("SELECT 1"))
+        time.sleep(0.1)
+        assert connection.execute(text(SLOW), {"n": 100000}).scalar() == 100000
@@ -0,0 +1,32 @@
+# Streamed exports keep memory bounded by one partition: exporting ten times more rows must not grow the peak RSS
+# (the full-size check, a million rows, is `python -m benchmarks.export_memory`).
+import asyncio
+import gc
+from datetime import timedelta
+
+import pytest
+
+from app.helpers.generate_jwt import create_access_token
+from app.main import app
+from benchmarks.export_memory import EPOCH, export, rss, seed
+
+ROWS = 200000
+
+# Peak RSS growth allowed for any of the exports; buffering 200k rows would take well over 100 MiB
+MAX_GROWTH_MB = 20
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("format", ["ndjson", "csv"])
+def test_export_memory_is_bounded(client, format):
+    token = create_access_token(data={"user_id": seed(ROWS)})
+    growth = {}
+    for count in (ROWS // 10, ROWS):
+        params = {"format": format, "until": (EPOCH + timedelta(seconds=count)).isoformat()}
+        gc.collect()
+        baseline = rss()
+        status, _, lines, peak = asyncio.run(export(app, "/orders/export", params, token))
+        assert status == 200
+        assert lines == count + (format == "csv")
+        growth[count] = (peak - baseline) / 2 ** 20
+    assert max(growth.values()) < MAX_GROWTH_MB, growth
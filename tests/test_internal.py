@@ -0,0 +1,23 @@
+# Only the readiness probe is open; the diagnostic routes need the internal token
+import pytest
+
+from app.environment.config import settings
+
+DIAGNOSTICS = ["/internal/pool", "/internal/replicas", "/internal/cache", "/internal/catalog"]
+
+
+def test_readiness_is_open(client):
+    assert client.get("/internal/ready").status_code == 200
+
+
+@pytest.mark.parametrize("path", DIAGNOSTICS)
+def test_diagnostics_disabled_without_token(client, path):
+    assert client.get(path).status_code == 404
+
+
+@pytest.mark.parametrize("path", DIAGNOSTICS)
+def test_diagnostics_require_token(client, monkeypatch, path):
+    monkeypatch.setattr(settings, "internal_token", "tests-internal")
+    assert client.get(path).status_code == 403
+    assert client.get(path, headers={"X-Internal-Token": "wrong"}).status_code == 403
+    assert client.get(path, headers={"X-Internal-Token": "tests-internal"}).status_code == 200
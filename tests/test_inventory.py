@@ -0,0 +1,79 @@
+# in_stock follows the stock of stock-tracked products (single row or shards) and stays the owner's flag otherwise.
+import pytest
+
+from conftest import signup
+
+
+@pytest.fixture
+def owner(client):
+    return signup(client, "inventory")
+
+
+# Create a product and return its id
+def create_product(client, headers: dict, **fields):
+    response = client.post("/products/", headers=headers,
+                           json={"name": "Tracked", "description": "Inventory", "price": 10, **fields})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+# Order `quantity` units and return the order id
+def order(client, headers: dict, product_id: int, quantity: int = 1):
+    response = client.post("/orders/", headers=headers, json={"product_id": product_id, "quantity": quantity})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+# in_stock as served by GET /products/{id}
+def in_stock(client, headers: dict, product_id: int):
+    return client.get(f"/products/{product_id}", headers=headers).json()["in_stock"]
+
+
+# Ids of the in-stock products GET /products/?in_stock=true lists
+def listed_in_stock(client, headers: dict):
+    return {product["id"] for product in client.get("/products/", headers=headers,
+                                                     params={"in_stock": "true", "limit": 1000}).json()}
+
+
+def test_rename_keeps_sold_out_product_out_of_stock(client, owner):
+    product_id = create_product(client, owner, stock=1)
+    order(client, owner, product_id)
+
+    response = client.put(f"/products/{product_id}", headers=owner,
+                          json={"name": "Renamed", "description": "Inventory", "price": 10})
+    assert response.status_code == 200
+    assert response.json()["in_stock"] is False
+    assert product_id not in listed_in_stock(client, owner)
+
+
+def test_cancelled_order_restores_availability(client, owner):
+    product_id = create_product(client, owner, stock=1)
+    order_id = order(client, owner, product_id)
+    assert in_stock(client, owner, product_id) is False
+
+    assert client.delete(f"/orders/{order_id}", headers=owner).status_code == 204
+    assert in_stock(client, owner, product_id) is True
+    assert product_id in listed_in_stock(client, owner)
+
+
+def test_untracked_product_keeps_owner_flag(client, owner):
+    product_id = create_product(client, owner)
+    for flag in (False, True):
+        response = client.put(f"/products/{product_id}", headers=owner,
+                              json={"name": "Untracked", "description": "Inventory", "price": 10, "in_stock": flag})
+        assert response.json()["in_stock"] is flag
+
+
+@pytest.mark.parametrize("quantities", [(1, 1, 1), (3,)], ids=["shard by shard", "across shards"])
+def test_sharded_product_sells_out_and_comes_back(client, owner, quantities):
+    product_id = create_product(client, owner)
+    client.put(f"/products/{product_id}/stock", headers=owner, json={"stock": 3, "shards": 2}).raise_for_status()
+
+    orders = [order(client, owner, product_id, quantity) for quantity in quantities]
+    assert in_stock(client, owner, product_id) is False
+    assert product_id not in listed_in_stock(client, owner)
+    assert client.post("/orders/", headers=owner, json={"product_id": product_id, "quantity": 1}).status_code == 409
+
+    assert client.delete(f"/orders/{orders[0]}", headers=owner).status_code == 204
+    assert in_stock(client, owner, product_id) is True
+    assert client.get(f"/products/{product_id}/stock", headers=owner).json()["stock"] == quantities[0]
@@ -0,0 +1,34 @@
+# `alembic upgrade head` builds the models' schema on SQLite too, and the migrations downgrade and upgrade cleanly.
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine, inspect
+
+from app.models.models import Base
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+# Run an alembic command against the database at `url`
+def alembic(url: str, *args: str):
+    result = subprocess.run([sys.executable, "-m", "alembic", *args], cwd=ROOT, capture_output=True, text=True,
+                            env={**os.environ, "DATABASE_URL": url})
+    assert result.returncode == 0, result.stderr
+
+
+def test_upgrade_head_on_sqlite(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrations.db'}"
+    alembic(url, "upgrade", "head")
+    alembic(url, "downgrade", "base")
+    alembic(url, "upgrade", "head")
+
+    engine = create_engine(url)
+    try:
+        schema = inspect(engine)
+        for table in Base.metadata.sorted_tables:
+            columns = {column["name"] for column in schema.get_columns(table.name)}
+            assert columns == set(table.columns.keys()), table.name
+    finally:
+        engine.dispose()
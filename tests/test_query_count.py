@@ -0,0 +1,64 @@
+# List and detail routes eager-load their embedded relationships, so the number of SQL statements per request must
+# not grow with the page size (an N+1 lazy load slipping back in would make it do so).
+import pytest
+from sqlalchemy import event
+
+from app.db.replicas import all_engines
+from conftest import signup
+
+PAGE_SIZES = (1, 10, 100)
+
+
+# Count the statements executed on every engine (sync and, with ASYNC_DATABASE=true, async) while running `call`
+def count_queries(call):
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = all_engines().values()
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        response = call()
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", on_execute)
+    response.raise_for_status()
+    return len(statements)
+
+
+# Products spread over several owners (so the select-in loaders fetch more than one user), one order on each;
+# returns the first owner's headers and product ids
+@pytest.fixture(scope="module")
+def catalog(client):
+    owners = [signup(client, f"owner{n}") for n in range(5)]
+    product_ids = []
+    for index in range(max(PAGE_SIZES)):
+        headers = owners[index % len(owners)]
+        response = client.post("/products/", headers=headers,
+                               json={"name": f"qc-{index}", "description": "query count", "price": index})
+        response.raise_for_status()
+        product_ids.append(response.json()["id"])
+        client.post("/orders/", headers=headers, json={"product_id": product_ids[-1], "quantity": 1}).raise_for_status()
+    return owners[0], product_ids
+
+
+# Statements per list page: the page itself plus one select-in load per embedded owner collection
+@pytest.mark.parametrize("path, statements", [("/products/", 2), ("/orders/", 3)])
+def test_list_query_count_is_constant(client, catalog, path, statements):
+    headers, _ = catalog
+    # One unmeasured request first, so the cached authentication does not count against the first page size
+    client.get(path, params={"limit": 1}, headers=headers).raise_for_status()
+    counts = {limit: count_queries(lambda: client.get(path, params={"limit": limit}, headers=headers))
+              for limit in PAGE_SIZES}
+    assert counts == dict.fromkeys(PAGE_SIZES, statements)
+
+
+# A product and its owner come from one joined statement
+def test_detail_query_count_is_constant(client, catalog):
+    headers, product_ids = catalog
+    client.get(f"/products/{product_ids[0]}", headers=headers).raise_for_status()
+    sampled = product_ids[::len(product_ids) // 10]
+    counts = {id: count_queries(lambda: client.get(f"/products/{id}", headers=headers)) for id in sampled}
+    assert counts == dict.fromkeys(sampled, 1)